@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +45,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.LoadSheddingMiddleware',
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'core.middleware.PrimaryAfterWriteMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,13 +82,68 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Connections are pooled per process when DB_POOL_MAX_SIZE is set. Otherwise
+# each thread keeps its connection open for DB_CONN_MAX_AGE seconds.
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 0))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'HOST': 'db',  # os.environ.get('DB_HOST'),
-        'NAME': 'app',  # os.environ.get('DB_NAME'),
-        'USER': 'postgres',  # os.environ.get('DB_USER'),
-        'PASSWORD': 'Password1',  # os.environ.get('DB_PASS'),
+        'ENGINE': 'core.db.backends.postgresql',
+        'HOST': os.environ.get('DB_HOST', 'db'),
+        'PORT': os.environ.get('DB_PORT', ''),
+        'NAME': os.environ.get('DB_NAME', 'app'),
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASS', 'Password1'),
+        # Pooled connections go back to the pool after each request
+        'CONN_MAX_AGE': 0 if DB_POOL_MAX_SIZE else int(
+            os.environ.get('DB_CONN_MAX_AGE', 60)
+        ),
+        # Check a kept-open connection still works before each request uses it
+        'CONN_HEALTH_CHECKS': os.environ.get(
+            'DB_CONN_HEALTH_CHECKS', 'true'
+        ).lower() in ('1', 'true', 'yes'),
+        'POOL': {
+            'MAX_SIZE': DB_POOL_MAX_SIZE,
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            'CHECK_AFTER': float(os.environ.get('DB_POOL_CHECK_AFTER', 30)),
+            'MAX_LIFETIME': float(
+                os.environ.get('DB_POOL_MAX_LIFETIME', 1800)
+            ),
+        } if DB_POOL_MAX_SIZE else None,
+    }
+}
+
+# Read replicas of the primary, as a comma separated list of hosts. Each is
+# added as a replica_N alias sharing the primary's other settings, and reads
+# are spread over them by core.db.routers.ReplicaRouter
+DB_REPLICA_HOSTS = [
+    host.strip()
+    for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',')
+    if host.strip()
+]
+for index, host in enumerate(DB_REPLICA_HOSTS):
+    DATABASES[f'replica_{index}'] = dict(
+        DATABASES['default'], HOST=host, TEST={'MIRROR': 'default'}
+    )
+
+DATABASE_REPLICAS = [f'replica_{index}' for index in range(
+    len(DB_REPLICA_HOSTS)
+)]
+DATABASE_ROUTERS = ['core.db.routers.ReplicaRouter']
+
+# Seconds a client keeps reading from the primary after it writes, long
+# enough for the replicas to catch up
+DATABASE_REPLICA_STICKY_SECONDS = int(
+    os.environ.get('DB_REPLICA_STICKY_SECONDS', 5)
+)
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
@@ -131,5 +192,104 @@ STATIC_URL = '/static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
-    'TEST_REQUEST_DEFAULT_FORMAT': 'json'
-}
\ No newline at end of file
+    'TEST_REQUEST_DEFAULT_FORMAT': 'json',
+    # JSON is encoded with orjson when it is installed, and MessagePack is
+    # offered to clients sending `Accept: application/msgpack` when msgpack
+    # is installed
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        *(['core.renderers.MessagePackRenderer']
+          if find_spec('msgpack') else []),
+    ],
+    # Each client gets a token bucket per throttle_scope, refilling at the
+    # scope's rate, see core.throttling.TokenBucketThrottle
+    'DEFAULT_THROTTLE_CLASSES': ['core.throttling.TokenBucketThrottle'],
+    'DEFAULT_THROTTLE_RATES': {
+        'recipe': os.environ.get('THROTTLE_RATE_RECIPE', '1200/min'),
+        'recipe-bulk': os.environ.get('THROTTLE_RATE_RECIPE_BULK', '60/min'),
+    },
+}
+
+# Where the throttling token buckets are kept: 'memory' for limits per
+# process, or 'database' to share the limits between processes
+API_THROTTLE_STORE = os.environ.get('THROTTLE_STORE', 'memory')
+
+# Most requests each process serves at once. Past it, requests are answered
+# with 503 and a Retry-After of LOAD_SHED_RETRY_AFTER seconds instead of
+# waiting on the database. 0 turns load shedding off.
+LOAD_SHED_MAX_IN_FLIGHT = int(os.environ.get('LOAD_SHED_MAX_IN_FLIGHT', 64))
+LOAD_SHED_RETRY_AFTER = 1
+LOAD_SHED_EXEMPT_PATHS = ['/healthz', '/readyz', '/api/metrics/']
+
+# Smallest response body, in bytes, worth compressing
+RESPONSE_COMPRESSION_MIN_SIZE = 1024
+
+# Compression levels, trading CPU time per response for smaller bodies
+RESPONSE_GZIP_LEVEL = 4
+RESPONSE_BROTLI_QUALITY = 5
+
+# Default number of recipes per page on the recipe list endpoint, clients
+# can request a different size with ?page_size= up to the paginator maximum
+RECIPE_PAGE_SIZE = 50
+
+# Build recipe list responses straight from `.values()` rows instead of
+# serializing each recipe through RecipeSerializer
+RECIPE_FAST_LIST = True
+
+# Read recipe ingredients from the denormalized snapshot on each recipe row
+# rather than from the ingredient table
+RECIPE_INGREDIENT_SNAPSHOT = True
+
+# Number of worker threads, and so database connections, the async recipe
+# views use for database work
+RECIPE_ASYNC_DB_THREADS = 16
+
+# Number of recipes validated and written per transaction by bulk imports,
+# and read per round trip by exports
+RECIPE_BULK_CHUNK_SIZE = 500
+
+# Most operations accepted by one request to the batch endpoint
+RECIPE_BATCH_MAX_SIZE = 200
+
+# Recipe imports with a body of at least this many bytes are run as
+# background jobs, answered with 202 Accepted, rather than in the request
+RECIPE_IMPORT_BACKGROUND_MIN_BYTES = 1024 * 1024
+
+# Number of jobs each process_jobs worker runs at once, and the seconds an
+# idle worker waits before looking for new jobs
+JOB_WORKER_CONCURRENCY = int(os.environ.get('JOB_WORKER_CONCURRENCY', 2))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1.0))
+
+# Seconds a running job's worker can go without renewing its lease before
+# the job is queued again, and the most times a job is started before it
+# is failed instead
+JOB_LEASE_SECONDS = float(os.environ.get('JOB_LEASE_SECONDS', 60))
+JOB_MAX_ATTEMPTS = 3
+
+# Serve recipe details and the first RECIPE_SNAPSHOT_LIST_PAGES pages of
+# the unfiltered list from pre-rendered snapshots while they are fresh,
+# rebuilding them as recipes change. Build them all with
+# `python manage.py build_recipe_snapshots`.
+RECIPE_SNAPSHOTS = os.environ.get(
+    'RECIPE_SNAPSHOTS', 'false'
+).lower() in ('1', 'true', 'yes')
+RECIPE_SNAPSHOT_LIST_PAGES = 20
+# Writes changing more recipes than this have their snapshots rebuilt by a
+# background job rather than in the request
+RECIPE_SNAPSHOT_SYNC_MAX = 20
+
+# Cache used for serialized recipe payloads, point this at an alias using
+# DummyCache to turn recipe caching off
+RECIPE_CACHE_ALIAS = 'default'
+RECIPE_CACHE_TIMEOUT = 300
+
+# Above this many matching recipes, list counts on PostgreSQL are taken from
+# the planner's estimates rather than counted. Exact counts are cached per
+# filter for RECIPE_COUNT_CACHE_TIMEOUT seconds.
+RECIPE_COUNT_ESTIMATE_THRESHOLD = 10000
+RECIPE_COUNT_CACHE_TIMEOUT = 30
+
+# Fraction of requests measured by RequestMetricsMiddleware, from 0.0 (off)
+# to 1.0 (every request)
+REQUEST_METRICS_SAMPLE_RATE = 0.0
@@ -0,0 +1,30 @@
+"""
+Settings for running the test suite without PostgreSQL.
+
+    python manage.py test --settings=app.test_settings
+
+Tests run on in-memory SQLite, one database per test process, spread over
+every CPU core. Pass --parallel=1 to run them in one process.
+"""
+
+from app.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+    # A SQLite alias standing in for a read replica, so the replica routing
+    # tests run too
+    'replica_0': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_REPLICAS = ['replica_0']
+
+# Hashing with the default hasher is slow by design
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+TEST_RUNNER = 'core.test_runner.ParallelTestRunner'
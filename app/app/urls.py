@@ -16,7 +16,14 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from core import views as core_views
+
 urlpatterns = [
+    path('healthz', core_views.healthz_view, name='healthz'),
+    path('readyz', core_views.readyz_view, name='readyz'),
     path('admin/', admin.site.urls),
     path('api/recipe/', include('recipe.urls')),
+    path('api/async/recipe/', include('recipe.async_urls')),
+    path('api/metrics/', include('core.urls')),
+    path('api/jobs/<int:pk>/', core_views.job_view, name='job'),
 ]
@@ -0,0 +1,32 @@
+"""Performance benchmarks for the recipe API
+
+Run from the app directory against the configured database, for example:
+
+    python -m benchmarks.list_serialization --recipes 10000
+"""
+import os
+
+import django
+
+
+def setup():
+    """Configure Django for a benchmark run outside manage.py"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    django.setup()
+
+
+def unlimited():
+    """Settings turning off throttling and load shedding
+
+    Benchmarks send far more requests from one client than the limits
+    allow, and measure the views rather than the limits.
+    """
+    from django.conf import settings
+    from django.test.utils import override_settings
+
+    return override_settings(
+        REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}
+        },
+        LOAD_SHED_MAX_IN_FLIGHT=0,
+    )
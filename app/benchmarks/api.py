@@ -0,0 +1,174 @@
+"""Measure recipe API latency and query counts
+
+Seeds the configured database with generated recipes inside a transaction
+that is rolled back afterwards, then drives each endpoint through the full
+Django stack. Results are written as JSON and can be compared against a
+stored baseline to flag regressions.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks import setup, unlimited
+from benchmarks.compare import compare, format_regressions
+from benchmarks.fixtures import recipe_data, rolled_back, seed
+
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(sorted_values, percent):
+    """Get a percentile of sorted values by the nearest-rank method"""
+    index = max(0, -(-len(sorted_values) * percent // 100) - 1)
+    return sorted_values[int(index)]
+
+
+def summarize(timings, query_counts):
+    timings = sorted(timings)
+    summary = {
+        f'p{percent}_ms': round(percentile(timings, percent) * 1000, 3)
+        for percent in PERCENTILES
+    }
+    summary['mean_ms'] = round(sum(timings) / len(timings) * 1000, 3)
+    summary['queries'] = max(query_counts)
+    summary['iterations'] = len(timings)
+    return summary
+
+
+def get_scenarios(client, recipe_ids, ingredients_per_recipe):
+    """Get the requests to measure, each a function making one request"""
+    from django.urls import reverse
+
+    list_url = reverse('recipe:recipe-list')
+
+    def detail_url():
+        recipe_id = random.choice(recipe_ids)
+        return reverse('recipe:recipe-detail', args=[recipe_id])
+
+    def create():
+        return client.post(list_url, recipe_data(
+            random.randrange(10 ** 6), ingredients_per_recipe
+        ))
+
+    def patch():
+        data = recipe_data(random.randrange(10 ** 6), ingredients_per_recipe)
+        # Change one ingredient so the update has work to do
+        data['ingredients'][:1] = [{'name': f'Ingredient {time.time()}'}]
+        return client.patch(detail_url(), data)
+
+    return {
+        'list': lambda: client.get(list_url),
+        'detail': lambda: client.get(detail_url()),
+        'search': lambda: client.get(list_url, {'q': 'Ingredient'}),
+        'name_filter': lambda: client.get(list_url, {'name': 'Recipe 00'}),
+        'create': create,
+        'patch': patch,
+    }
+
+
+def run(recipes, ingredients, iterations, warm_cache=False, scenarios=None):
+    """Run the benchmark scenarios and get their results"""
+    from django.core.cache import caches
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIClient
+    from core.models import Recipe
+
+    client = APIClient()
+    cache = caches[settings.RECIPE_CACHE_ALIAS]
+    results = {}
+    with unlimited(), rolled_back():
+        recipe_count, ingredient_count = seed(recipes, ingredients)
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+        requests = get_scenarios(client, recipe_ids, ingredients)
+        for name in scenarios or requests:
+            timings, query_counts = [], []
+            for _ in range(iterations):
+                if not warm_cache:
+                    cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = requests[name]()
+                    timings.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    raise RuntimeError(
+                        f'{name} failed with status {response.status_code}'
+                    )
+                query_counts.append(len(queries.captured_queries))
+            results[name] = summarize(timings, query_counts)
+
+    return {
+        'meta': {
+            'database': connection.vendor,
+            'recipes': recipe_count,
+            'ingredients': ingredient_count,
+            'iterations': iterations,
+            'warm_cache': warm_cache,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+        },
+        'scenarios': results,
+    }
+
+
+def print_results(results):
+    meta = results['meta']
+    print(
+        f"{meta['database']}: {meta['recipes']} recipes, "
+        f"{meta['ingredients']} ingredients"
+    )
+    columns = [f'p{percent}_ms' for percent in PERCENTILES] + ['queries']
+    print(f"{'scenario':<14}" + ''.join(f'{c:>12}' for c in columns))
+    for name, summary in results['scenarios'].items():
+        print(f'{name:<14}' + ''.join(f'{summary[c]:>12}' for c in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recipes', type=int, default=1000)
+    parser.add_argument('--ingredients', type=int, default=5)
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument(
+        '--scenario', action='append', dest='scenarios',
+        help='Scenario to run, may be repeated, defaults to all'
+    )
+    parser.add_argument(
+        '--warm-cache', action='store_true',
+        help='Keep the recipe cache between requests'
+    )
+    parser.add_argument('--output', help='File to write the results to')
+    parser.add_argument('--baseline', help='Results file to compare against')
+    parser.add_argument(
+        '--tolerance', type=float, default=0.2,
+        help='Allowed fractional slowdown against the baseline'
+    )
+    args = parser.parse_args()
+
+    setup()
+    from django.test.utils import setup_test_environment
+    # Allow the test client host and run with DEBUG off, as in production
+    setup_test_environment(debug=False)
+    random.seed(0)
+    results = run(
+        args.recipes, args.ingredients, args.iterations,
+        warm_cache=args.warm_cache, scenarios=args.scenarios,
+    )
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline), args.tolerance)
+        print(format_regressions(regressions))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Compare benchmark results against a stored baseline"""
+import argparse
+import json
+import sys
+
+
+LATENCY_METRICS = ('p50_ms', 'p90_ms')
+
+
+def compare(results, baseline, tolerance=0.2):
+    """Get the regressions in results compared to a baseline
+
+    Latency regresses when it is more than `tolerance` slower than the
+    baseline, and query counts regress on any increase.
+    """
+    regressions = []
+    for name, summary in results['scenarios'].items():
+        expected = baseline['scenarios'].get(name)
+        if expected is None:
+            continue
+        for metric in LATENCY_METRICS:
+            if summary[metric] > expected[metric] * (1 + tolerance):
+                regressions.append((name, metric, expected[metric],
+                                    summary[metric]))
+        if summary['queries'] > expected['queries']:
+            regressions.append((name, 'queries', expected['queries'],
+                                summary['queries']))
+    return regressions
+
+
+def format_regressions(regressions):
+    if not regressions:
+        return 'No regressions against the baseline'
+    return '\n'.join(
+        f'REGRESSION {name} {metric}: {expected} -> {actual}'
+        for name, metric, expected, actual in regressions
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('results')
+    parser.add_argument('baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    with open(args.results) as results, open(args.baseline) as baseline:
+        regressions = compare(
+            json.load(results), json.load(baseline), args.tolerance
+        )
+    print(format_regressions(regressions))
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""Load test the WSGI recipe views against the async ASGI views
+
+Drives both applications in-process with the same number of concurrent
+clients. The WSGI application is served by a fixed pool of worker threads,
+like a threaded WSGI server, while the ASGI application runs on one event
+loop. Use --db-latency-ms to add a delay to every query, standing in for a
+remote or busy database, which is where the async views pay off.
+
+The seeded recipes are committed, so worker threads can see them, and
+deleted again at the end of the run.
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from benchmarks import setup, unlimited
+from benchmarks.api import percentile
+from benchmarks.fixtures import seed
+
+
+def add_db_latency(seconds):
+    """Sleep before every query on every database connection"""
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    def slow_query(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        if slow_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(slow_query)
+
+    connection_created.connect(install, weak=False)
+    for connection in connections.all():
+        install(None, connection)
+
+
+def wsgi_get(application, path, query):
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(),
+        'wsgi.errors': BytesIO(),
+    }
+    statuses = []
+    body = b''.join(application(
+        environ, lambda status, headers: statuses.append(status)
+    ))
+    return int(statuses[0].split()[0]), body
+
+
+async def asgi_get(application, path, query):
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'query_string': query.encode('latin1'),
+        'headers': [(b'host', b'testserver')],
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 0),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    body = b''.join(m.get('body', b'') for m in messages[1:])
+    return messages[0]['status'], body
+
+
+def summarize(label, latencies, seconds):
+    latencies = sorted(latencies)
+    print(
+        f'{label:<6}{len(latencies) / seconds:10.1f} req/s'
+        f'{percentile(latencies, 50) * 1000:10.1f} ms p50'
+        f'{percentile(latencies, 99) * 1000:10.1f} ms p99'
+    )
+
+
+def run_wsgi(path, query, requests, concurrency, threads):
+    """Send requests from concurrent clients to a threaded WSGI server"""
+    from app.wsgi import application
+
+    # Clients queue for the server's worker threads as they would for a
+    # threaded WSGI server with this many threads
+    with ThreadPoolExecutor(threads) as server:
+        def request():
+            return server.submit(wsgi_get, application, path, query)
+
+        def timed_client(count):
+            latencies = []
+            for _ in range(count):
+                start = time.perf_counter()
+                status, _ = request().result()
+                latencies.append(time.perf_counter() - start)
+                assert status == 200, status
+            return latencies
+
+        with ThreadPoolExecutor(concurrency) as clients:
+            start = time.perf_counter()
+            results = list(clients.map(
+                timed_client, [requests // concurrency] * concurrency
+            ))
+            seconds = time.perf_counter() - start
+    return [latency for result in results for latency in result], seconds
+
+
+def run_asgi(path, query, requests, concurrency):
+    """Send requests from concurrent clients to the ASGI application"""
+    from app.asgi import application
+
+    async def client(count):
+        latencies = []
+        for _ in range(count):
+            start = time.perf_counter()
+            status, _ = await asgi_get(application, path, query)
+            latencies.append(time.perf_counter() - start)
+            assert status == 200, status
+        return latencies
+
+    async def main():
+        return await asyncio.gather(*[
+            client(requests // concurrency) for _ in range(concurrency)
+        ])
+
+    start = time.perf_counter()
+    results = asyncio.run(main())
+    seconds = time.perf_counter() - start
+    return [latency for result in results for latency in result], seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recipes', type=int, default=1000)
+    parser.add_argument('--ingredients', type=int, default=5)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument(
+        '--wsgi-threads', type=int, default=8,
+        help='Worker threads of the simulated WSGI server'
+    )
+    parser.add_argument('--db-latency-ms', type=float, default=0.0)
+    parser.add_argument(
+        '--query', default='page_size=20',
+        help='Query string sent to both recipe lists'
+    )
+    args = parser.parse_args()
+
+    setup()
+    from django.test.utils import override_settings, setup_test_environment
+    from core.models import Recipe
+
+    setup_test_environment(debug=False)
+    # Measure the views rather than the recipe cache
+    override_settings(
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'
+        }},
+        RECIPE_CACHE_ALIAS='default',
+    ).enable()
+    unlimited().enable()
+    first_id = (Recipe.objects.order_by('-id').values_list('id', flat=True)
+                .first() or 0)
+    seed(args.recipes, args.ingredients)
+    try:
+        if args.db_latency_ms:
+            add_db_latency(args.db_latency_ms / 1000)
+        print(
+            f'{args.requests} requests from {args.concurrency} clients, '
+            f'{args.db_latency_ms} ms added per query'
+        )
+        summarize('WSGI', *run_wsgi(
+            '/api/recipe/', args.query, args.requests, args.concurrency,
+            args.wsgi_threads,
+        ))
+        summarize('ASGI', *run_asgi(
+            '/api/async/recipe/', args.query, args.requests, args.concurrency,
+        ))
+    finally:
+        Recipe.objects.filter(id__gt=first_id).delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Bulk fixture factories for seeding recipes and ingredients"""
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+BATCH_SIZE = 1000
+
+
+def recipe_data(index, ingredient_count):
+    """Get the API representation of a generated recipe"""
+    return {
+        'name': f'Recipe {index:06d}',
+        'description': f'Description of recipe {index}',
+        'ingredients': [
+            {'name': f'Ingredient {j}'} for j in range(ingredient_count)
+        ],
+    }
+
+
+def seed(recipe_count, ingredients_per_recipe):
+    """Create generated recipes with batched inserts
+
+    Returns the number of recipes and ingredients in the database.
+    """
+    from core.models import Recipe, Ingredient
+    from recipe.bulk import chunked, create_recipes
+
+    for chunk in chunked(range(recipe_count), BATCH_SIZE):
+        create_recipes([
+            recipe_data(index, ingredients_per_recipe) for index in chunk
+        ])
+    return Recipe.objects.count(), Ingredient.objects.count()
+
+
+class Rollback(Exception):
+    """Raised to discard the benchmark data once measurements are done"""
+
+
+@contextmanager
+def rolled_back():
+    """Run a block in a transaction that is always rolled back"""
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
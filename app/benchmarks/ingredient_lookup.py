@@ -0,0 +1,114 @@
+"""Time ?ingredient= lookups with and without the ingredient name index
+
+Seeds recipes whose ingredients are drawn from a vocabulary with a few
+common and many rare names, 1M ingredients by default, then times the
+ingredient filter for common, rare and mixed combinations. The lookups
+are timed again after dropping the index, inside the same rolled back
+transaction, to show the scans it saves.
+"""
+import argparse
+import random
+import time
+from itertools import accumulate
+
+from benchmarks import setup
+from benchmarks.fixtures import BATCH_SIZE, rolled_back
+
+
+INDEX_NAME = 'ingredient_name_recipe_idx'
+
+
+def vocabulary(size):
+    return [f'ingredient {i:05d}' for i in range(size)]
+
+
+def recipes_data(recipe_count, ingredients_per_recipe, names):
+    """Generate recipes, picking ingredients with a long-tailed frequency"""
+    rng = random.Random(42)
+    # Zipf-like weights, so the first names are in most recipes
+    cum_weights = list(accumulate(
+        1 / (rank + 1) for rank in range(len(names))
+    ))
+    for index in range(recipe_count):
+        ingredients = set()
+        while len(ingredients) < ingredients_per_recipe:
+            ingredients.update(rng.choices(names, cum_weights=cum_weights))
+        yield {
+            'name': f'Recipe {index:07d}',
+            'description': f'Description of recipe {index}',
+            'ingredients': [{'name': name} for name in sorted(ingredients)],
+        }
+
+
+def measure(lookup, repeat):
+    """Get the best wall time of several runs, and the rows found"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = len(lookup())
+        timings.append(time.perf_counter() - start)
+    return min(timings), count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recipes', type=int, default=100000)
+    parser.add_argument('--ingredients', type=int, default=10)
+    parser.add_argument('--vocabulary', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument(
+        '--explain', action='store_true', help='Print the query plans'
+    )
+    args = parser.parse_args()
+
+    setup()
+    from django.db import connection
+    from core.models import Ingredient, Recipe
+    from recipe.bulk import chunked, create_recipes
+    from recipe.search import filter_by_ingredients
+
+    names = vocabulary(args.vocabulary)
+    common, rare = names[:2], names[-2:]
+    lookups = [
+        ('2 common, all', common, True),
+        ('common + rare, all', [common[0], rare[0]], True),
+        ('2 rare, any', rare, False),
+        ('2 common, any', common, False),
+    ]
+
+    def run(label):
+        print(label)
+        for name, ingredients, match_all in lookups:
+            queryset = filter_by_ingredients(
+                Recipe.objects.all(), ingredients, match_all
+            ).values_list('id', flat=True)
+            seconds, count = measure(
+                lambda: list(queryset.all()), args.repeat
+            )
+            print(f'  {name:<22}{seconds * 1000:10.1f} ms{count:10} recipes')
+            if args.explain:
+                print('   ', queryset.explain().replace('\n', '\n    '))
+
+    with rolled_back():
+        start = time.perf_counter()
+        for chunk in chunked(recipes_data(
+            args.recipes, args.ingredients, names
+        ), BATCH_SIZE):
+            create_recipes(chunk)
+        print(
+            f'Seeded {Recipe.objects.count()} recipes, '
+            f'{Ingredient.objects.count()} ingredients in '
+            f'{time.perf_counter() - start:.0f} s'
+        )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE core_ingredient')
+
+        run('With the ingredient name index')
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP INDEX {INDEX_NAME}')
+        run('Without it')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Compare RecipeSerializer with the fast `.values()` list path"""
+import argparse
+import time
+
+from benchmarks import setup
+from benchmarks.fixtures import rolled_back, seed
+
+
+def measure(serialize, repeat):
+    """Get the best wall time of several runs of serialize"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        serialize()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recipes', type=int, default=10000)
+    parser.add_argument('--ingredients', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+    from rest_framework.renderers import JSONRenderer
+    from core.models import Recipe
+    from recipe.serializers import RecipeListSerializer, RecipeSerializer
+
+    renderer = JSONRenderer()
+
+    def serialize_instances():
+        recipes = Recipe.objects.with_ingredients().order_by('name', 'id')
+        return renderer.render(RecipeSerializer(recipes, many=True).data)
+
+    def serialize_rows():
+        rows = Recipe.objects.order_by('name', 'id') \
+            .values(*RecipeListSerializer.row_fields)
+        return renderer.render(RecipeSerializer(rows, many=True).data)
+
+    with rolled_back():
+        recipes, ingredients = seed(args.recipes, args.ingredients)
+        if serialize_instances() != serialize_rows():
+            raise AssertionError('Fast list output differs')
+
+        print(f'{recipes} recipes, {ingredients} ingredients')
+        baseline = measure(serialize_instances, args.repeat)
+        fast = measure(serialize_rows, args.repeat)
+        for label, seconds in [
+            ('RecipeSerializer', baseline), ('Fast list', fast)
+        ]:
+            print(
+                f'{label:<18}{seconds * 1000:10.1f} ms'
+                f'{recipes / seconds:12.0f} recipes/s'
+            )
+        print(f'Speed up: {baseline / fast:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Measure response encoding time and the size saved by compression
+
+Renders a page of the recipe list, with descriptions of a chosen length,
+with DRF's JSONRenderer, the fast JSON renderer and, when msgpack is
+installed, MessagePack. The JSON is then compressed with gzip and, when
+brotli is installed, brotli at the configured levels.
+"""
+import argparse
+import gzip
+import random
+import time
+
+from benchmarks import setup
+from benchmarks.fixtures import recipe_data
+
+
+WORDS = (
+    'whisk the eggs with sugar until pale then fold in flour butter milk '
+    'and a pinch of salt bake for twenty minutes at 180C let it cool on a '
+    'rack before slicing serve warm with cream or jam chopped nuts zest '
+    'simmer stir season to taste roast garlic onions carrots stock'
+).split()
+
+
+def describe(index, length):
+    """Get a description of different words for each recipe"""
+    rng = random.Random(index)
+    text = ''
+    while len(text) < length:
+        text += rng.choice(WORDS) + ' '
+    return text[:length]
+
+
+def measure(func, repeat):
+    """Get the best wall time of several runs of func, and its result"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recipes', type=int, default=500)
+    parser.add_argument('--ingredients', type=int, default=8)
+    parser.add_argument('--description-length', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    from django.conf import settings
+    from rest_framework.renderers import JSONRenderer
+    from core import middleware, renderers
+
+    payload = {'next': None, 'previous': None, 'results': [
+        dict(recipe_data(index, args.ingredients), id=index,
+             description=describe(index, args.description_length))
+        for index in range(args.recipes)
+    ]}
+
+    encoders = [('JSONRenderer', JSONRenderer().render)]
+    if renderers.orjson is not None:
+        encoders.append(
+            ('FastJSONRenderer', renderers.FastJSONRenderer().render)
+        )
+    if renderers.msgpack is not None:
+        encoders.append(
+            ('MessagePack', renderers.MessagePackRenderer().render)
+        )
+
+    print(f'{args.recipes} recipes, {args.description_length} character '
+          f'descriptions')
+    baseline = None
+    for label, render in encoders:
+        seconds, body = measure(lambda: render(payload), args.repeat)
+        baseline = baseline or seconds
+        print(f'{label:<18}{seconds * 1000:9.2f} ms{len(body):12} bytes'
+              f'{baseline / seconds:8.1f}x')
+        if label == 'JSONRenderer':
+            json_body = body
+
+    compressors = [('gzip', lambda: gzip.compress(
+        json_body, compresslevel=settings.RESPONSE_GZIP_LEVEL, mtime=0
+    ))]
+    if middleware.brotli is not None:
+        compressors.append(('brotli', lambda: middleware.brotli.compress(
+            json_body, quality=settings.RESPONSE_BROTLI_QUALITY
+        )))
+    for label, compress in compressors:
+        seconds, body = measure(compress, args.repeat)
+        print(f'{label:<18}{seconds * 1000:9.2f} ms{len(body):12} bytes'
+              f'{len(body) / len(json_body):8.1%} of JSON')
+
+
+if __name__ == '__main__':
+    main()
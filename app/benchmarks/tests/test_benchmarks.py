@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from benchmarks import api
+from benchmarks.compare import compare
+from core.models import Recipe
+
+
+def given_results(**scenarios):
+    return {'scenarios': {
+        name: {'p50_ms': p50, 'p90_ms': p50 * 2, 'queries': queries}
+        for name, (p50, queries) in scenarios.items()
+    }}
+
+
+class BenchmarkTests(TestCase):
+
+    def test_run(self):
+        """Test running the API benchmark on a small data set"""
+
+        # When
+        results = api.run(recipes=5, ingredients=2, iterations=3)
+
+        # Then every scenario is measured
+        self.assertEqual(set(results['scenarios']), {
+            'list', 'detail', 'search', 'name_filter', 'create', 'patch'
+        })
+        self.assertEqual(results['meta']['recipes'], 5)
+        self.assertEqual(results['meta']['ingredients'], 10)
+        for summary in results['scenarios'].values():
+            self.assertEqual(summary['iterations'], 3)
+            self.assertLessEqual(summary['p50_ms'], summary['p99_ms'])
+            self.assertGreater(summary['queries'], 0)
+
+        # Then the seeded data is rolled back
+        self.assertFalse(Recipe.objects.exists())
+
+    @override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {'recipe': '2/min'},
+    })
+    def test_run_not_throttled(self):
+        """Test the benchmark can send more requests than the limits"""
+
+        # When
+        results = api.run(
+            recipes=5, ingredients=1, iterations=5, warm_cache=True,
+            scenarios=['list', 'create']
+        )
+
+        # Then
+        self.assertEqual(results['scenarios']['create']['iterations'], 5)
+
+    def test_compare_no_regressions(self):
+        """Test comparing results within tolerance of the baseline"""
+
+        # Given
+        baseline = given_results(list=(10.0, 2), detail=(5.0, 3))
+        results = given_results(list=(11.0, 2), detail=(4.0, 3))
+
+        # When
+        regressions = compare(results, baseline, tolerance=0.2)
+
+        # Then
+        self.assertEqual(regressions, [])
+
+    def test_compare_regressions(self):
+        """Test comparing slower results and extra queries to the baseline"""
+
+        # Given
+        baseline = given_results(list=(10.0, 2), detail=(5.0, 3))
+        results = given_results(list=(13.0, 2), detail=(5.0, 4), new=(1, 1))
+
+        # When
+        regressions = compare(results, baseline, tolerance=0.2)
+
+        # Then
+        self.assertEqual(regressions, [
+            ('list', 'p50_ms', 10.0, 13.0),
+            ('list', 'p90_ms', 20.0, 26.0),
+            ('detail', 'queries', 3, 4),
+        ])
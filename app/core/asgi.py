@@ -0,0 +1,63 @@
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers import asgi
+
+
+# Marks the end of a stream of parts
+_end = object()
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """Django's ASGI handler, reading streaming responses off the event loop
+
+    Django 3.2 iterates streaming content on the event loop thread, where
+    the ORM raises SynchronousOnlyOperation, so a view streaming a queryset
+    would send its headers and then fail. Each part is read on the thread
+    sync views run on instead.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            await super().send_response(response, send)
+            return
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': get_headers(response),
+        })
+        parts = iter(response)
+        read = sync_to_async(next, thread_sensitive=True)
+        while True:
+            part = await read(parts, _end)
+            if part is _end:
+                break
+            for chunk, _ in self.chunk_bytes(part):
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+
+def get_headers(response):
+    """Get the headers and cookies of a response as ASGI header pairs"""
+    headers = [
+        (
+            header.encode('ascii') if isinstance(header, str) else header,
+            value.encode('latin1') if isinstance(value, str) else value,
+        )
+        for header, value in response.items()
+    ]
+    headers += [
+        (b'Set-Cookie', cookie.output(header='').encode('ascii').strip())
+        for cookie in response.cookies.values()
+    ]
+    return headers
+
+
+def get_asgi_application():
+    """Set up Django and get the ASGI application, as Django's own does"""
+    django.setup(set_prefix=False)
+    return ASGIHandler()
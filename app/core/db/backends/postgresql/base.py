@@ -0,0 +1,111 @@
+"""PostgreSQL backend with connection health checks and pooling
+
+Connections kept open between requests (CONN_MAX_AGE) are checked before
+their first use in each request when CONN_HEALTH_CHECKS is set, so a
+connection dropped by the server does not fail the request.
+
+When the database settings have a POOL dictionary, connections are taken
+from a process-wide pool shared by all threads instead of being opened,
+and handed back to it instead of being closed. POOL takes MAX_SIZE,
+TIMEOUT (seconds to wait for a free connection), CHECK_AFTER (idle seconds
+after which a connection is checked before reuse) and MAX_LIFETIME.
+"""
+from django.db.backends.postgresql import base
+from psycopg2.extras import register_default_jsonb
+
+from core.db.pool import ConnectionPool, PoolTimeout, get_pool
+
+
+Database = base.Database
+
+
+def connect(conn_params):
+    connection = Database.connect(**conn_params)
+    # As the PostgreSQL backend does, leave jsonb undecoded for JSONField
+    register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+    return connection
+
+
+def check_connection(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except Database.Error:
+        return False
+    return True
+
+
+def reset_connection(connection):
+    """Roll back and reset the session of a connection going back to a pool
+
+    Raises an error when the connection is broken, so it is closed instead.
+    """
+    if connection.closed:
+        raise Database.InterfaceError('connection already closed')
+    connection.reset()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_needed = False
+
+    @property
+    def pool_options(self):
+        return self.settings_dict.get('POOL')
+
+    def get_pool(self, conn_params):
+        options = self.pool_options
+        name = f"{self.alias}:{conn_params.get('database')}"
+        return get_pool(name, lambda: ConnectionPool(
+            connect=lambda: connect(conn_params),
+            check=check_connection,
+            reset=reset_connection,
+            max_size=options.get('MAX_SIZE', 10),
+            timeout=options.get('TIMEOUT', 10.0),
+            check_after=options.get('CHECK_AFTER', 30.0),
+            max_lifetime=options.get('MAX_LIFETIME'),
+        ))
+
+    def get_new_connection(self, conn_params):
+        if not self.pool_options:
+            return super().get_new_connection(conn_params)
+        self.pool = self.get_pool(conn_params)
+        try:
+            connection = self.pool.acquire()
+        except PoolTimeout as error:
+            raise Database.OperationalError(str(error)) from error
+        # Resetting a pooled connection restores the default isolation level
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get(
+            'isolation_level', connection.isolation_level
+        )
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is not None and self.pool_options:
+            if self.in_atomic_block:
+                # The wrapper keeps the connection until the atomic block
+                # exits, so it must not be handed to another thread
+                self.pool.discard(self.connection)
+            else:
+                self.pool.release(self.connection)
+            return
+        super()._close()
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        # Called as each request starts and finishes
+        if self.connection is not None and \
+                self.settings_dict.get('CONN_HEALTH_CHECKS'):
+            self.health_check_needed = True
+
+    def ensure_connection(self):
+        if self.health_check_needed:
+            self.health_check_needed = False
+            if self.connection is not None and not self.is_usable():
+                self.close()
+        super().ensure_connection()
@@ -0,0 +1,171 @@
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """No connection became free within the pool's wait timeout"""
+
+
+class ConnectionPool:
+    """Thread-safe pool of open database connections
+
+    Holds up to `max_size` connections made by `connect`. Callers wait up to
+    `timeout` seconds for one to be released when they are all in use.
+    Connections idle for more than `check_after` seconds are checked with
+    `check` before they are handed out, and connections older than
+    `max_lifetime` seconds are closed instead of being reused.
+    """
+
+    def __init__(self, connect, check, reset, max_size=10, timeout=10.0,
+                 check_after=30.0, max_lifetime=None):
+        self.connect = connect
+        self.check = check
+        self.reset = reset
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_after = check_after
+        self.max_lifetime = max_lifetime
+        self._condition = threading.Condition()
+        # Idle connections as (connection, released), the most recently
+        # released last so the warmest connections are reused first
+        self._idle = deque()
+        # Creation time of every open connection, by id
+        self._created = {}
+        self._size = 0
+        self._counters = {
+            'connections_opened': 0,
+            'connections_closed': 0,
+            'acquired': 0,
+            'waited': 0,
+            'wait_seconds': 0.0,
+            'timeouts': 0,
+            'failed_checks': 0,
+        }
+
+    def acquire(self):
+        """Take a healthy connection, opening a new one if there is room"""
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        while True:
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters['timeouts'] += 1
+                        raise PoolTimeout(
+                            f'No database connection free after waiting '
+                            f'{self.timeout} seconds'
+                        )
+                    if not waited:
+                        waited = True
+                        self._counters['waited'] += 1
+                    start = time.monotonic()
+                    self._condition.wait(remaining)
+                    self._counters['wait_seconds'] += time.monotonic() - start
+                if self._idle:
+                    connection, released = self._idle.pop()
+                else:
+                    # Take the place before connecting outside the lock
+                    connection = None
+                    self._size += 1
+
+            if connection is None:
+                return self._open()
+            idle = time.monotonic() - released
+            if idle > self.check_after and not self.check(connection):
+                with self._condition:
+                    self._counters['failed_checks'] += 1
+                self.discard(connection)
+                continue
+            with self._condition:
+                self._counters['acquired'] += 1
+            return connection
+
+    def _open(self):
+        try:
+            connection = self.connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._created[id(connection)] = time.monotonic()
+            self._counters['connections_opened'] += 1
+            self._counters['acquired'] += 1
+        return connection
+
+    def release(self, connection):
+        """Return a connection, closing it if it is broken or too old"""
+        with self._condition:
+            created = self._created.get(id(connection))
+        if created is None:
+            return
+        expired = (self.max_lifetime is not None and
+                   time.monotonic() - created >= self.max_lifetime)
+        if expired:
+            self.discard(connection)
+            return
+        try:
+            self.reset(connection)
+        except Exception:
+            self.discard(connection)
+            return
+        with self._condition:
+            self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def discard(self, connection):
+        """Close a connection and free its place in the pool"""
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._condition:
+            if self._created.pop(id(connection), None) is not None:
+                self._size -= 1
+                self._counters['connections_closed'] += 1
+            self._condition.notify()
+
+    def close_all(self):
+        """Close the idle connections"""
+        with self._condition:
+            idle, self._idle = list(self._idle), deque()
+        for connection, _ in idle:
+            self.discard(connection)
+
+    def stats(self):
+        """Get the pool's size, usage and wait counters"""
+        with self._condition:
+            size = self._size
+            idle = len(self._idle)
+            counters = dict(self._counters)
+        counters['wait_seconds'] = round(counters['wait_seconds'], 6)
+        return {
+            'max_size': self.max_size,
+            'size': size,
+            'in_use': size - idle,
+            'idle': idle,
+            **counters,
+        }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name, create):
+    """Get the named process-wide pool, creating it on first use"""
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = _pools[name] = create()
+        return pool
+
+
+def get_pool_stats():
+    """Get the stats of every pool in this process, by name"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {name: pool.stats() for name, pool in pools.items()}
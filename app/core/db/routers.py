@@ -0,0 +1,57 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+_primary_pinned = ContextVar('primary_pinned', default=False)
+
+
+@contextmanager
+def use_primary():
+    """Send reads to the primary database while the context is active"""
+    token = _primary_pinned.set(True)
+    try:
+        yield
+    finally:
+        _primary_pinned.reset(token)
+
+
+def primary_pinned():
+    """Check whether reads are being kept on the primary database"""
+    return _primary_pinned.get()
+
+
+def reads_use_replicas():
+    """Check whether a read made now would be sent to a replica"""
+    return bool(settings.DATABASE_REPLICAS) and not primary_pinned() and \
+        not connections[DEFAULT_DB_ALIAS].in_atomic_block
+
+
+class ReplicaRouter:
+    """Spread reads over the DATABASE_REPLICAS, and write to the primary
+
+    Reads stay on the primary inside use_primary(), which is used for a
+    while after a client writes, and inside a transaction on the primary,
+    so they see changes the replicas may not have received yet. With no
+    replicas configured everything goes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not reads_use_replicas():
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        return obj1._state.db in databases and obj2._state.db in databases
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas get their schema by replicating the primary
+        return db not in settings.DATABASE_REPLICAS
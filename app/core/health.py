@@ -0,0 +1,22 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+
+def check_database(alias=DEFAULT_DB_ALIAS):
+    """Run a trivial query, raising OperationalError if the database is down"""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except Exception:
+        # Drop the failed connection so the next check reconnects
+        connection.close()
+        raise
+
+
+def get_unapplied_migrations(alias=DEFAULT_DB_ALIAS):
+    """Get the migrations not yet applied to the database"""
+    executor = MigrationExecutor(connections[alias])
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    return [migration for migration, backwards in plan]
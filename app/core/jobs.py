@@ -0,0 +1,246 @@
+"""Database-backed queue of background jobs
+
+Jobs are rows of core.models.Job, run by `python manage.py process_jobs`
+workers, so slow work can leave the request thread without a separate
+broker. Each kind of job has a handler registered with @handler, called
+with the job payload as keyword arguments. Whatever it returns, which must
+be JSON serializable, is saved as the job result. Jobs that take a stored
+upload get its id as their `upload` argument.
+"""
+import codecs
+import logging
+import threading
+import traceback
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import count
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.db.routers import use_primary
+from core.models import Job, UploadChunk
+
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+# Kinds of job failed rather than run again when their worker is lost
+_not_requeued = set()
+
+# Bytes of an upload stored per row
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def handler(kind, requeue=True):
+    """Register a function as the handler of a kind of job
+
+    Pass requeue=False for handlers that are not safe to run again after
+    stopping partway, so their jobs fail when their worker is lost.
+    """
+    def register(func):
+        _handlers[kind] = func
+        if not requeue:
+            _not_requeued.add(kind)
+        return func
+    return register
+
+
+def enqueue(kind, **payload):
+    """Queue a job for a worker to run, returning the job"""
+    if kind not in _handlers:
+        raise ValueError(f'No handler for {kind} jobs')
+    return Job.objects.create(kind=kind, payload=payload)
+
+
+def store_upload(stream, chunk_size=None):
+    """Store a stream for a job to read, returning the upload id
+
+    Call inside the transaction queueing the job, so the upload is complete
+    by the time a worker can claim it. Raises UnicodeDecodeError if the
+    stream is not UTF-8.
+    """
+    chunk_size = chunk_size or UPLOAD_CHUNK_SIZE
+    upload_id = uuid.uuid4()
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for position in count():
+        data = stream.read(chunk_size)
+        decoder.decode(data, final=not data)
+        if not data:
+            return upload_id
+        UploadChunk.objects.create(
+            upload_id=upload_id, position=position, data=data
+        )
+
+
+def read_upload_lines(upload_id):
+    """Yield the lines of a stored upload, reading a chunk at a time"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    pending = ''
+    # The upload was committed on the primary, a replica may not have it yet
+    with use_primary():
+        for position in count():
+            data = UploadChunk.objects \
+                .filter(upload_id=upload_id, position=position) \
+                .values_list('data', flat=True) \
+                .first()
+            if data is None:
+                break
+            pending += decoder.decode(bytes(data))
+            *lines, pending = pending.split('\n')
+            yield from lines
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def delete_upload(upload_id):
+    UploadChunk.objects.filter(upload_id=upload_id).delete()
+
+
+def requeue_expired_jobs():
+    """Queue again the running jobs whose worker has stopped renewing them
+
+    Jobs already started JOB_MAX_ATTEMPTS times are failed instead, in case
+    they are what brings their workers down, as are the kinds of job that
+    are not requeued. The uploads of failed jobs are deleted.
+    """
+    now = timezone.now()
+    expired = Job.objects.filter(
+        status=Job.RUNNING,
+        heartbeat_at__lt=now - timedelta(seconds=settings.JOB_LEASE_SECONDS),
+    )
+    failed = 0
+    for job_id, payload in expired \
+            .filter(
+                Q(attempts__gte=settings.JOB_MAX_ATTEMPTS)
+                | Q(kind__in=_not_requeued)
+            ) \
+            .values_list('id', 'payload'):
+        # Failed one at a time, so only the uploads of jobs still expired
+        # when failed are deleted
+        if expired.filter(id=job_id).update(
+            status=Job.FAILED,
+            error='The worker running the job stopped renewing its lease',
+            finished_at=now,
+        ):
+            failed += 1
+            if 'upload' in payload:
+                delete_upload(payload['upload'])
+    requeued = expired.update(status=Job.QUEUED, heartbeat_at=None)
+    if failed or requeued:
+        logger.warning(
+            'Requeued %d and failed %d jobs whose workers were lost',
+            requeued, failed,
+        )
+
+
+def claim_job():
+    """Mark the oldest queued job as running and return it, None if none
+
+    Workers race to move a job from queued to running with a conditional
+    update, so each job is claimed by exactly one of them. Jobs whose
+    workers were lost are queued again first.
+    """
+    # A replica may not have the job yet, or still show it queued
+    with use_primary():
+        requeue_expired_jobs()
+        while True:
+            job = Job.objects.filter(status=Job.QUEUED).order_by('id').first()
+            if job is None:
+                return None
+            now = timezone.now()
+            claimed = Job.objects \
+                .filter(id=job.id, status=Job.QUEUED, attempts=job.attempts) \
+                .update(
+                    status=Job.RUNNING, started_at=now, heartbeat_at=now,
+                    attempts=F('attempts') + 1,
+                )
+            if claimed:
+                job.status = Job.RUNNING
+                job.started_at = job.heartbeat_at = now
+                job.attempts += 1
+                return job
+
+
+def get_claim(job):
+    """Get the running job, as long as this run of it still holds it"""
+    return Job.objects.filter(
+        id=job.id, status=Job.RUNNING, attempts=job.attempts
+    )
+
+
+@contextmanager
+def lease(job):
+    """Renew the lease on a claimed job, from another thread, while active"""
+    done = threading.Event()
+
+    def renew():
+        try:
+            while not done.wait(settings.JOB_LEASE_SECONDS / 3):
+                try:
+                    get_claim(job).update(heartbeat_at=timezone.now())
+                except DatabaseError:
+                    # Losing one renewal is fine, the lease outlasts a few
+                    logger.exception('Failed to renew the lease on %s', job)
+                    close_old_connections()
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=renew, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        done.set()
+        thread.join()
+
+
+def run_job(job):
+    """Run a claimed job and save its result, or its error if it fails
+
+    Nothing is saved if the job was queued again, having lost its lease,
+    while it ran.
+    """
+    with lease(job):
+        try:
+            job.result = _handlers[job.kind](**job.payload)
+            job.status = Job.SUCCEEDED
+        except Exception:
+            logger.exception('%s failed', job)
+            job.error = traceback.format_exc()
+            job.status = Job.FAILED
+    job.finished_at = timezone.now()
+    saved = get_claim(job).update(
+        status=job.status, result=job.result, error=job.error,
+        finished_at=job.finished_at,
+    )
+    if not saved:
+        logger.warning('%s lost its lease before it finished', job)
+
+
+def work(stop, poll_interval, burst=False):
+    """Claim and run jobs until stop is set
+
+    With burst, returns as soon as the queue is empty instead of polling
+    for new jobs. Returns the number of jobs run.
+    """
+    count = 0
+    while not stop.is_set():
+        try:
+            job = claim_job()
+            if job is not None:
+                run_job(job)
+                count += 1
+        finally:
+            # Like a request, drop connections that are broken or too old
+            close_old_connections()
+        if job is None:
+            if burst:
+                break
+            stop.wait(poll_interval)
+    return count
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from recipe import snapshots
+
+
+class Command(BaseCommand):
+    """Django command to pre-render every recipe and the first list pages"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=settings.RECIPE_BULK_CHUNK_SIZE,
+            help='Number of recipes to render per transaction'
+        )
+        parser.add_argument(
+            '--list-pages', type=int,
+            default=settings.RECIPE_SNAPSHOT_LIST_PAGES,
+            help='Number of pages of the recipe list to render'
+        )
+
+    def handle(self, *args, **options):
+        recipe_ids = Recipe.objects.order_by('id') \
+            .values_list('id', flat=True) \
+            .iterator(chunk_size=options['chunk_size'])
+        details = snapshots.build_details(recipe_ids, options['chunk_size'])
+        pages = snapshots.build_list_pages(options['list_pages'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Built {details} recipe snapshots and {pages} list pages'
+        ))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Recipe, get_ingredient_names, \
+    refresh_ingredient_names
+
+
+class Command(BaseCommand):
+    """Django command to find recipes whose ingredient snapshot has drifted"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Rebuild the drifted snapshots from the ingredient table'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Number of recipes to compare per query'
+        )
+
+    def handle(self, *args, **options):
+        drifted = []
+        chunk = {}
+        rows = Recipe.objects.order_by('id') \
+            .values_list('id', 'ingredient_names') \
+            .iterator(chunk_size=options['chunk_size'])
+        for recipe_id, snapshot in rows:
+            chunk[recipe_id] = snapshot
+            if len(chunk) == options['chunk_size']:
+                drifted += self.compare(chunk)
+                chunk = {}
+        drifted += self.compare(chunk)
+
+        for recipe_id in drifted:
+            self.stderr.write(f'Recipe {recipe_id}: snapshot has drifted')
+        if drifted and options['fix']:
+            refresh_ingredient_names(drifted)
+            self.stdout.write(self.style.SUCCESS(
+                f'Rebuilt {len(drifted)} ingredient snapshots'
+            ))
+        elif drifted:
+            raise CommandError(
+                f'{len(drifted)} ingredient snapshots have drifted, '
+                f'run with --fix to rebuild them'
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                'Every ingredient snapshot matches'
+            ))
+
+    @staticmethod
+    def compare(snapshots):
+        """Get the recipes whose snapshot differs from their ingredients"""
+        if not snapshots:
+            return []
+        names = get_ingredient_names(snapshots)
+        return [
+            recipe_id for recipe_id, snapshot in snapshots.items()
+            if snapshot != names[recipe_id]
+        ]
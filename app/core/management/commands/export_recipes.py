@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from recipe.bulk import export_recipes
+
+
+class Command(BaseCommand):
+    """Django command to export all recipes as JSON Lines"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int,
+            help='Number of recipes to read per round trip'
+        )
+
+    def handle(self, *args, **options):
+        for line in export_recipes(options['chunk_size']):
+            self.stdout.write(line, ending='')
@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.bulk import import_recipes
+
+
+class Command(BaseCommand):
+    """Django command to bulk import recipes from a JSON Lines file"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='JSON Lines file to import, or - for stdin'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int,
+            help='Number of recipes to write per transaction'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            source = sys.stdin if path == '-' else open(path)
+        except OSError as error:
+            raise CommandError(error)
+
+        with source:
+            report = import_recipes(source, options['chunk_size'])
+
+        for error in report['errors']:
+            self.stderr.write(f"Line {error['line']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} recipes, "
+            f"{len(report['errors'])} failed"
+        ))
@@ -0,0 +1,68 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    """Django command to run queued background jobs"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int,
+            help='Number of jobs to run at once, each on its own thread'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float,
+            help='Seconds an idle worker waits before looking for new jobs'
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once the queue is empty instead of waiting for jobs'
+        )
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency'] or \
+            settings.JOB_WORKER_CONCURRENCY
+        poll_interval = options['poll_interval'] or \
+            settings.JOB_POLL_INTERVAL
+        stop = threading.Event()
+        handlers = {}
+        if threading.current_thread() is threading.main_thread():
+            # Finish the running jobs, rather than abandon them, on shutdown
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                handlers[signum] = signal.signal(
+                    signum, lambda *args: stop.set()
+                )
+
+        self.stdout.write(f'Running jobs on {concurrency} threads...')
+        try:
+            count = self.run(concurrency, stop, poll_interval, options)
+        finally:
+            for signum, previous in handlers.items():
+                signal.signal(signum, previous)
+        self.stdout.write(self.style.SUCCESS(f'Ran {count} jobs'))
+
+    @staticmethod
+    def run(concurrency, stop, poll_interval, options):
+        """Run jobs on the given number of threads, returning the count"""
+        if concurrency == 1:
+            return jobs.work(stop, poll_interval, options['burst'])
+
+        counts = [0] * concurrency
+
+        def work(index):
+            counts[index] = jobs.work(stop, poll_interval, options['burst'])
+
+        threads = [
+            threading.Thread(target=work, args=(index,))
+            for index in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sum(counts)
@@ -1,20 +1,68 @@
+import random
 import time
 
-from django.db import connections
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+
+from core.health import check_database, get_unapplied_migrations
 
 
 class Command(BaseCommand):
     """Django command to pause execution until database is available"""
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database alias to wait for'
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=60.0,
+            help='Seconds to wait in total before giving up'
+        )
+        parser.add_argument(
+            '--initial-delay', type=float, default=0.1,
+            help='Seconds to wait after the first failed attempt'
+        )
+        parser.add_argument(
+            '--max-delay', type=float, default=5.0,
+            help='Longest wait between attempts'
+        )
+        parser.add_argument(
+            '--check-migrations', action='store_true',
+            help='Also wait until every migration has been applied'
+        )
+
     def handle(self, *args, **options):
         self.stdout.write('Waiting for database...')
-        db_conn = None
-        while not db_conn:
-            try:
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
+        deadline = time.monotonic() + options['timeout']
+        attempt = 0
+        while True:
+            problem = self.check(options)
+            if problem is None:
+                break
+            delay = min(
+                options['max_delay'], options['initial_delay'] * 2 ** attempt
+            )
+            # Jitter the delay so restarted containers do not retry in step
+            delay = random.uniform(delay / 2, delay)
+            if time.monotonic() + delay > deadline:
+                raise CommandError(
+                    f"{problem}, gave up after {options['timeout']} seconds"
+                )
+            self.stdout.write(f'{problem}, waiting {delay:.2f} seconds...')
+            time.sleep(delay)
+            attempt += 1
         self.stdout.write(self.style.SUCCESS('Database available!'))
+
+    def check(self, options):
+        """Get what the database is not ready for, or None when it is"""
+        try:
+            check_database(options['database'])
+        except OperationalError:
+            return 'Database unavailable'
+        if options['check_migrations']:
+            pending = get_unapplied_migrations(options['database'])
+            if pending:
+                return f'{len(pending)} migrations not applied'
+        return None
@@ -0,0 +1,175 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+
+
+# Upper bounds in milliseconds of the request duration histogram buckets
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+SUMMED_FIELDS = ('total_ms', 'db_ms', 'serialize_ms', 'queries', 'bytes')
+
+_current_timing = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """Timings of one request, gathered while it is the current timing
+
+    The current timing is held in a context variable, so queries run by
+    worker threads on behalf of an async view are counted too.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_started = None
+        self.render_finished = None
+
+    def __enter__(self):
+        self._token = _current_timing.set(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.finished = time.perf_counter()
+        _current_timing.reset(self._token)
+
+    def rendered(self, response):
+        self.render_finished = time.perf_counter()
+
+    @property
+    def total_ms(self):
+        return (self.finished - self.started) * 1000
+
+    @property
+    def db_ms(self):
+        return self.db_seconds * 1000
+
+    @property
+    def serialize_ms(self):
+        if self.render_finished is None:
+            return 0.0
+        return (self.render_finished - self.render_started) * 1000
+
+
+def time_query(execute, sql, params, many, context):
+    """Database execute wrapper adding queries to the current timing"""
+    timing = _current_timing.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.db_seconds += time.perf_counter() - start
+        timing.queries += 1
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """Add the query timer to a new database connection"""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class RequestMetrics:
+    """In-process aggregate of request measurements, grouped by route"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route, total_ms, db_ms, serialize_ms, queries, size):
+        """Add the measurements of one request to its route"""
+        bucket = bisect_left(HISTOGRAM_BUCKETS_MS, total_ms)
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = {
+                    'count': 0,
+                    'histogram': [0] * (len(HISTOGRAM_BUCKETS_MS) + 1),
+                    **{field: 0 for field in SUMMED_FIELDS},
+                }
+            stats['count'] += 1
+            stats['histogram'][bucket] += 1
+            stats['total_ms'] += total_ms
+            stats['db_ms'] += db_ms
+            stats['serialize_ms'] += serialize_ms
+            stats['queries'] += queries
+            stats['bytes'] += size
+
+    def snapshot(self):
+        """Get the per-route totals, means and duration histograms"""
+        with self._lock:
+            routes = {
+                route: dict(stats, histogram=list(stats['histogram']))
+                for route, stats in self._routes.items()
+            }
+
+        labels = [f'le_{bound}ms' for bound in HISTOGRAM_BUCKETS_MS] + ['inf']
+        for stats in routes.values():
+            count = stats['count']
+            for field in SUMMED_FIELDS:
+                stats[f'mean_{field}'] = round(stats[field] / count, 3)
+            stats['total_ms'] = round(stats['total_ms'], 3)
+            stats['db_ms'] = round(stats['db_ms'], 3)
+            stats['serialize_ms'] = round(stats['serialize_ms'], 3)
+            stats['histogram'] = dict(zip(labels, stats['histogram']))
+        return routes
+
+    def reset(self):
+        with self._lock:
+            self._routes = {}
+
+
+class LoadMetrics:
+    """In-process counts of requests in flight, shed and throttled"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.reset()
+
+    def admit(self, limit):
+        """Count a request in flight, unless limit are already, 0 for none
+
+        Returns whether the request was admitted. Admitted requests must be
+        released once they are done.
+        """
+        with self._lock:
+            if limit and self._in_flight >= limit:
+                self._counts['shed'] += 1
+                return False
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+            self._counts['admitted'] += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def throttled(self, scope):
+        with self._lock:
+            self._throttled[scope] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'in_flight': self._in_flight,
+                'peak_in_flight': self._peak_in_flight,
+                'admitted': self._counts['admitted'],
+                'shed': self._counts['shed'],
+                'throttled': dict(self._throttled),
+            }
+
+    def reset(self):
+        """Zero the counts, keeping the requests still in flight"""
+        with self._lock:
+            self._peak_in_flight = self._in_flight
+            self._counts = Counter()
+            self._throttled = Counter()
+
+
+request_metrics = RequestMetrics()
+load_metrics = LoadMetrics()
@@ -0,0 +1,368 @@
+import asyncio
+import gzip
+import random
+import time
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+
+from core.db.routers import use_primary
+from core.metrics import RequestTiming, load_metrics, request_metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class LoadSheddingMiddleware:
+    """Turn requests away with 503 while too many are in flight
+
+    Every request in flight holds a database connection and runs queries
+    on it. Past LOAD_SHED_MAX_IN_FLIGHT requests at once in this process,
+    new ones are answered straight away with 503 Service Unavailable and a
+    Retry-After of LOAD_SHED_RETRY_AFTER seconds, rather than queueing for
+    the database and making it slower still. Paths starting with one of
+    LOAD_SHED_EXEMPT_PATHS, such as probes and metrics, are always served.
+    A limit of 0 turns shedding off. Decisions are counted in load_metrics.
+
+    Streaming responses stay in flight until they have been sent, since
+    they query the database as they stream.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if self.is_exempt(request):
+            return self.get_response(request)
+        if not load_metrics.admit(settings.LOAD_SHED_MAX_IN_FLIGHT):
+            return self.shed()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            load_metrics.release()
+            raise
+        return self.finish(response)
+
+    async def __acall__(self, request):
+        if self.is_exempt(request):
+            return await self.get_response(request)
+        if not load_metrics.admit(settings.LOAD_SHED_MAX_IN_FLIGHT):
+            return self.shed()
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            load_metrics.release()
+            raise
+        return self.finish(response)
+
+    @staticmethod
+    def is_exempt(request):
+        return request.path.startswith(tuple(settings.LOAD_SHED_EXEMPT_PATHS))
+
+    @staticmethod
+    def shed():
+        response = JsonResponse(
+            {'detail': 'The server is busy, please retry later.'},
+            status=503,
+        )
+        response['Retry-After'] = str(settings.LOAD_SHED_RETRY_AFTER)
+        return response
+
+    @staticmethod
+    def finish(response):
+        if response.streaming:
+            response.streaming_content = ReleaseOnClose(
+                response.streaming_content, load_metrics.release
+            )
+        else:
+            load_metrics.release()
+        return response
+
+
+class ReleaseOnClose:
+    """Iterable calling release once closed, whether or not it was read"""
+
+    def __init__(self, iterable, release):
+        self.iterable = iterable
+        self.release = release
+        self.closed = False
+
+    def __iter__(self):
+        yield from self.iterable
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.release()
+
+
+class ReadPrimary:
+    """Iterator reading from the primary database for each item it yields
+
+    Reads are pinned for each item rather than across yields, so nothing
+    run between items, by the server, is pinned too.
+    """
+
+    def __init__(self, iterable):
+        self.iterator = iter(iterable)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with use_primary():
+            return next(self.iterator)
+
+
+class RequestMetricsMiddleware:
+    """Measure sampled requests
+
+    Records the total time, database query count and time, time spent
+    serializing (rendering) the response and its size for a sample of
+    requests. They are sent back in a Server-Timing header and added to
+    the per-route aggregate. Requests outside the sample pass straight
+    through.
+
+    Runs natively in both WSGI and ASGI mode, so it does not force async
+    views onto a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            # Mark the instance as a coroutine function, as Django's
+            # MiddlewareMixin does, so the handler awaits it
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not self.is_sampled():
+            return self.get_response(request)
+        with RequestTiming() as timing:
+            request.metrics_timing = timing
+            response = self.get_response(request)
+        return self.finish(request, response, timing)
+
+    async def __acall__(self, request):
+        if not self.is_sampled():
+            return await self.get_response(request)
+        with RequestTiming() as timing:
+            request.metrics_timing = timing
+            response = await self.get_response(request)
+        return self.finish(request, response, timing)
+
+    @staticmethod
+    def is_sampled():
+        sample_rate = settings.REQUEST_METRICS_SAMPLE_RATE
+        return sample_rate > 0 and random.random() < sample_rate
+
+    def finish(self, request, response, timing):
+        size = 0 if response.streaming else len(response.content)
+        response['Server-Timing'] = ', '.join([
+            f'total;dur={timing.total_ms:.3f}',
+            f'db;dur={timing.db_ms:.3f};desc="{timing.queries} queries"',
+            f'serialize;dur={timing.serialize_ms:.3f}',
+        ])
+        request_metrics.record(
+            self.get_route(request),
+            total_ms=timing.total_ms,
+            db_ms=timing.db_ms,
+            serialize_ms=timing.serialize_ms,
+            queries=timing.queries,
+            size=size,
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        """Time the rendering of DRF responses, once the view has returned"""
+        timing = getattr(request, 'metrics_timing', None)
+        if timing is not None:
+            timing.render_started = time.perf_counter()
+            response.add_post_render_callback(timing.rendered)
+        return response
+
+    @staticmethod
+    def get_route(request):
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        return f'{request.method} {view_name}'
+
+
+class CompressionMiddleware:
+    """Compress responses with brotli or gzip, as the client accepts
+
+    Responses under RESPONSE_COMPRESSION_MIN_SIZE bytes are sent as they
+    are, since compressing them saves little for the CPU time it costs.
+    Streaming responses are compressed as they stream. Brotli is offered
+    when the brotli package is installed.
+
+    As Django's GZipMiddleware does, strong ETags on compressed responses
+    are made weak, since the bytes differ from those of other codings. The
+    recipe views compare If-Match weakly to match.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        if not response.streaming and \
+                len(response.content) < settings.RESPONSE_COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.get_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if encoding == 'br':
+                response.streaming_content = compress_brotli_sequence(
+                    response.streaming_content
+                )
+            else:
+                response.streaming_content = compress_sequence(
+                    response.streaming_content
+                )
+            del response['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = brotli.compress(
+                    response.content,
+                    quality=settings.RESPONSE_BROTLI_QUALITY,
+                )
+            else:
+                compressed = gzip.compress(
+                    response.content,
+                    compresslevel=settings.RESPONSE_GZIP_LEVEL,
+                    mtime=0,
+                )
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+    @staticmethod
+    def get_encoding(request):
+        """Get the best encoding the client accepts, None for none"""
+        supported = ('br', 'gzip') if brotli is not None else ('gzip',)
+        accepted = {}
+        header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        for item in header.split(','):
+            coding, _, params = item.strip().partition(';')
+            quality = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            accepted[coding.strip().lower()] = quality
+
+        best, best_quality = None, 0.0
+        for coding in supported:
+            quality = accepted.get(coding, accepted.get('*', 0.0))
+            # Earlier codings win ties, so brotli is preferred to gzip
+            if quality > best_quality:
+                best, best_quality = coding, quality
+        return best
+
+
+class PrimaryAfterWriteMiddleware:
+    """Keep a client reading from the primary database after it writes
+
+    Requests other than GET, HEAD and OPTIONS read from the primary, and a
+    successful one sets a cookie keeping the client's reads on the primary
+    for DATABASE_REPLICA_STICKY_SECONDS. Clients so see their own writes
+    even while the replicas lag behind. Streaming responses, which query
+    as they are sent, read from the primary until they are done. Does
+    nothing when no replicas are configured.
+    """
+    sync_capable = True
+    async_capable = True
+    cookie_name = 'db_primary'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not self.reads_primary(request):
+            return self.get_response(request)
+        with use_primary():
+            response = self.get_response(request)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        if not self.reads_primary(request):
+            return await self.get_response(request)
+        with use_primary():
+            response = await self.get_response(request)
+        return self.finish(request, response)
+
+    def reads_primary(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return False
+        return self.is_write(request) or self.cookie_name in request.COOKIES
+
+    @staticmethod
+    def is_write(request):
+        return request.method not in ('GET', 'HEAD', 'OPTIONS')
+
+    def finish(self, request, response):
+        if response.streaming:
+            response.streaming_content = ReadPrimary(
+                response.streaming_content
+            )
+        if self.is_write(request) and response.status_code < 400:
+            response.set_cookie(
+                self.cookie_name,
+                '1',
+                max_age=settings.DATABASE_REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+def compress_brotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=settings.RESPONSE_BROTLI_QUALITY)
+    for chunk in sequence:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
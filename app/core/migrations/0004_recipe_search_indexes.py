@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-16 22:27
+
+from django.db import migrations
+
+
+# PostgreSQL only, the expressions must match those built in recipe.search
+CREATE_SEARCH_INDEXES = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX recipe_name_trgm_idx ON core_recipe '
+    'USING gin (UPPER(name) gin_trgm_ops)',
+    "CREATE INDEX recipe_document_idx ON core_recipe USING gin (("
+    "setweight(to_tsvector('english'::regconfig, COALESCE(name, '')), 'A') "
+    "|| setweight(to_tsvector('english'::regconfig, "
+    "COALESCE(description, '')), 'B')))",
+    'CREATE INDEX ingredient_document_idx ON core_ingredient USING gin ('
+    "to_tsvector('english'::regconfig, COALESCE(name, '')))",
+]
+
+DROP_SEARCH_INDEXES = [
+    'DROP INDEX IF EXISTS ingredient_document_idx',
+    'DROP INDEX IF EXISTS recipe_document_idx',
+    'DROP INDEX IF EXISTS recipe_name_trgm_idx',
+]
+
+
+def run_on_postgresql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_recipe_name_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_postgresql(CREATE_SEARCH_INDEXES),
+            run_on_postgresql(DROP_SEARCH_INDEXES),
+        ),
+    ]
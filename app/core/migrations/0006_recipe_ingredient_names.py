@@ -0,0 +1,55 @@
+# Generated by Django 3.2.25 on 2026-10-16 22:43
+
+from django.db import migrations, models
+
+
+BACKFILL_CHUNK_SIZE = 1000
+
+
+def backfill_ingredient_names(apps, schema_editor):
+    Recipe = apps.get_model('core', 'Recipe')
+    Ingredient = apps.get_model('core', 'Ingredient')
+    recipe_ids = Recipe.objects.order_by('id') \
+        .values_list('id', flat=True).iterator()
+    chunk = []
+    for recipe_id in recipe_ids:
+        chunk.append(recipe_id)
+        if len(chunk) == BACKFILL_CHUNK_SIZE:
+            backfill_chunk(Recipe, Ingredient, chunk)
+            chunk = []
+    if chunk:
+        backfill_chunk(Recipe, Ingredient, chunk)
+
+
+def backfill_chunk(Recipe, Ingredient, recipe_ids):
+    names = {recipe_id: [] for recipe_id in recipe_ids}
+    for recipe_id, name in Ingredient.objects \
+            .filter(recipe_id__in=recipe_ids) \
+            .order_by('id') \
+            .values_list('recipe_id', 'name'):
+        names[recipe_id].append(name)
+    Recipe.objects.bulk_update(
+        [Recipe(id=recipe_id, ingredient_names=recipe_names)
+         for recipe_id, recipe_names in names.items()],
+        ['ingredient_names'],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_recipe_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_names',
+            field=models.JSONField(
+                blank=True, default=list, editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(
+            backfill_ingredient_names, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-16 22:45
+
+from django.db import migrations, models
+import django.db.models.expressions
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_ingredient_names'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(django.db.models.functions.text.Lower('name'), django.db.models.expressions.F('recipe'), name='ingredient_name_recipe_idx'),
+        ),
+    ]
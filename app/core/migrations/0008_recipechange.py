@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-16 23:00
+
+from django.db import migrations, models
+
+
+BACKFILL_CHUNK_SIZE = 1000
+
+
+def log_existing_recipes(apps, schema_editor):
+    """Log an upsert of every recipe, so syncing from the start gets all"""
+    Recipe = apps.get_model('core', 'Recipe')
+    RecipeChange = apps.get_model('core', 'RecipeChange')
+    recipe_ids = Recipe.objects.order_by('id') \
+        .values_list('id', flat=True).iterator()
+    chunk = []
+    for recipe_id in recipe_ids:
+        chunk.append(RecipeChange(recipe_id=recipe_id, op='upsert'))
+        if len(chunk) == BACKFILL_CHUNK_SIZE:
+            RecipeChange.objects.bulk_create(chunk)
+            chunk = []
+    RecipeChange.objects.bulk_create(chunk)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_ingredient_name_recipe_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe_id', models.BigIntegerField()),
+                ('op', models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete')], max_length=6)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(log_existing_recipes, migrations.RunPython.noop),
+    ]
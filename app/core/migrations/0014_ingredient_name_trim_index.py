@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-16 23:36
+
+from django.db import migrations, models
+import django.db.models.expressions
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_job_lease'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='ingredient_name_recipe_idx',
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(django.db.models.functions.text.Lower(django.db.models.functions.text.Trim('name')), django.db.models.expressions.F('recipe'), name='ingredient_name_recipe_idx'),
+        ),
+    ]
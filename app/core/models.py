@@ -1,10 +1,52 @@
-from django.db import models
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections, models, router, transaction
+from django.db.models.functions import Lower, Trim
+from django.dispatch import Signal
+
+from core.db.routers import use_primary
+
+
+_snapshots_managed = ContextVar('ingredient_snapshots_managed', default=False)
+_changes_managed = ContextVar('recipe_changes_managed', default=False)
+
+# Advisory lock key serializing writes to the recipe change log
+CHANGE_LOG_LOCK_ID = 0x7265636970650001
+
+# Sent with the ids of the recipes upserted and deleted whenever recipe
+# changes are logged, including by bulk writes that send no model signals
+recipes_changed = Signal()
+
+
+class RecipeQuerySet(models.QuerySet):
+    """QuerySet for Recipe objects"""
+
+    def with_ingredients(self):
+        """Load ingredients in one batched query rather than per recipe"""
+        return self.prefetch_related(models.Prefetch(
+            'ingredients', queryset=Ingredient.objects.order_by('id')
+        ))
 
 
 class Recipe(models.Model):
     """Recipe"""
     name = models.TextField(blank=False)
     description = models.TextField()
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Names of the recipe's ingredients in id order, denormalized so the
+    # recipe can be read from one row. Null when not yet snapshotted.
+    ingredient_names = models.JSONField(
+        default=list, null=True, blank=True, editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name', 'id'], name='recipe_name_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -19,5 +61,224 @@ class Ingredient(models.Model):
         related_name='ingredients'
     )
 
+    class Meta:
+        indexes = [
+            # Looks up the recipes having an ingredient by normalized name
+            models.Index(
+                Lower(Trim('name')), 'recipe',
+                name='ingredient_name_recipe_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.name
+
+
+class RecipeChange(models.Model):
+    """Entry in the log of recipe changes read by the change feed
+
+    Entries are committed in id order, so ids serve as sync tokens.
+    """
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    OPS = [(UPSERT, 'Upsert'), (DELETE, 'Delete')]
+
+    # Not a foreign key, as deletes are logged after the recipe is gone
+    recipe_id = models.BigIntegerField()
+    op = models.CharField(max_length=6, choices=OPS)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Finds the latest change to a recipe
+            models.Index(
+                fields=['recipe_id', 'id'], name='recipechange_recipe_id_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.op} recipe {self.recipe_id}'
+
+
+class RecipeSnapshot(models.Model):
+    """Pre-rendered recipe detail or list page, served without serializing
+
+    The token is the id of the latest recipe change the snapshot reflects,
+    so a snapshot is fresh until a later change is logged.
+    """
+    key = models.CharField(max_length=100, primary_key=True)
+    body = models.BinaryField()
+    token = models.BigIntegerField()
+    # What else is needed to serve the body, such as validators or cursors
+    meta = models.JSONField(default=dict)
+    built_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.key
+
+
+class Job(models.Model):
+    """Background job, run by a process_jobs worker
+
+    A worker running a job renews its lease by setting heartbeat_at. Once
+    the lease has run out the worker is taken to be gone, and the job is
+    queued again, up to JOB_MAX_ATTEMPTS runs.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUSES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Finds the oldest queued job for a worker to claim
+            models.Index(fields=['status', 'id'], name='job_status_id_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} job {self.id}'
+
+
+class UploadChunk(models.Model):
+    """Piece of a request body kept for a background job to read
+
+    Bodies are stored a piece at a time as they are read, so neither the
+    request nor the job holds the whole body in memory.
+    """
+    upload_id = models.UUIDField()
+    position = models.PositiveIntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['upload_id', 'position'],
+                name='uploadchunk_upload_position_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f'upload {self.upload_id} chunk {self.position}'
+
+
+class ThrottleBucket(models.Model):
+    """Token bucket of a client on a throttle scope, shared by processes
+
+    Times are seconds since the epoch. The bucket is full again, and so can
+    be deleted, from expires_at.
+    """
+    key = models.CharField(max_length=200, primary_key=True)
+    tokens = models.FloatField()
+    updated_at = models.FloatField()
+    expires_at = models.FloatField(db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
+def record_recipe_changes(upserted=(), deleted=()):
+    """Add changes to the recipe change log, in the current transaction
+
+    On PostgreSQL writers take turns from here until they commit, so an
+    entry can never become visible after one with a greater id, which a
+    client syncing in between would skip.
+    """
+    upserted, deleted = list(upserted), list(deleted)
+    changes = [
+        *(RecipeChange(recipe_id=recipe_id, op=RecipeChange.UPSERT)
+          for recipe_id in upserted),
+        *(RecipeChange(recipe_id=recipe_id, op=RecipeChange.DELETE)
+          for recipe_id in deleted),
+    ]
+    if not changes:
+        return
+    using = router.db_for_write(RecipeChange)
+    with transaction.atomic(using=using, savepoint=False):
+        connection = connections[using]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT pg_advisory_xact_lock(%s)', [CHANGE_LOG_LOCK_ID]
+                )
+        RecipeChange.objects.bulk_create(changes)
+    recipes_changed.send(
+        sender=RecipeChange, upserted=upserted, deleted=deleted
+    )
+
+
+@contextmanager
+def recipe_changes_managed():
+    """Stop recipe saves and deletes logging a change each
+
+    For code writing many recipes, which records their changes itself in
+    one batch.
+    """
+    token = _changes_managed.set(True)
+    try:
+        yield
+    finally:
+        _changes_managed.reset(token)
+
+
+def recipe_changes_are_managed():
+    return _changes_managed.get()
+
+
+def get_ingredient_names(recipe_ids, using=None):
+    """Get the ingredient names of each recipe from the ingredient table"""
+    names = {recipe_id: [] for recipe_id in recipe_ids}
+    for recipe_id, name in Ingredient.objects.db_manager(using) \
+            .filter(recipe_id__in=names) \
+            .order_by('id') \
+            .values_list('recipe_id', 'name'):
+        names[recipe_id].append(name)
+    return names
+
+
+def refresh_ingredient_names(recipe_ids):
+    """Rebuild the ingredient snapshot of recipes from the ingredient table"""
+    # Read back from the primary the ingredient writes just made there, and
+    # write there, as bulk_update() routes itself as a read
+    with use_primary():
+        names = get_ingredient_names(recipe_ids)
+        Recipe.objects.bulk_update(
+            [Recipe(id=recipe_id, ingredient_names=recipe_names)
+             for recipe_id, recipe_names in names.items()],
+            ['ingredient_names'],
+        )
+    return names
+
+
+@contextmanager
+def ingredient_snapshots_managed():
+    """Stop ingredient saves and deletes refreshing recipe snapshots
+
+    For code writing whole ingredient lists, which sets the snapshots itself
+    rather than have them rebuilt for every ingredient it touches.
+    """
+    token = _snapshots_managed.set(True)
+    try:
+        yield
+    finally:
+        _snapshots_managed.reset(token)
+
+
+def ingredient_snapshots_are_managed():
+    return _snapshots_managed.get()
@@ -0,0 +1,61 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSON renderer encoding with orjson when it is installed
+
+    The output is JSONRenderer's compact UTF-8 output, which it falls back
+    to without orjson or when other output is asked for, except for floats:
+    orjson may format them differently, such as 1e-05 for 1e-5, and writes
+    NaN and infinities as null where JSONRenderer raises. Values orjson
+    cannot encode natively, including dates and times so they are formatted
+    as DRF formats them, go through DRF's JSON encoder.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or \
+                not self.compact or \
+                self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        ret = orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+        # Escape the line terminators that are valid JSON but not JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028') \
+            .replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """MessagePack renderer for internal consumers, requires msgpack"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        assert msgpack is not None, \
+            'MessagePackRenderer requires the msgpack package to be installed'
+        if data is None:
+            return b''
+        return msgpack.packb(
+            data, default=self.encode_default, use_bin_type=True
+        )
+
+    @staticmethod
+    def encode_default(obj):
+        """Encode what msgpack cannot as it would appear in the JSON"""
+        return JSONRenderer.encoder_class().default(obj)
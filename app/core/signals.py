@@ -0,0 +1,46 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.db.routers import use_primary
+from core.models import Ingredient, Recipe, ingredient_snapshots_are_managed, \
+    recipe_changes_are_managed, record_recipe_changes, \
+    refresh_ingredient_names
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def refresh_recipe_snapshot(sender, instance, **kwargs):
+    """Keep the ingredient snapshot of a recipe in step with its ingredients
+
+    The recipe version is bumped too, as RecipeSerializer does when it
+    writes ingredients, so conditional requests see the change.
+    """
+    if ingredient_snapshots_are_managed():
+        return
+    names = refresh_ingredient_names([instance.recipe_id])
+    Recipe.objects.filter(pk=instance.recipe_id).update(
+        version=F('version') + 1, updated_at=timezone.now()
+    )
+    # Update the recipe the ingredient was saved with too, if it was loaded,
+    # so saving it later does not put the old version back
+    if Ingredient.recipe.is_cached(instance):
+        instance.recipe.ingredient_names = names[instance.recipe_id]
+        with use_primary():
+            instance.recipe.refresh_from_db(fields=['version', 'updated_at'])
+    if not recipe_changes_are_managed():
+        record_recipe_changes(upserted=[instance.recipe_id])
+
+
+@receiver(post_save, sender=Recipe)
+def log_recipe_save(sender, instance, raw=False, **kwargs):
+    """Add a saved recipe to the recipe change log"""
+    if not raw and not recipe_changes_are_managed():
+        record_recipe_changes(upserted=[instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def log_recipe_delete(sender, instance, **kwargs):
+    """Add a deleted recipe to the recipe change log"""
+    if not recipe_changes_are_managed():
+        record_recipe_changes(deleted=[instance.pk])
@@ -0,0 +1,14 @@
+from django.test.runner import DiscoverRunner, default_test_processes
+
+
+class ParallelTestRunner(DiscoverRunner):
+    """Test runner running tests in parallel across the CPU cores
+
+    --parallel still sets the number of processes, and the
+    DJANGO_TEST_PROCESSES environment variable the default.
+    """
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.set_defaults(parallel=default_test_processes())
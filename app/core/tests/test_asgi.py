@@ -0,0 +1,65 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+
+from app.asgi import application
+from recipe.tests.test_recipes_api import CHANGES_URL, given_recipe_exists
+
+
+EXPORT_URL = reverse('recipe:recipe-bulk-export')
+
+
+async def asgi_get(path):
+    """Send a GET through the ASGI application, returning status and body"""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'query_string': b'',
+        'headers': [(b'host', b'testserver')],
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 0),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    body = b''.join(message.get('body', b'') for message in messages[1:])
+    return messages[0]['status'], body
+
+
+class ASGIHandlerTests(TransactionTestCase):
+    """Test responses served by the ASGI application"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_streaming_responses(self):
+        """Test streamed recipe querysets are read in full under ASGI"""
+
+        # Given
+        await sync_to_async(given_recipe_exists)(name='Carrot Cake')
+
+        for url in (EXPORT_URL, CHANGES_URL):
+            # When
+            status_code, body = await asgi_get(url)
+
+            # Then the whole stream is sent
+            self.assertEqual(status_code, status.HTTP_200_OK)
+            lines = [json.loads(line) for line in body.splitlines()]
+            self.assertEqual(len(lines), 1)
+            self.assertIn('Carrot Cake', body.decode())
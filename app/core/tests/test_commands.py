@@ -1,9 +1,17 @@
+import json
+import tempfile
+from io import StringIO
 from unittest.mock import patch
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
 
+from core.models import Recipe
+from recipe.tests.test_recipes_api import given_ingredient_exists, \
+    given_recipe_exists
+
 
 class CommandTests(TestCase):
 
@@ -11,27 +19,145 @@ class CommandTests(TestCase):
         """Test waiting for db when db is available"""
 
         # Given
-        with patch('django.db.utils.ConnectionHandler.__getitem__') \
-                as mock_get_item:
-            mock_get_item.return_value = True
+        with patch('core.management.commands.wait_for_db.check_database') \
+                as mock_check:
 
             # When
-            call_command('wait_for_db')
+            call_command('wait_for_db', stdout=StringIO())
 
             # Then
-            self.assertEqual(mock_get_item.call_count, 1)
+            self.assertEqual(mock_check.call_count, 1)
 
     @patch('time.sleep', return_value=True)
     def test_wait_for_db(self, mock_time_sleep):
         """Test waiting for db"""
 
         # Given
-        with patch('django.db.utils.ConnectionHandler.__getitem__') \
-                as mock_get_item:
-            mock_get_item.side_effect = [OperationalError] * 5 + [True]
+        with patch('core.management.commands.wait_for_db.check_database') \
+                as mock_check:
+            mock_check.side_effect = [OperationalError] * 5 + [None]
 
             # When
-            call_command('wait_for_db')
+            call_command('wait_for_db', stdout=StringIO())
+
+            # Then the delay between attempts grows
+            self.assertEqual(mock_check.call_count, 6)
+            delays = [call.args[0] for call in mock_time_sleep.call_args_list]
+            self.assertEqual(len(delays), 5)
+            self.assertGreater(delays[-1], delays[0])
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_timeout(self, mock_time_sleep):
+        """Test waiting for db gives up after the timeout"""
+
+        # Given
+        with patch('core.management.commands.wait_for_db.check_database') \
+                as mock_check:
+            mock_check.side_effect = OperationalError
+
+            # When / Then
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', timeout=0, stdout=StringIO())
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_migrations(self, mock_time_sleep):
+        """Test waiting for db until its migrations are applied"""
+
+        # Given
+        with patch('core.management.commands.wait_for_db.'
+                   'get_unapplied_migrations') as mock_unapplied:
+            mock_unapplied.side_effect = [['0001_initial'], []]
+
+            # When
+            call_command(
+                'wait_for_db', check_migrations=True, stdout=StringIO()
+            )
 
             # Then
-            self.assertEqual(mock_get_item.call_count, 6)
+            self.assertEqual(mock_unapplied.call_count, 2)
+            self.assertEqual(mock_time_sleep.call_count, 1)
+
+    def test_import_recipes(self):
+        """Test importing recipes from a JSON Lines file"""
+
+        # Given
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as source:
+            for i in range(5):
+                source.write(json.dumps({
+                    'name': f'Recipe {i}',
+                    'description': 'MOCK_RECIPE_DESCRIPTION',
+                    'ingredients': [{'name': 'flour'}],
+                }) + '\n')
+            source.write(json.dumps({'name': 'No description'}) + '\n')
+            source.flush()
+
+            # When
+            out, err = StringIO(), StringIO()
+            call_command(
+                'import_recipes', source.name, chunk_size=2,
+                stdout=out, stderr=err
+            )
+
+        # Then the valid recipes are created
+        self.assertEqual(Recipe.objects.count(), 5)
+        self.assertIn('Imported 5 recipes, 1 failed', out.getvalue())
+
+        # Then the invalid line is reported
+        self.assertIn('Line 6', err.getvalue())
+
+    def test_export_recipes(self):
+        """Test exporting recipes as JSON Lines"""
+
+        # Given
+        recipe = given_recipe_exists(name='Carrot Cake')
+        given_ingredient_exists(recipe, name='carrots')
+
+        # When
+        out = StringIO()
+        call_command('export_recipes', stdout=out)
+
+        # Then the recipe is exported
+        self.assertEqual(json.loads(out.getvalue()), {
+            'id': recipe.id,
+            'name': 'Carrot Cake',
+            'description': 'MOCK_RECIPE_DESCRIPTION',
+            'ingredients': [{'name': 'carrots'}],
+        })
+
+    def test_check_ingredient_snapshots(self):
+        """Test drifted ingredient snapshots are found"""
+
+        # Given
+        recipe = given_recipe_exists(name='Carrot Cake')
+        given_ingredient_exists(recipe, name='carrots')
+        Recipe.objects.filter(id=recipe.id).update(ingredient_names=None)
+
+        # When / Then
+        err = StringIO()
+        with self.assertRaises(CommandError):
+            call_command(
+                'check_ingredient_snapshots', stdout=StringIO(), stderr=err
+            )
+        self.assertIn(f'Recipe {recipe.id}', err.getvalue())
+
+    def test_check_ingredient_snapshots_fix(self):
+        """Test drifted ingredient snapshots are rebuilt with --fix"""
+
+        # Given
+        recipe = given_recipe_exists(name='Carrot Cake')
+        given_ingredient_exists(recipe, name='carrots')
+        given_ingredient_exists(recipe, name='flour')
+        Recipe.objects.filter(id=recipe.id) \
+            .update(ingredient_names=['carrots'])
+
+        # When
+        out = StringIO()
+        call_command(
+            'check_ingredient_snapshots', fix=True,
+            stdout=out, stderr=StringIO()
+        )
+
+        # Then
+        self.assertIn('Rebuilt 1 ingredient snapshots', out.getvalue())
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.ingredient_names, ['carrots', 'flour'])
@@ -0,0 +1,144 @@
+import threading
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.db.pool import ConnectionPool, PoolTimeout, get_pool
+
+
+DB_POOL_METRICS_URL = reverse('core:db-pool-metrics')
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.healthy = True
+        self.closed = False
+        self.resets = 0
+
+    def close(self):
+        self.closed = True
+
+
+def reset(connection):
+    if not connection.healthy:
+        raise RuntimeError('connection broken')
+    connection.resets += 1
+
+
+def given_pool(**options):
+    return ConnectionPool(
+        connect=FakeConnection,
+        check=lambda connection: connection.healthy,
+        reset=reset,
+        **options
+    )
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def test_reuse_released_connection(self):
+        """Test a released connection is reset and handed out again"""
+
+        # Given
+        pool = given_pool(max_size=2)
+        connection = pool.acquire()
+
+        # When
+        pool.release(connection)
+
+        # Then
+        self.assertIs(pool.acquire(), connection)
+        self.assertEqual(connection.resets, 1)
+        stats = pool.stats()
+        self.assertEqual(stats['connections_opened'], 1)
+        self.assertEqual(stats['acquired'], 2)
+        self.assertEqual(stats['in_use'], 1)
+
+    def test_wait_for_released_connection(self):
+        """Test callers wait for a connection when the pool is full"""
+
+        # Given
+        pool = given_pool(max_size=1, timeout=5)
+        connection = pool.acquire()
+        timer = threading.Timer(0.05, pool.release, [connection])
+
+        # When
+        timer.start()
+        acquired = pool.acquire()
+
+        # Then
+        self.assertIs(acquired, connection)
+        stats = pool.stats()
+        self.assertEqual(stats['waited'], 1)
+        self.assertGreater(stats['wait_seconds'], 0)
+        self.assertEqual(stats['size'], 1)
+
+    def test_timeout_when_pool_exhausted(self):
+        """Test waiting for a connection gives up after the timeout"""
+
+        # Given
+        pool = given_pool(max_size=1, timeout=0.01)
+        pool.acquire()
+
+        # When / Then
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_broken_connection_replaced(self):
+        """Test an idle connection failing its check is replaced"""
+
+        # Given
+        pool = given_pool(max_size=1, check_after=0)
+        connection = pool.acquire()
+        pool.release(connection)
+        connection.healthy = False
+
+        # When
+        acquired = pool.acquire()
+
+        # Then
+        self.assertIsNot(acquired, connection)
+        self.assertTrue(connection.closed)
+        stats = pool.stats()
+        self.assertEqual(stats['failed_checks'], 1)
+        self.assertEqual(stats['connections_closed'], 1)
+        self.assertEqual(stats['size'], 1)
+
+    def test_expired_connection_closed_on_release(self):
+        """Test a connection past its maximum lifetime is not reused"""
+
+        # Given
+        pool = given_pool(max_size=1, max_lifetime=0)
+        connection = pool.acquire()
+
+        # When
+        pool.release(connection)
+
+        # Then
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+
+class DbPoolMetricsViewTests(SimpleTestCase):
+
+    def test_pool_stats_reported(self):
+        """Test the stats of each pool in the process are served"""
+
+        # Given
+        pool = get_pool('test:metrics', given_pool)
+        pool.release(pool.acquire())
+
+        # When
+        response = APIClient().get(DB_POOL_METRICS_URL)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = response.data['test:metrics']
+        self.assertEqual(stats['size'], 1)
+        self.assertEqual(stats['idle'], 1)
+        self.assertEqual(stats['acquired'], 1)
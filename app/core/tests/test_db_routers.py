@@ -0,0 +1,276 @@
+import unittest
+from contextlib import ExitStack, contextmanager
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connections
+from django.http import HttpResponse, HttpResponseBadRequest, \
+    StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, \
+    TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.db.routers import ReplicaRouter, primary_pinned, use_primary
+from core.middleware import PrimaryAfterWriteMiddleware
+from core.models import Recipe
+from recipe.tests.test_recipes_api import CHANGES_URL, RECIPES_URL, \
+    given_recipe_exists
+
+
+REPLICAS = ['replica_0', 'replica_1']
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_use_replicas(self):
+        """Test reads are spread over the replicas"""
+
+        # When
+        databases = {self.router.db_for_read(Recipe) for _ in range(100)}
+
+        # Then every replica is read from, and only the replicas
+        self.assertEqual(databases, set(REPLICAS))
+
+    def test_writes_use_primary(self):
+        """Test writes go to the primary"""
+
+        # When
+        database = self.router.db_for_write(Recipe)
+
+        # Then
+        self.assertEqual(database, 'default')
+
+    def test_pinned_reads_use_primary(self):
+        """Test reads go to the primary inside use_primary()"""
+
+        # When
+        with use_primary():
+            database = self.router.db_for_read(Recipe)
+
+        # Then
+        self.assertEqual(database, 'default')
+        self.assertIn(self.router.db_for_read(Recipe), REPLICAS)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """Test reads go to the primary when there are no replicas"""
+
+        # When
+        database = self.router.db_for_read(Recipe)
+
+        # Then
+        self.assertEqual(database, 'default')
+
+    def test_migrate_primary_only(self):
+        """Test only the primary is migrated"""
+
+        # Then
+        self.assertTrue(self.router.allow_migrate('default', 'core'))
+        self.assertFalse(self.router.allow_migrate('replica_0', 'core'))
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class PrimaryAfterWriteMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.pinned = None
+
+    def get_response(self, request):
+        self.pinned = primary_pinned()
+        return HttpResponse()
+
+    def test_read(self):
+        """Test a read uses the replicas and sets no cookie"""
+
+        # When
+        middleware = PrimaryAfterWriteMiddleware(self.get_response)
+        response = middleware(self.factory.get('/'))
+
+        # Then
+        self.assertFalse(self.pinned)
+        self.assertNotIn('db_primary', response.cookies)
+
+    @override_settings(DATABASE_REPLICA_STICKY_SECONDS=7)
+    def test_write(self):
+        """Test a write reads the primary and keeps the client on it"""
+
+        # When
+        middleware = PrimaryAfterWriteMiddleware(self.get_response)
+        response = middleware(self.factory.post('/'))
+
+        # Then
+        self.assertTrue(self.pinned)
+        self.assertEqual(response.cookies['db_primary']['max-age'], 7)
+        self.assertFalse(primary_pinned())
+
+    def test_failed_write(self):
+        """Test a failed write does not keep the client on the primary"""
+
+        # When
+        middleware = PrimaryAfterWriteMiddleware(
+            lambda request: HttpResponseBadRequest()
+        )
+        response = middleware(self.factory.patch('/'))
+
+        # Then
+        self.assertNotIn('db_primary', response.cookies)
+
+    def test_read_after_write(self):
+        """Test a read with the cookie set uses the primary"""
+
+        # Given
+        request = self.factory.get('/')
+        request.COOKIES['db_primary'] = '1'
+
+        # When
+        PrimaryAfterWriteMiddleware(self.get_response)(request)
+
+        # Then
+        self.assertTrue(self.pinned)
+
+    def test_streaming_read_after_write(self):
+        """Test a streaming response with the cookie set uses the primary"""
+
+        # Given
+        request = self.factory.get('/')
+        request.COOKIES['db_primary'] = '1'
+
+        def stream():
+            yield str(primary_pinned())
+
+        # When
+        response = PrimaryAfterWriteMiddleware(
+            lambda request: StreamingHttpResponse(stream())
+        )(request)
+
+        # Then the content is read from the primary as it streams
+        self.assertFalse(primary_pinned())
+        self.assertEqual(b''.join(response.streaming_content), b'True')
+        self.assertFalse(primary_pinned())
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """Test nothing is pinned when there are no replicas"""
+
+        # When
+        middleware = PrimaryAfterWriteMiddleware(self.get_response)
+        response = middleware(self.factory.post('/'))
+
+        # Then
+        self.assertFalse(self.pinned)
+        self.assertNotIn('db_primary', response.cookies)
+
+
+@unittest.skipUnless(
+    settings.DATABASE_REPLICAS, 'No replica databases are configured'
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    """Recipe API reads against the configured replicas
+
+    Replicas are test mirrors of the primary, so this runs against any
+    databases, such as SQLite aliases standing in for replicas.
+    """
+    databases = '__all__'
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+    @contextmanager
+    def capture_replica_queries(self):
+        with ExitStack() as stack:
+            yield [
+                stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in settings.DATABASE_REPLICAS
+            ]
+
+    def test_list_reads_replica(self):
+        """Test GET recipes/ is served from a replica"""
+
+        # Given
+        given_recipe_exists(name='Carrot Cake')
+
+        # When
+        with self.capture_replica_queries() as captures:
+            response = self.client.get(RECIPES_URL)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(any(len(capture) for capture in captures))
+
+    def test_read_after_write_uses_primary(self):
+        """Test GET recipes/ straight after a POST reads the primary"""
+
+        # Given
+        payload = {
+            'name': 'Carrot Cake', 'description': 'Moist', 'ingredients': []
+        }
+        response = self.client.post(RECIPES_URL, payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # When
+        with self.capture_replica_queries() as captures:
+            response = self.client.get(RECIPES_URL)
+
+        # Then the replicas are not read
+        self.assertEqual(response.data['results'][0]['name'], 'Carrot Cake')
+        self.assertFalse(any(len(capture) for capture in captures))
+
+    @override_settings(DATABASE_REPLICA_STICKY_SECONDS=7)
+    def test_page_from_replica_cached_briefly(self):
+        """Test a page read from a replica is cached only while they lag"""
+
+        # Given
+        given_recipe_exists(name='Carrot Cake')
+        recipe_cache = caches[settings.RECIPE_CACHE_ALIAS]
+
+        def get_page_timeouts():
+            with patch.object(
+                recipe_cache, 'set', wraps=recipe_cache.set
+            ) as cache_set:
+                self.client.get(RECIPES_URL)
+            return [
+                timeout for key, _, timeout in
+                (call.args for call in cache_set.call_args_list)
+                if key.startswith('recipe:list:') and timeout is not None
+            ]
+
+        # When read from a replica
+        replica_timeouts = get_page_timeouts()
+
+        # When read from the primary, straight after a write
+        self.client.post(RECIPES_URL, {
+            'name': 'Flapjack', 'description': 'Oaty', 'ingredients': []
+        })
+        primary_timeouts = get_page_timeouts()
+
+        # Then
+        self.assertEqual(replica_timeouts, [7])
+        self.assertEqual(primary_timeouts, [settings.RECIPE_CACHE_TIMEOUT])
+
+    def test_changes_after_write_use_primary(self):
+        """Test the change feed straight after a POST reads the primary"""
+
+        # Given
+        payload = {
+            'name': 'Carrot Cake', 'description': 'Moist', 'ingredients': []
+        }
+        self.client.post(RECIPES_URL, payload)
+
+        # When
+        with self.capture_replica_queries() as captures:
+            response = self.client.get(CHANGES_URL)
+            lines = b''.join(response.streaming_content).splitlines()
+
+        # Then the write is in the feed, and the replicas are not read
+        self.assertEqual(len(lines), 1)
+        self.assertFalse(any(len(capture) for capture in captures))
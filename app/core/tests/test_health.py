@@ -0,0 +1,84 @@
+from unittest.mock import patch
+
+from django.db.utils import OperationalError, ProgrammingError
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+
+from core import views
+
+
+HEALTHZ_URL = reverse('healthz')
+READYZ_URL = reverse('readyz')
+
+
+class HealthViewTests(TestCase):
+
+    def setUp(self):
+        views._migrations_applied = False
+
+    def test_healthz(self):
+        """Test the liveness probe runs no queries"""
+
+        # When
+        with self.assertNumQueries(0):
+            response = self.client.get(HEALTHZ_URL)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'status': 'ok'})
+
+    def test_readyz(self):
+        """Test the readiness probe when the database is migrated"""
+
+        # When
+        response = self.client.get(READYZ_URL)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {
+            'status': 'ok', 'database': 'ok', 'migrations': 'ok'
+        })
+
+    @patch('core.views.check_database', side_effect=OperationalError)
+    def test_readyz_database_unavailable(self, mock_check):
+        """Test the readiness probe fails when the database is down"""
+
+        # When
+        response = self.client.get(READYZ_URL)
+
+        # Then
+        self.assertEqual(
+            response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        self.assertEqual(response.json()['database'], 'unavailable')
+
+    @patch('core.views.get_unapplied_migrations', return_value=['0001'])
+    def test_readyz_migrations_pending(self, mock_unapplied):
+        """Test the readiness probe fails until migrations are applied"""
+
+        # When
+        response = self.client.get(READYZ_URL)
+
+        # Then
+        self.assertEqual(
+            response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        self.assertEqual(response.json()['migrations'], 'pending')
+
+    def test_readyz_migrations_unreadable(self):
+        """Test the readiness probe fails if migrations cannot be read"""
+
+        for error in (OperationalError, ProgrammingError):
+            # When
+            with patch(
+                'core.views.get_unapplied_migrations', side_effect=error
+            ):
+                response = self.client.get(READYZ_URL)
+
+            # Then
+            self.assertEqual(
+                response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+            self.assertEqual(response.json()['migrations'], 'unknown')
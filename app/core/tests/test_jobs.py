@@ -0,0 +1,262 @@
+import threading
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest.mock import Mock, patch
+
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+
+from core import jobs
+from core.models import Job, UploadChunk
+
+
+@jobs.handler('test.add')
+def add(a, b):
+    return {'sum': a + b}
+
+
+@jobs.handler('test.once', requeue=False)
+def once(upload):
+    return {}
+
+
+@jobs.handler('test.fail')
+def fail():
+    raise RuntimeError('MOCK_JOB_ERROR')
+
+
+def job_url(job_id):
+    return reverse('job', args=[job_id])
+
+
+def given_lease_expired(job):
+    Job.objects.filter(id=job.id).update(
+        heartbeat_at=timezone.now() - timedelta(minutes=10)
+    )
+
+
+class JobTests(TestCase):
+
+    def test_enqueue(self):
+        """Test a queued job waits for a worker"""
+
+        # When
+        job = jobs.enqueue('test.add', a=1, b=2)
+
+        # Then
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.payload, {'a': 1, 'b': 2})
+
+    def test_enqueue_unknown_kind(self):
+        """Test only kinds of job with a handler can be queued"""
+
+        # Then
+        with self.assertRaises(ValueError):
+            jobs.enqueue('test.unknown')
+
+    def test_claim_job(self):
+        """Test each job is claimed once, oldest first"""
+
+        # Given
+        first = jobs.enqueue('test.add', a=1, b=2)
+        second = jobs.enqueue('test.add', a=3, b=4)
+
+        # When
+        claimed = [jobs.claim_job(), jobs.claim_job(), jobs.claim_job()]
+
+        # Then
+        self.assertEqual(claimed[0].id, first.id)
+        self.assertEqual(claimed[1].id, second.id)
+        self.assertIsNone(claimed[2])
+        self.assertEqual(
+            set(Job.objects.values_list('status', flat=True)), {Job.RUNNING}
+        )
+
+    def test_claim_job_lease_expired(self):
+        """Test a running job whose worker was lost is claimed again"""
+
+        # Given
+        job = jobs.enqueue('test.add', a=1, b=2)
+        jobs.claim_job()
+        given_lease_expired(job)
+
+        # When
+        with self.assertLogs('core.jobs', 'WARNING'):
+            claimed = jobs.claim_job()
+
+        # Then
+        self.assertEqual(claimed.id, job.id)
+        self.assertEqual(claimed.attempts, 2)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+        self.assertEqual(job.attempts, 2)
+
+    def test_claim_job_lease_held(self):
+        """Test a running job whose worker renews its lease is left alone"""
+
+        # Given
+        jobs.enqueue('test.add', a=1, b=2)
+        jobs.claim_job()
+
+        # When
+        claimed = jobs.claim_job()
+
+        # Then
+        self.assertIsNone(claimed)
+
+    @override_settings(JOB_MAX_ATTEMPTS=2)
+    def test_claim_job_lease_expired_too_often(self):
+        """Test a job that has lost its worker too often is failed"""
+
+        # Given
+        job = jobs.enqueue('test.add', a=1, b=2)
+        for _ in range(2):
+            jobs.claim_job()
+            given_lease_expired(job)
+
+        # When
+        with self.assertLogs('core.jobs', 'WARNING'):
+            claimed = jobs.claim_job()
+
+        # Then
+        self.assertIsNone(claimed)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('lease', job.error)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_claim_job_lease_expired_not_requeued(self):
+        """Test a job not safe to run again is failed when its worker is lost
+
+        The upload it was to read is deleted with it.
+        """
+
+        # Given
+        upload = jobs.store_upload(BytesIO(b'MOCK_UPLOAD'))
+        job = jobs.enqueue('test.once', upload=str(upload))
+        jobs.claim_job()
+        given_lease_expired(job)
+
+        # When
+        with self.assertLogs('core.jobs', 'WARNING'):
+            claimed = jobs.claim_job()
+
+        # Then
+        self.assertIsNone(claimed)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertFalse(UploadChunk.objects.exists())
+
+    @override_settings(JOB_LEASE_SECONDS=0.03)
+    def test_lease_renewed_after_error(self):
+        """Test a failed lease renewal is logged and renewal carries on"""
+
+        # Given the first renewal fails
+        claim = Mock()
+        claim.update.side_effect = [OperationalError('MOCK_ERROR')] + [1] * 99
+        job = jobs.enqueue('test.add', a=1, b=2)
+
+        # When
+        with patch.object(jobs, 'get_claim', return_value=claim), \
+                self.assertLogs('core.jobs', 'ERROR') as logs, \
+                jobs.lease(job):
+            deadline = time.monotonic() + 5
+            while claim.update.call_count < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        # Then
+        self.assertIn('Failed to renew the lease', logs.output[0])
+        self.assertGreaterEqual(claim.update.call_count, 3)
+
+    def test_run_job_lease_lost(self):
+        """Test a worker that lost its lease does not save its result"""
+
+        # Given the job is claimed again after the first worker's lease ran
+        # out
+        job = jobs.enqueue('test.add', a=1, b=2)
+        lost = jobs.claim_job()
+        given_lease_expired(job)
+        with self.assertLogs('core.jobs', 'WARNING'):
+            jobs.claim_job()
+
+        # When
+        with self.assertLogs('core.jobs', 'WARNING') as logs:
+            jobs.run_job(lost)
+
+        # Then the job is left to the worker now holding it
+        self.assertIn('lost its lease', logs.output[0])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+        self.assertIsNone(job.result)
+
+    def test_work(self):
+        """Test a worker runs jobs until the queue is empty"""
+
+        # Given
+        succeeding = jobs.enqueue('test.add', a=1, b=2)
+        failing = jobs.enqueue('test.fail')
+
+        # When
+        with self.assertLogs('core.jobs', 'ERROR') as logs:
+            count = jobs.work(threading.Event(), 0, burst=True)
+
+        # Then both jobs are run, and the failure logged
+        self.assertEqual(count, 2)
+        self.assertIn(f'test.fail job {failing.id} failed', logs.output[0])
+
+        # Then the result of the succeeding job is saved
+        succeeding.refresh_from_db()
+        self.assertEqual(succeeding.status, Job.SUCCEEDED)
+        self.assertEqual(succeeding.result, {'sum': 3})
+        self.assertIsNotNone(succeeding.finished_at)
+
+        # Then the error of the failing job is saved
+        failing.refresh_from_db()
+        self.assertEqual(failing.status, Job.FAILED)
+        self.assertIn('MOCK_JOB_ERROR', failing.error)
+
+    def test_process_jobs(self):
+        """Test the worker command runs queued jobs"""
+
+        # Given
+        job = jobs.enqueue('test.add', a=1, b=2)
+
+        # When
+        out = StringIO()
+        call_command('process_jobs', burst=True, concurrency=1, stdout=out)
+
+        # Then
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertIn('Ran 1 jobs', out.getvalue())
+
+    def test_get_job(self):
+        """Test GET jobs/{id} returns the job status and result"""
+
+        # Given
+        job = jobs.enqueue('test.add', a=1, b=2)
+        jobs.work(threading.Event(), 0, burst=True)
+
+        # When
+        response = self.client.get(job_url(job.id))
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['status'], Job.SUCCEEDED)
+        self.assertEqual(response.json()['result'], {'sum': 3})
+
+    def test_get_non_existent_job(self):
+        """Test GET jobs/{id} of a job that does not exist"""
+
+        # When
+        response = self.client.get(job_url(999))
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,226 @@
+import gzip
+import json
+import unittest
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import middleware
+from core.metrics import load_metrics, request_metrics
+from recipe.tests.test_recipes_api import EXPORT_URL, RECIPES_URL, \
+    given_ingredient_exists, given_recipe_exists, given_recipes_exist, \
+    recipe_url
+
+
+REQUEST_METRICS_URL = reverse('core:request-metrics')
+LOAD_METRICS_URL = reverse('core:load-metrics')
+
+
+class RequestMetricsMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        request_metrics.reset()
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=1.0)
+    def test_sampled_request(self):
+        """Test a sampled request is timed and aggregated"""
+
+        # Given
+        recipe = given_recipe_exists(name='Carrot Cake')
+        given_ingredient_exists(recipe, name='carrots')
+
+        # When
+        response = self.client.get(RECIPES_URL)
+
+        # Then the timings are sent back
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        server_timing = response['Server-Timing']
+        self.assertIn('total;dur=', server_timing)
+        self.assertIn('db;dur=', server_timing)
+        self.assertIn('desc="1 queries"', server_timing)
+        self.assertIn('serialize;dur=', server_timing)
+
+        # Then the request is added to the route aggregate
+        metrics = self.client.get(REQUEST_METRICS_URL).data
+        route = metrics['GET recipe:recipe-list']
+        self.assertEqual(route['count'], 1)
+        self.assertEqual(route['queries'], 1)
+        self.assertEqual(route['bytes'], len(response.content))
+        self.assertEqual(sum(route['histogram'].values()), 1)
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0.0)
+    def test_request_not_sampled(self):
+        """Test requests pass through untouched when sampling is off"""
+
+        # When
+        response = self.client.get(RECIPES_URL)
+
+        # Then nothing is measured
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(request_metrics.snapshot(), {})
+
+
+@override_settings(LOAD_SHED_MAX_IN_FLIGHT=1, LOAD_SHED_RETRY_AFTER=2)
+class LoadSheddingMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        load_metrics.reset()
+
+    def test_admitted(self):
+        """Test requests under the limit are served and counted"""
+
+        # When
+        response = self.client.get(RECIPES_URL)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        metrics = load_metrics.snapshot()
+        self.assertEqual(metrics['admitted'], 1)
+        self.assertEqual(metrics['in_flight'], 0)
+
+    def test_shed(self):
+        """Test requests over the limit are turned away with 503"""
+
+        # Given another request is in flight
+        load_metrics.admit(1)
+        self.addCleanup(load_metrics.release)
+
+        # When
+        response = self.client.get(RECIPES_URL)
+
+        # Then
+        self.assertEqual(
+            response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        self.assertEqual(response['Retry-After'], '2')
+
+        # Then the metrics are still served, and count the shed request
+        metrics = self.client.get(LOAD_METRICS_URL)
+        self.assertEqual(metrics.status_code, status.HTTP_200_OK)
+        self.assertEqual(metrics.data['shed'], 1)
+
+    def test_streaming_in_flight(self):
+        """Test a streaming response is in flight until it is sent"""
+
+        # Given
+        given_recipes_exist(['Carrot Cake'])
+
+        # When
+        response = self.client.get(EXPORT_URL)
+
+        # Then
+        self.assertEqual(load_metrics.snapshot()['in_flight'], 1)
+        b''.join(response.streaming_content)
+        self.assertEqual(load_metrics.snapshot()['in_flight'], 0)
+
+
+@override_settings(RESPONSE_COMPRESSION_MIN_SIZE=1024)
+class CompressionMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        given_recipes_exist(
+            [f'Recipe {i}' for i in range(10)], description='x' * 200
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_compressed(self):
+        """Test large responses are gzipped for clients accepting gzip"""
+
+        # When
+        response = self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(
+            json.loads(gzip.decompress(response.content))['results'][0]
+            ['name'], 'Recipe 0'
+        )
+
+    def test_compressed_etag_weak(self):
+        """Test a compressed response's ETag is weak, and still matches"""
+
+        # Given
+        recipe = given_recipe_exists(description='x' * 2000)
+
+        # When
+        response = self.client.get(
+            recipe_url(recipe.id), HTTP_ACCEPT_ENCODING='gzip'
+        )
+
+        # Then
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['ETag'], f'W/"{recipe.id}-1"')
+
+        # Then the weak ETag can be used for a conditional write
+        response = self.client.patch(
+            recipe_url(recipe.id), {'name': 'Carrot Cake'},
+            HTTP_IF_MATCH=response['ETag'],
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_not_accepted(self):
+        """Test responses are not compressed without Accept-Encoding"""
+
+        # When
+        response = self.client.get(RECIPES_URL)
+
+        # Then
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_below_threshold(self):
+        """Test small responses are not compressed"""
+
+        # When
+        response = self.client.get(
+            RECIPES_URL, {'fields': 'id', 'page_size': 1},
+            HTTP_ACCEPT_ENCODING='gzip'
+        )
+
+        # Then
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_refused_encoding(self):
+        """Test an encoding the client gives q=0 is not used"""
+
+        # When
+        response = self.client.get(
+            RECIPES_URL, HTTP_ACCEPT_ENCODING='gzip;q=0, identity'
+        )
+
+        # Then
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming_compressed(self):
+        """Test streaming responses are compressed as they stream"""
+
+        # When
+        response = self.client.get(EXPORT_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        # Then
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)) \
+            .decode().splitlines()
+        self.assertEqual(len(lines), 10)
+
+    @unittest.skipIf(middleware.brotli is None, 'brotli is not installed')
+    def test_brotli_preferred(self):
+        """Test brotli is used when the client accepts it"""
+
+        # When
+        response = self.client.get(
+            RECIPES_URL, HTTP_ACCEPT_ENCODING='gzip, deflate, br'
+        )
+
+        # Then
+        self.assertEqual(response['Content-Encoding'], 'br')
@@ -25,3 +25,14 @@ class ModelTests(TestCase):
         )
 
         self.assertEqual(str(ingredient), ingredient.name)
+
+    def test_ingredient_changes_refresh_recipe_snapshot(self):
+        """Test saving and deleting ingredients updates the recipe snapshot"""
+        recipe = given_recipe_exists()
+        models.Ingredient.objects.create(name='flour', recipe=recipe)
+        sugar = models.Ingredient.objects.create(name='sugar', recipe=recipe)
+
+        sugar.delete()
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.ingredient_names, ['flour'])
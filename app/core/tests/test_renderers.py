@@ -0,0 +1,68 @@
+import datetime
+import unittest
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from rest_framework.renderers import JSONRenderer
+
+from core import renderers
+
+
+PAYLOAD = {
+    'next': None,
+    'results': [
+        OrderedDict(
+            id=1,
+            name='Crème brûlée  ',
+            description='A "custard"\n' * 20,
+            ingredients=[OrderedDict(name='cream'), OrderedDict(name='sugar')],
+        ),
+    ],
+    'updated_at': datetime.datetime(
+        2021, 9, 9, 11, 1, 2, 345678, tzinfo=datetime.timezone.utc
+    ),
+    'price': Decimal('1.50'),
+}
+
+
+class FastJSONRendererTests(SimpleTestCase):
+
+    def test_matches_json_renderer(self):
+        """Test the fast renderer output is identical to JSONRenderer's"""
+
+        # When
+        fast = renderers.FastJSONRenderer().render(PAYLOAD)
+
+        # Then
+        self.assertEqual(fast, JSONRenderer().render(PAYLOAD))
+
+    def test_indented(self):
+        """Test indented output is left to JSONRenderer"""
+
+        # When
+        fast = renderers.FastJSONRenderer().render(
+            PAYLOAD, 'application/json; indent=2'
+        )
+
+        # Then
+        self.assertEqual(
+            fast, JSONRenderer().render(PAYLOAD, 'application/json; indent=2')
+        )
+
+
+@unittest.skipIf(renderers.msgpack is None, 'msgpack is not installed')
+class MessagePackRendererTests(SimpleTestCase):
+
+    def test_render(self):
+        """Test recipes round trip through MessagePack"""
+
+        # When
+        packed = renderers.MessagePackRenderer().render(PAYLOAD)
+
+        # Then
+        unpacked = renderers.msgpack.unpackb(packed)
+        self.assertEqual(unpacked['results'][0]['ingredients'], [
+            {'name': 'cream'}, {'name': 'sugar'}
+        ])
+        self.assertEqual(unpacked['updated_at'], '2021-09-09T11:01:02.345Z')
@@ -0,0 +1,122 @@
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.metrics import load_metrics
+from core.throttling import TokenBucketThrottle, get_store, parse_rate
+from recipe.tests.test_recipes_api import EXPORT_URL, RECIPES_URL
+
+
+@override_settings(REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {'recipe': '2/min', 'recipe-bulk': '1/min'},
+})
+class TokenBucketThrottleTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        get_store().clear()
+        load_metrics.reset()
+        self.now = 1000.0
+        patcher = patch.object(
+            TokenBucketThrottle, 'timer', side_effect=lambda: self.now
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_parse_rate(self):
+        """Test rates are parsed into requests and a period in seconds"""
+
+        # Then
+        self.assertEqual(parse_rate('100/min'), (100, 60))
+        self.assertEqual(parse_rate('5/s'), (5, 1))
+
+    def test_burst_then_throttled(self):
+        """Test a client can spend its bucket at once, then is throttled"""
+
+        # When
+        responses = [self.client.get(RECIPES_URL) for _ in range(3)]
+
+        # Then
+        self.assertEqual(
+            [response.status_code for response in responses],
+            [status.HTTP_200_OK, status.HTTP_200_OK,
+             status.HTTP_429_TOO_MANY_REQUESTS]
+        )
+        # One token refills every 30 seconds at 2/min
+        self.assertEqual(responses[2]['Retry-After'], '30')
+        self.assertEqual(load_metrics.snapshot()['throttled'], {'recipe': 1})
+
+    def test_refill(self):
+        """Test the bucket refills at the rate"""
+
+        # Given
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+
+        # When
+        self.now += 30
+        allowed = self.client.get(RECIPES_URL)
+        throttled = self.client.get(RECIPES_URL)
+
+        # Then
+        self.assertEqual(allowed.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            throttled.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+
+    def test_per_client(self):
+        """Test each client has its own bucket"""
+
+        # Given
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+
+        # When
+        response = self.client.get(RECIPES_URL, REMOTE_ADDR='10.0.0.2')
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_per_scope(self):
+        """Test each throttle scope has its own bucket"""
+
+        # Given
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+
+        # When
+        allowed = self.client.get(EXPORT_URL)
+        allowed.close()
+        throttled = self.client.get(EXPORT_URL)
+
+        # Then
+        self.assertEqual(allowed.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            throttled.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+
+
+@override_settings(API_THROTTLE_STORE='database')
+class DatabaseTokenBucketThrottleTests(TokenBucketThrottleTests):
+    """Run the throttle tests with the buckets kept in the database"""
+
+    def test_take_last_token(self):
+        """Test a shared bucket never gives out more tokens than it holds"""
+
+        # Given a bucket another process has spent down to one token
+        store = get_store()
+        store.take('throttle:test', 2, 1 / 30, 60, self.now)
+
+        # When two requests take from it
+        taken = [
+            store.take('throttle:test', 2, 1 / 30, 60, self.now)[0]
+            for _ in range(2)
+        ]
+
+        # Then only the first gets a token
+        self.assertEqual(taken, [True, False])
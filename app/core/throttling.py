@@ -0,0 +1,168 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Least
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from core.db.routers import use_primary
+from core.metrics import load_metrics
+from core.models import ThrottleBucket
+
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """Parse a rate such as '100/min' into (requests, period in seconds)"""
+    requests, period = rate.split('/')
+    return int(requests), PERIODS[period[0]]
+
+
+class MemoryBuckets:
+    """Token buckets in the memory of this process
+
+    Taking a token is a few dictionary operations under a lock, so the
+    lock is never held for long.
+    """
+    # Full buckets are dropped once there are more than this many
+    max_buckets = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def take(self, key, size, rate, period, now):
+        """Take a token from a bucket, returning (taken, tokens left)"""
+        with self._lock:
+            tokens, updated_at, _ = self._buckets.get(key, (size, now, None))
+            tokens = min(size, tokens + (now - updated_at) * rate)
+            taken = tokens >= 1
+            if taken:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + period)
+            if len(self._buckets) > self.max_buckets:
+                self._buckets = {
+                    key: bucket for key, bucket in self._buckets.items()
+                    if bucket[2] > now
+                }
+        return taken, tokens
+
+    def clear(self):
+        with self._lock:
+            self._buckets = {}
+
+
+class DatabaseBuckets:
+    """Token buckets in the ThrottleBucket table, shared by every process
+
+    A token is taken by a single conditional UPDATE, refilling the bucket
+    and taking from it only if that leaves a token, so concurrent requests
+    can never spend more tokens than the bucket holds.
+    """
+    # Share of requests that also delete the buckets full again
+    prune_probability = 0.001
+
+    def take(self, key, size, rate, period, now):
+        """Take a token from a bucket, returning (taken, tokens left)"""
+        refilled = Least(
+            Value(float(size)),
+            F('tokens') + (Value(now) - F('updated_at')) * Value(rate),
+        )
+        buckets = ThrottleBucket.objects.filter(key=key)
+        taken = buckets.alias(refilled=refilled) \
+            .filter(refilled__gte=1) \
+            .update(
+                tokens=refilled - 1, updated_at=now, expires_at=now + period
+            )
+        if not taken:
+            try:
+                with transaction.atomic():
+                    ThrottleBucket.objects.create(
+                        key=key, tokens=size - 1, updated_at=now,
+                        expires_at=now + period,
+                    )
+                taken = True
+            except IntegrityError:
+                # The bucket exists and is empty
+                pass
+        if random.random() < self.prune_probability:
+            ThrottleBucket.objects.filter(expires_at__lt=now).delete()
+        if taken:
+            return True, None
+        with use_primary():
+            tokens, updated_at = buckets.values_list(
+                'tokens', 'updated_at'
+            ).get()
+        return False, min(size, tokens + (now - updated_at) * rate)
+
+    def clear(self):
+        ThrottleBucket.objects.all().delete()
+
+
+_stores = {'memory': MemoryBuckets(), 'database': DatabaseBuckets()}
+
+
+def get_store():
+    """Get the token bucket store named by API_THROTTLE_STORE"""
+    return _stores[settings.API_THROTTLE_STORE]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttle each client on each throttle_scope with a token bucket
+
+    A rate from DEFAULT_THROTTLE_RATES such as '600/min' is both the size
+    of the bucket and how fast it refills, so a client can spend its whole
+    allowance in a burst, then carry on at the steady rate. Views without a
+    throttle_scope, or whose scope has no rate, are not throttled.
+
+    Clients are told by user, or by IP address when anonymous. Buckets are
+    kept in the API_THROTTLE_STORE: 'memory' for limits per process, or
+    'database' for limits shared by every process.
+    """
+    timer = time.time
+
+    def allow_request(self, request, view):
+        return self.allow(request, getattr(view, 'throttle_scope', None))
+
+    def allow(self, request, scope):
+        """Take a token for a Django or DRF request on a throttle scope"""
+        self.scope = scope
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+        if rate is None:
+            return True
+        size, period = parse_rate(rate)
+        self.refill_rate = size / period
+
+        key = f'throttle:{self.scope}:{self.get_client(request)}'
+        allowed, self.tokens = get_store().take(
+            key, size, self.refill_rate, period, self.timer()
+        )
+        if not allowed:
+            load_metrics.throttled(self.scope)
+        return allowed
+
+    def get_client(self, request):
+        user = getattr(request, 'user', None)
+        if user and user.is_authenticated:
+            return f'user:{user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+    def wait(self):
+        """Get the seconds until the bucket holds a token again"""
+        return (1 - self.tokens) / self.refill_rate
+
+
+def get_throttle_wait(request, scope):
+    """Throttle a request to a view outside DRF on a throttle scope
+
+    Returns None if the request may go ahead, else the seconds to wait.
+    """
+    throttle = TokenBucketThrottle()
+    if throttle.allow(request, scope):
+        return None
+    return throttle.wait()
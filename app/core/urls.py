@@ -0,0 +1,12 @@
+from django.urls import path
+
+from core import views
+
+
+app_name = 'core'
+
+urlpatterns = [
+  path('requests/', views.request_metrics_view, name='request-metrics'),
+  path('db-pool/', views.db_pool_metrics_view, name='db-pool-metrics'),
+  path('load/', views.load_metrics_view, name='load-metrics'),
+]
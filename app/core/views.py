@@ -0,0 +1,89 @@
+from django.db.utils import OperationalError, ProgrammingError
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from core.db.pool import get_pool_stats
+from core.health import check_database, get_unapplied_migrations
+from core.metrics import load_metrics, request_metrics
+from core.models import Job
+from core.serializers import JobSerializer
+
+
+@api_view(['GET'])
+def request_metrics_view(request):
+    """Get the per-route request metrics gathered by this process"""
+    return Response(request_metrics.snapshot())
+
+
+@api_view(['GET'])
+def db_pool_metrics_view(request):
+    """Get the stats of the database connection pools in this process"""
+    return Response(get_pool_stats())
+
+
+@api_view(['GET'])
+def load_metrics_view(request):
+    """Get the requests in flight, shed and throttled by this process"""
+    return Response(load_metrics.snapshot())
+
+
+@api_view(['GET'])
+def job_view(request, pk):
+    """Get the status of a background job, and its result once finished"""
+    job = get_object_or_404(Job.objects.defer('payload'), pk=pk)
+    return Response(JobSerializer(job).data)
+
+
+def job_accepted_response(request, job):
+    """Get the 202 Accepted response for a queued job"""
+    return Response(
+        JobSerializer(job).data,
+        status=status.HTTP_202_ACCEPTED,
+        headers={'Location': request.build_absolute_uri(
+            reverse('job', args=[job.id])
+        )},
+    )
+
+
+# Migrations are only checked until they are all found applied, as loading
+# them reads every migration file
+_migrations_applied = False
+
+
+def healthz_view(request):
+    """Liveness probe, answered without touching the database"""
+    return JsonResponse({'status': 'ok'})
+
+
+def readyz_view(request):
+    """Readiness probe, checking the database is up and fully migrated"""
+    global _migrations_applied
+    checks = {}
+    try:
+        check_database()
+        checks['database'] = 'ok'
+    except OperationalError:
+        checks['database'] = 'unavailable'
+
+    if _migrations_applied:
+        checks['migrations'] = 'ok'
+    elif checks['database'] == 'ok':
+        # The database can go down after being checked, and the migration
+        # table is missing until the first migration runs
+        try:
+            _migrations_applied = not get_unapplied_migrations()
+            checks['migrations'] = 'ok' if _migrations_applied else 'pending'
+        except (OperationalError, ProgrammingError):
+            checks['migrations'] = 'unknown'
+    else:
+        checks['migrations'] = 'unknown'
+
+    ready = all(check == 'ok' for check in checks.values())
+    return JsonResponse(
+        {'status': 'ok' if ready else 'unavailable', **checks},
+        status=200 if ready else 503,
+    )
@@ -0,0 +1,12 @@
+from django.urls import path
+
+from recipe import async_views
+
+
+app_name = 'async_recipe'
+
+urlpatterns = [
+  path('', async_views.recipe_list, name='recipe-list'),
+  path('search/', async_views.recipe_search, name='recipe-search'),
+  path('<int:pk>/', async_views.recipe_detail, name='recipe-detail'),
+]
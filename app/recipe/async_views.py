@@ -0,0 +1,154 @@
+"""Async recipe read endpoints for ASGI deployments
+
+The ORM in this Django version is synchronous, so database work runs on a
+dedicated pool of RECIPE_ASYNC_DB_THREADS worker threads. Requests waiting
+for a free worker wait on the event loop without holding a thread, so one
+process can keep many more slow requests in flight than it has threads.
+"""
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse, JsonResponse
+from rest_framework.exceptions import APIException, Throttled
+from rest_framework.request import Request
+
+from core.models import Recipe
+from core.renderers import FastJSONRenderer
+from core.throttling import get_throttle_wait
+from recipe import cache, conditional, search
+from recipe.pagination import RecipeCursorPagination
+from recipe.serializers import RecipeListSerializer, RecipeSerializer, \
+    get_requested_fields, with_ingredients
+
+
+_db_executor = None
+_db_executor_lock = threading.Lock()
+
+
+def get_db_executor():
+    """Get the thread pool that runs database work for the async views"""
+    global _db_executor
+    with _db_executor_lock:
+        if _db_executor is None:
+            _db_executor = ThreadPoolExecutor(
+                max_workers=settings.RECIPE_ASYNC_DB_THREADS,
+                thread_name_prefix='recipe-db',
+            )
+    return _db_executor
+
+
+def close_connections_after(func, *args):
+    try:
+        return func(*args)
+    finally:
+        # Worker threads see no request_finished signal to do this for them
+        close_old_connections()
+
+
+async def run_db(func, *args):
+    """Run a function using the database on a bounded worker thread"""
+    loop = asyncio.get_running_loop()
+    # Carry context variables, such as the request timing, to the worker
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_db_executor(), context.run, close_connections_after, func, *args
+    )
+
+
+def render(data, status=200, headers=None):
+    response = HttpResponse(
+        FastJSONRenderer().render(data),
+        content_type='application/json',
+        status=status,
+    )
+    for header, value in (headers or {}).items():
+        response[header] = value
+    return response
+
+
+def throttle(request):
+    """Get a 429 response if the client is throttled, as the sync API is"""
+    wait = get_throttle_wait(request, 'recipe')
+    if wait is None:
+        return None
+    error = Throttled(wait)
+    return render(
+        {'detail': error.detail}, status=error.status_code,
+        headers={'Retry-After': str(error.wait)},
+    )
+
+
+def get_recipe_page(request):
+    """Get the rendered page of recipes for the request query parameters"""
+    throttled = throttle(request)
+    if throttled is not None:
+        return throttled
+    key = cache.list_key(request)
+    payload = cache.fetch('list', key)
+    if payload is None:
+        request = Request(request)
+        queryset = search.filter_recipes(
+            Recipe.objects.order_by('name', 'id'), request.query_params
+        )
+        fields = get_requested_fields(request.query_params)
+        paginator = RecipeCursorPagination()
+        rows = paginator.paginate_queryset(
+            RecipeListSerializer.get_rows(queryset, fields), request
+        )
+        payload = paginator.get_paginated_response(
+            RecipeSerializer(rows, many=True, fields=fields).data
+        ).data
+        cache.store(key, payload)
+    return render(payload)
+
+
+def get_recipe_detail(request, recipe_id):
+    """Get the rendered recipe, or a conditional response"""
+    throttled = throttle(request)
+    if throttled is not None:
+        return throttled
+    key = cache.detail_key(recipe_id)
+    entry = cache.fetch('detail', key)
+    if entry is None:
+        recipe = with_ingredients(Recipe.objects) \
+            .filter(pk=recipe_id).first()
+        if recipe is None:
+            return render({'detail': 'Not found.'}, status=404)
+        entry = {
+            'data': RecipeSerializer(recipe).data,
+            'version': recipe.version,
+            'updated_at': recipe.updated_at,
+        }
+        cache.store(key, entry)
+
+    validators = (recipe_id, entry['version'], entry['updated_at'])
+    not_modified = conditional.get_not_modified(request, *validators)
+    if not_modified is not None:
+        return not_modified
+    return render(
+        entry['data'], headers=conditional.get_validators(*validators)
+    )
+
+
+async def recipe_list(request):
+    """GET /api/async/recipe/ with the same filters as the recipe list"""
+    try:
+        return await run_db(get_recipe_page, request)
+    except APIException as error:
+        return JsonResponse({'detail': error.detail}, status=error.status_code)
+
+
+async def recipe_search(request):
+    """GET /api/async/recipe/search/?q= ranked recipe search"""
+    if not request.GET.get('q'):
+        return JsonResponse({'q': ['This field is required.']}, status=400)
+    return await recipe_list(request)
+
+
+async def recipe_detail(request, pk):
+    """GET /api/async/recipe/{id}/"""
+    return await run_db(get_recipe_detail, request, pk)
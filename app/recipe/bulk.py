@@ -0,0 +1,304 @@
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from core.models import Recipe, Ingredient, ingredient_snapshots_managed, \
+    recipe_changes_managed, record_recipe_changes
+from recipe import cache
+from recipe.serializers import RecipeSerializer, diff_ingredients, \
+    get_ingredient_lists, prefetch_ingredients
+
+
+class BatchTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Too many operations in one batch.'
+    default_code = 'batch_too_large'
+
+
+def chunked(iterable, size):
+    """Yield lists of up to size items from an iterable"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def import_recipes(lines, chunk_size=None):
+    """Import recipes from JSON Lines, one recipe object per line
+
+    Lines are validated and written a chunk at a time, each chunk in its own
+    transaction. Returns a report of the number of recipes created and the
+    errors for each line that could not be imported.
+    """
+    chunk_size = chunk_size or settings.RECIPE_BULK_CHUNK_SIZE
+    report = {'created': 0, 'errors': []}
+    numbered = (
+        (number, line) for number, line in enumerate(lines, start=1)
+        if line.strip()
+    )
+    for chunk in chunked(numbered, chunk_size):
+        valid = []
+        for number, line in chunk:
+            try:
+                data = json.loads(line)
+            except ValueError as error:
+                report['errors'].append({
+                    'line': number,
+                    'errors': {'non_field_errors': [f'Invalid JSON: {error}']}
+                })
+                continue
+            serializer = RecipeSerializer(data=data)
+            if serializer.is_valid():
+                valid.append(serializer.validated_data)
+            else:
+                report['errors'].append({
+                    'line': number, 'errors': serializer.errors
+                })
+        report['created'] += len(create_recipes(valid))
+    return report
+
+
+@transaction.atomic
+def create_recipes(recipes_data):
+    """Create recipes and their ingredients with batched inserts
+
+    Returns the new recipes.
+    """
+    recipes, ingredients = [], []
+    for recipe_data in recipes_data:
+        recipe_data = dict(recipe_data)
+        ingredients_data = recipe_data.pop('ingredients', [])
+        recipe = Recipe(
+            ingredient_names=[
+                ingredient['name'] for ingredient in ingredients_data
+            ],
+            **recipe_data
+        )
+        recipes.append(recipe)
+        ingredients += [
+            Ingredient(recipe=recipe, **ingredient)
+            for ingredient in ingredients_data
+        ]
+
+    if connection.features.can_return_rows_from_bulk_insert:
+        Recipe.objects.bulk_create(recipes)
+    else:
+        # Without RETURNING the new ids are unknown after a bulk insert
+        with recipe_changes_managed():
+            for recipe in recipes:
+                recipe.save(force_insert=True)
+    record_recipe_changes(upserted=[recipe.id for recipe in recipes])
+
+    for ingredient in ingredients:
+        ingredient.recipe_id = ingredient.recipe.id
+    Ingredient.objects.bulk_create(ingredients)
+    # Bulk inserts do not send the signals that invalidate the cache
+    cache.invalidate()
+    return recipes
+
+
+def apply_batch(operations):
+    """Validate and apply a batch of create, update and delete operations
+
+    Each operation is a dict with an `op` of create, update or delete, the
+    `id` of the recipe to update or delete, and the recipe `data` to create
+    or update with, which may be partial. Either every operation is applied
+    in one transaction with batched queries, or none is.
+
+    Returns the result of each operation, or None and the errors of each
+    invalid operation.
+    """
+    if len(operations) > settings.RECIPE_BATCH_MAX_SIZE:
+        raise BatchTooLarge(
+            f'A batch takes at most {settings.RECIPE_BATCH_MAX_SIZE} '
+            f'operations, got {len(operations)}.'
+        )
+
+    errors = {}
+    by_op = {'create': [], 'update': [], 'delete': []}
+    seen_ids = set()
+    for index, operation in enumerate(operations):
+        problem = check_operation(operation)
+        if problem is None and operation['op'] != 'create':
+            if operation['id'] in seen_ids:
+                problem = {'id': ['Recipe is in more than one operation.']}
+            seen_ids.add(operation['id'])
+        if problem is not None:
+            errors[index] = problem
+        else:
+            by_op[operation['op']].append(index)
+
+    validated = {}
+    for op, partial in [('create', False), ('update', True)]:
+        serializer = RecipeSerializer(
+            data=[operations[index]['data'] for index in by_op[op]],
+            many=True, partial=partial,
+        )
+        if serializer.is_valid():
+            validated.update(zip(by_op[op], serializer.validated_data))
+        else:
+            errors.update(
+                (index, error)
+                for index, error in zip(by_op[op], serializer.errors)
+                if error
+            )
+    if errors:
+        return None, format_errors(errors)
+
+    with transaction.atomic():
+        recipes = Recipe.objects.select_for_update().in_bulk(seen_ids)
+        errors = {
+            index: {'id': ['Not found.']}
+            for index in by_op['update'] + by_op['delete']
+            if operations[index]['id'] not in recipes
+        }
+        if errors:
+            return None, format_errors(errors)
+
+        created = create_recipes(
+            [validated[index] for index in by_op['create']]
+        )
+        updated = update_recipes(recipes, {
+            operations[index]['id']: validated[index]
+            for index in by_op['update']
+        })
+        delete_recipes([operations[index]['id'] for index in by_op['delete']])
+        cache.invalidate()
+        # Read inside the transaction, so from the primary
+        prefetch_ingredients([*created, *updated.values()])
+
+    results = {}
+    for index, recipe in zip(by_op['create'], created):
+        results[index] = {
+            'op': 'create', 'status': status.HTTP_201_CREATED,
+            'id': recipe.id, 'data': RecipeSerializer(recipe).data,
+        }
+    for index in by_op['update']:
+        recipe = updated[operations[index]['id']]
+        results[index] = {
+            'op': 'update', 'status': status.HTTP_200_OK,
+            'id': recipe.id, 'data': RecipeSerializer(recipe).data,
+        }
+    for index in by_op['delete']:
+        results[index] = {
+            'op': 'delete', 'status': status.HTTP_204_NO_CONTENT,
+            'id': operations[index]['id'],
+        }
+    return [results[index] for index in range(len(operations))], None
+
+
+def delete_recipes(recipe_ids):
+    """Delete recipes and their ingredients, logging the changes in a batch
+
+    Returns the ids of the recipes that were deleted.
+    """
+    recipe_ids = list(
+        Recipe.objects.filter(id__in=recipe_ids).values_list('id', flat=True)
+    )
+    if recipe_ids:
+        # The snapshots go with the recipes
+        with ingredient_snapshots_managed(), recipe_changes_managed():
+            Recipe.objects.filter(id__in=recipe_ids).delete()
+        record_recipe_changes(deleted=recipe_ids)
+    return recipe_ids
+
+
+def check_operation(operation):
+    """Get the errors in the shape of a batch operation, None if it is fine"""
+    if not isinstance(operation, dict):
+        return {'non_field_errors': ['Expected an object.']}
+    op = operation.get('op')
+    if op not in ('create', 'update', 'delete'):
+        return {'op': ['Must be one of: create, update, delete.']}
+    if op != 'create' and (not isinstance(operation.get('id'), int) or
+                           isinstance(operation.get('id'), bool)):
+        return {'id': ['A recipe id is required.']}
+    if op != 'delete' and not isinstance(operation.get('data'), dict):
+        return {'data': ['A recipe object is required.']}
+    return None
+
+
+def format_errors(errors):
+    return [
+        {'index': index, 'errors': errors[index]} for index in sorted(errors)
+    ]
+
+
+def update_recipes(recipes, updates):
+    """Apply validated partial updates to locked recipes with bulk queries
+
+    Returns the updated recipes by id.
+    """
+    if not updates:
+        return {}
+    now = timezone.now()
+    ingredient_updates = {}
+    for recipe_id, data in updates.items():
+        data = dict(data)
+        recipe = recipes[recipe_id]
+        if 'ingredients' in data:
+            ingredient_updates[recipe_id] = [
+                ingredient['name'] for ingredient in data.pop('ingredients')
+            ]
+        for attr, value in data.items():
+            setattr(recipe, attr, value)
+        recipe.version += 1
+        # bulk_update() does not apply auto_now
+        recipe.updated_at = now
+
+    existing = {recipe_id: [] for recipe_id in ingredient_updates}
+    for pk, recipe_id, name in Ingredient.objects \
+            .filter(recipe_id__in=existing) \
+            .order_by('id') \
+            .values_list('id', 'recipe_id', 'name'):
+        existing[recipe_id].append((pk, name))
+
+    removed, added = [], []
+    for recipe_id, names in ingredient_updates.items():
+        recipe_removed, recipe_added, recipes[recipe_id].ingredient_names = \
+            diff_ingredients(existing[recipe_id], names)
+        removed += recipe_removed
+        added += [
+            Ingredient(recipe_id=recipe_id, name=name)
+            for name in recipe_added
+        ]
+    if removed:
+        with ingredient_snapshots_managed():
+            Ingredient.objects.filter(id__in=removed).delete()
+    Ingredient.objects.bulk_create(added)
+
+    updated = {recipe_id: recipes[recipe_id] for recipe_id in updates}
+    Recipe.objects.bulk_update(updated.values(), [
+        'name', 'description', 'version', 'updated_at', 'ingredient_names'
+    ])
+    record_recipe_changes(upserted=updated)
+    return updated
+
+
+def export_recipes(chunk_size=None):
+    """Yield every recipe as a line of JSON, ordered by id
+
+    Recipes are read through a server-side cursor where the database
+    supports one, and ingredients not in a recipe snapshot are fetched one
+    chunk of recipes at a time, so memory use does not grow with the size
+    of the table.
+    """
+    chunk_size = chunk_size or settings.RECIPE_BULK_CHUNK_SIZE
+    rows = Recipe.objects.order_by('id') \
+        .values('id', 'name', 'description', 'ingredient_names') \
+        .iterator(chunk_size=chunk_size)
+    for chunk in chunked(rows, chunk_size):
+        ingredients = get_ingredient_lists(chunk)
+        for recipe in chunk:
+            del recipe['ingredient_names']
+            recipe['ingredients'] = [
+                {'name': name} for name in ingredients[recipe['id']]
+            ]
+            yield json.dumps(recipe) + '\n'
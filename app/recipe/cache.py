@@ -0,0 +1,112 @@
+import hashlib
+import json
+import threading
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from core.db.routers import primary_pinned, reads_use_replicas
+
+
+LIST_GENERATION_KEY = 'recipe:list:generation'
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[settings.RECIPE_CACHE_ALIAS]
+
+
+def detail_key(recipe_id):
+    return f'recipe:detail:{recipe_id}'
+
+
+def list_key(request):
+    """Get the cache key for a page of the recipe list
+
+    Keys include the list generation, so every cached page is dropped at
+    once by starting a new generation.
+    """
+    url = hashlib.md5(request.build_absolute_uri().encode('utf-8'))
+    return f'recipe:list:{get_list_generation()}:{url.hexdigest()}'
+
+
+def count_key(filters):
+    """Get the cache key for the count of recipes matching list filters
+
+    Like list pages, counts are dropped when a new generation starts.
+    """
+    digest = hashlib.md5(json.dumps(filters, sort_keys=True).encode('utf-8'))
+    return f'recipe:count:{get_list_generation()}:{digest.hexdigest()}'
+
+
+def get_list_generation():
+    generation = get_cache().get(LIST_GENERATION_KEY)
+    if generation is None:
+        generation = new_list_generation()
+    return generation
+
+
+def new_list_generation():
+    generation = uuid.uuid4().hex
+    get_cache().set(LIST_GENERATION_KEY, generation, None)
+    return generation
+
+
+def fetch(kind, key):
+    """Get a cached payload, counting the hit or miss for its kind
+
+    Clients reading from the primary after a write are always sent fresh
+    payloads, since one cached from a lagging replica could miss the write.
+    """
+    payload = None if primary_pinned() else get_cache().get(key)
+    outcome = 'misses' if payload is None else 'hits'
+    with _stats_lock:
+        _stats[f'{kind}_{outcome}'] += 1
+    return payload
+
+
+def store(key, payload, timeout=None):
+    """Cache a payload just read from the database
+
+    Payloads read from a replica are only kept for as long as the replicas
+    may lag, DATABASE_REPLICA_STICKY_SECONDS, since one that missed a write
+    could be stored after the write's invalidation has run.
+    """
+    timeout = timeout or settings.RECIPE_CACHE_TIMEOUT
+    if reads_use_replicas():
+        timeout = min(timeout, settings.DATABASE_REPLICA_STICKY_SECONDS)
+    get_cache().set(key, payload, timeout)
+
+
+def invalidate(recipe_id=None):
+    """Drop the cached list pages, and the cached recipe if given
+
+    This runs straight away and again once the current transaction commits,
+    so a read racing the write cannot leave the old payload cached.
+    """
+    def run():
+        if recipe_id is not None:
+            get_cache().delete(detail_key(recipe_id))
+        new_list_generation()
+
+    run()
+    transaction.on_commit(run)
+
+
+def get_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    for kind in ('detail', 'list', 'count'):
+        for outcome in ('hits', 'misses'):
+            stats.setdefault(f'{kind}_{outcome}', 0)
+    return stats
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
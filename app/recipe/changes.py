@@ -0,0 +1,75 @@
+"""Change feed for syncing recipes incrementally
+
+Every recipe write is logged in core.models.RecipeChange, in the same
+transaction. Clients keep the token of the last change they have seen and
+ask for the changes after it, so a sync costs as much as the changes made
+since, whatever the size of the catalogue.
+"""
+import json
+
+from django.conf import settings
+from django.db import router
+from django.db.models import Max
+from rest_framework.exceptions import ValidationError
+
+from core.models import Recipe, RecipeChange
+from recipe.bulk import chunked
+from recipe.serializers import get_ingredient_lists
+
+
+def get_since(query_params):
+    """Get the ?since= sync token, 0 to sync from the start"""
+    since = query_params.get('since', '0')
+    if not since.isdigit():
+        raise ValidationError({'since': ['Must be a sync token.']})
+    return int(since)
+
+
+def stream_changes(since, chunk_size=None):
+    """Yield the recipe changes after a sync token as lines of JSON
+
+    Each recipe changed since the token appears once, for its latest
+    change: an upsert with the recipe as it is now, or a tombstone for a
+    deleted recipe. Lines are ordered by `token`, which resumes the sync
+    after that line when passed as ?since=.
+
+    The log and the recipes are read from the same database, so a replica
+    never shows a change to a recipe that it does not have yet. Should a
+    logged upsert still find no recipe, as when it has been deleted since,
+    the stream ends before it, for the sync to pick up from there.
+    """
+    chunk_size = chunk_size or settings.RECIPE_BULK_CHUNK_SIZE
+    using = router.db_for_read(RecipeChange)
+    changes = RecipeChange.objects.using(using) \
+        .filter(id__gt=since) \
+        .values('recipe_id') \
+        .annotate(token=Max('id')) \
+        .order_by('token') \
+        .values_list('recipe_id', 'token') \
+        .iterator(chunk_size=chunk_size)
+    for chunk in chunked(changes, chunk_size):
+        ops = dict(
+            RecipeChange.objects.using(using)
+            .filter(id__in=[token for _, token in chunk])
+            .values_list('id', 'op')
+        )
+        recipes = {
+            recipe['id']: recipe
+            for recipe in Recipe.objects.using(using)
+            .filter(id__in=[recipe_id for recipe_id, _ in chunk])
+            .values('id', 'name', 'description', 'ingredient_names')
+        }
+        ingredients = get_ingredient_lists(recipes.values(), using)
+        for recipe_id, token in chunk:
+            recipe = recipes.get(recipe_id)
+            if ops[token] == RecipeChange.DELETE:
+                change = {'token': token, 'op': 'delete', 'id': recipe_id}
+            elif recipe is None:
+                return
+            else:
+                del recipe['ingredient_names']
+                recipe['ingredients'] = [
+                    {'name': name} for name in ingredients[recipe_id]
+                ]
+                change = {'token': token, 'op': 'upsert', 'recipe': recipe}
+            yield json.dumps(change) + '\n'
@@ -0,0 +1,68 @@
+from calendar import timegm
+
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from core.models import Recipe
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The recipe has changed since it was last fetched.'
+    default_code = 'precondition_failed'
+
+
+def get_etag(recipe_id, version):
+    return quote_etag(f'{recipe_id}-{version}')
+
+
+def get_last_modified(updated_at):
+    return timegm(updated_at.utctimetuple())
+
+
+def get_validators(recipe_id, version, updated_at):
+    """Get the ETag and Last-Modified headers for a version of a recipe"""
+    return {
+        'ETag': get_etag(recipe_id, version),
+        'Last-Modified': http_date(get_last_modified(updated_at)),
+    }
+
+
+def get_not_modified(request, recipe_id, version, updated_at):
+    """Get a 304 or 412 response if the request preconditions say so
+
+    If-Match is compared weakly, as compressed responses carry their ETag
+    as weak, and the version it names is the same in any coding.
+    """
+    if_match = request.META.get('HTTP_IF_MATCH')
+    if if_match:
+        request.META['HTTP_IF_MATCH'] = ', '.join(
+            etag[2:] if etag.startswith('W/') else etag
+            for etag in parse_etags(if_match)
+        )
+    return get_conditional_response(
+        request,
+        etag=get_etag(recipe_id, version),
+        last_modified=get_last_modified(updated_at),
+    )
+
+
+def lock_for_write(request, recipe_id):
+    """Lock a recipe row and check the write preconditions of the request
+
+    Returns the current version of the recipe, raising PreconditionFailed
+    if an If-Match or If-Unmodified-Since header does not match it.
+    """
+    try:
+        version, updated_at = Recipe.objects.select_for_update() \
+            .values_list('version', 'updated_at') \
+            .get(pk=recipe_id)
+    except Recipe.DoesNotExist:
+        raise Http404
+    if request is not None and \
+            get_not_modified(request, recipe_id, version, updated_at):
+        raise PreconditionFailed()
+    return version
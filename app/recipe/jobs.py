@@ -0,0 +1,47 @@
+"""Background jobs for recipe operations too slow to run in a request"""
+from django.conf import settings
+from django.db import transaction
+
+from core.jobs import delete_upload, handler, read_upload_lines
+from recipe import bulk, snapshots
+
+
+# Chunks already committed would be imported twice if run again
+@handler('recipe.import', requeue=False)
+def import_recipes(upload=None, body=None):
+    """Import recipes from a JSON Lines upload, returning the import report
+
+    Jobs queued before bodies were stored as uploads carry the body itself.
+    """
+    if body is not None:
+        return bulk.import_recipes(body.splitlines())
+    try:
+        return bulk.import_recipes(read_upload_lines(upload))
+    finally:
+        delete_upload(upload)
+
+
+@handler('recipe.delete')
+def delete_recipes(ids, chunk_size=None):
+    """Delete recipes a chunk at a time, each chunk in its own transaction
+
+    Returns the number of recipes deleted. Recipes already gone are skipped.
+    """
+    chunk_size = chunk_size or settings.RECIPE_BULK_CHUNK_SIZE
+    deleted = 0
+    for chunk in bulk.chunked(ids, chunk_size):
+        with transaction.atomic():
+            deleted += len(bulk.delete_recipes(chunk))
+    return {'deleted': deleted}
+
+
+@handler(snapshots.DETAIL_JOB)
+def build_snapshot_details(recipe_ids):
+    """Rebuild the snapshots of recipes, returning the number built"""
+    return {'recipes': snapshots.build_details(recipe_ids)}
+
+
+@handler(snapshots.LIST_JOB)
+def build_snapshot_lists():
+    """Rebuild the recipe list page snapshots, returning the page count"""
+    return {'pages': snapshots.build_list_pages()}
@@ -0,0 +1,176 @@
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from recipe import counting
+
+
+class RecipeCursorPagination(BasePagination):
+    """Keyset pagination over recipes
+
+    Each page is fetched with a `WHERE (name, id) > (last name, last id)`
+    style predicate rather than an OFFSET, so deep pages cost the same as
+    the first one. The keyset is taken from the queryset ordering, which
+    defaults to (name, id). Cursors are opaque base64 tokens.
+
+    With ?count=true the response also carries the number of matching
+    recipes, which may be an estimate on large tables.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    max_page_size = 500
+    ordering = ('name', 'id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('true', '1'):
+            self.count = counting.count_recipes(
+                queryset, request.query_params
+            )
+
+        self.ordering = self.get_ordering(queryset)
+        self.reverse = cursor is not None and cursor['reverse']
+        ordering = self.ordering
+        if self.reverse:
+            ordering = tuple(self.reverse_field(f) for f in ordering)
+        queryset = queryset.order_by(*ordering)
+
+        if cursor is not None:
+            if len(cursor['position']) != len(ordering):
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                queryset = queryset.filter(
+                    self.get_keyset_filter(ordering, cursor['position'])
+                )
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        # Fetch one extra row to find out whether another page follows
+        results = list(queryset[:page_size + 1])
+        self.has_more = len(results) > page_size
+        self.page = results[:page_size]
+        if self.reverse:
+            self.page.reverse()
+        self.has_cursor = cursor is not None
+        return self.page
+
+    def get_ordering(self, queryset):
+        """Get the keyset fields, ending in a unique field such as id"""
+        return tuple(queryset.query.order_by) or self.ordering
+
+    @staticmethod
+    def reverse_field(field):
+        return field[1:] if field.startswith('-') else '-' + field
+
+    def get_keyset_filter(self, ordering, position):
+        """Get the predicate selecting rows strictly after the cursor"""
+        keyset = Q()
+        for index, field in enumerate(ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {
+                previous.lstrip('-'): value
+                for previous, value in zip(ordering[:index], position)
+            }
+            equal[f"{field.lstrip('-')}__{lookup}"] = position[index]
+            keyset |= Q(**equal)
+        return keyset
+
+    @staticmethod
+    def get_value(recipe, field):
+        """Get a field from a recipe instance or a `.values()` row"""
+        if isinstance(recipe, dict):
+            return recipe[field]
+        return getattr(recipe, field)
+
+    def get_page_size(self, request):
+        """Get the ?page_size= asked for, RECIPE_PAGE_SIZE by default"""
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.RECIPE_PAGE_SIZE
+        if page_size <= 0:
+            return settings.RECIPE_PAGE_SIZE
+        return min(page_size, self.max_page_size)
+
+    def get_paginated_response(self, data):
+        counts = []
+        if self.count is not None:
+            count, is_estimate = self.count
+            counts = [('count', count), ('count_is_estimate', is_estimate)]
+        return Response(OrderedDict([
+            *counts,
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        return self.get_link(self.get_next_cursor())
+
+    def get_previous_link(self):
+        return self.get_link(self.get_previous_cursor())
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, cursor
+        )
+
+    def get_next_cursor(self):
+        if not self.page:
+            return None
+        # Going backwards, there is always a page after the one we came from
+        if self.has_more or self.reverse:
+            return self.encode_cursor(self.page[-1], reverse=False)
+        return None
+
+    def get_previous_cursor(self):
+        if not self.page:
+            return None
+        if (self.has_more and self.reverse) or \
+                (self.has_cursor and not self.reverse):
+            return self.encode_cursor(self.page[0], reverse=True)
+        return None
+
+    def decode_cursor(self, request):
+        """Decode the cursor query parameter into a keyset position"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            cursor = json.loads(b64decode(encoded.encode('ascii')))
+            position = cursor['p']
+            if not isinstance(position, list):
+                raise TypeError('Cursor position must be a list')
+            return {
+                'position': position,
+                'reverse': bool(cursor.get('r', False)),
+            }
+        except (AttributeError, KeyError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, recipe, reverse):
+        """Encode a keyset position as the cursor of the page beyond it"""
+        cursor = {
+            'p': [self.get_value(recipe, f.lstrip('-')) for f in self.ordering]
+        }
+        if reverse:
+            cursor['r'] = True
+        return b64encode(
+            json.dumps(cursor, separators=(',', ':')).encode('utf-8')
+        ).decode('ascii')
@@ -0,0 +1,165 @@
+from functools import reduce
+from operator import add, and_
+
+from django.db import connection
+from django.db.models import Case, Exists, FloatField, OuterRef, Q, Value, \
+    When
+from django.db.models.functions import Lower, Trim
+from rest_framework.exceptions import ValidationError
+
+from core.models import Ingredient
+
+
+SEARCH_CONFIG = 'english'
+
+# Relevance weights for a match in each part of a recipe
+NAME_WEIGHT = 1.0
+INGREDIENT_WEIGHT = 0.5
+DESCRIPTION_WEIGHT = 0.2
+
+
+# Values of ?ingredient_match= and whether every ingredient must match
+INGREDIENT_MATCHES = {'all': True, 'any': False}
+
+
+def filter_recipes(queryset, query_params):
+    """Apply the ?name= and ?ingredient= filters and ?q= search
+
+    Ingredients are given as repeated or comma separated ?ingredient=
+    values, with ?ingredient_match=all (the default) or any.
+    """
+    name = query_params.get('name')
+    text = query_params.get('q')
+    ingredients = [
+        ingredient
+        for value in query_params.getlist('ingredient')
+        for ingredient in value.split(',')
+        if ingredient.strip()
+    ]
+    if name:
+        queryset = filter_by_name(queryset, name)
+    if ingredients:
+        match = query_params.get('ingredient_match', 'all')
+        if match not in INGREDIENT_MATCHES:
+            raise ValidationError({
+                'ingredient_match': ['Must be one of: all, any.']
+            })
+        queryset = filter_by_ingredients(
+            queryset, ingredients, match_all=INGREDIENT_MATCHES[match]
+        )
+    if text:
+        queryset = search(queryset, text).order_by('-rank', 'id')
+    return queryset
+
+
+def filter_by_name(queryset, name):
+    """Filter recipes whose name contains the given text
+
+    On PostgreSQL this is served by the trigram index on UPPER(name).
+    """
+    return queryset.filter(name__icontains=name)
+
+
+def normalize_ingredient(name):
+    """Normalize an ingredient name as the ingredient name index does"""
+    return name.strip().lower()
+
+
+def filter_by_ingredients(queryset, names, match_all=True):
+    """Filter recipes having all, or any, of the named ingredients
+
+    Each name is matched case-insensitively and ignoring surrounding
+    whitespace, as a lookup on the index on LOWER(TRIM(name)) and
+    recipe_id, which also holds the recipe ids needed.
+    """
+    ingredients = Ingredient.objects.alias(
+        normalized_name=Lower(Trim('name'))
+    )
+    names = sorted({normalize_ingredient(name) for name in names})
+    if not match_all:
+        return queryset.filter(id__in=ingredients.filter(
+            normalized_name__in=names
+        ).values('recipe_id'))
+    for name in names:
+        queryset = queryset.filter(id__in=ingredients.filter(
+            normalized_name=name
+        ).values('recipe_id'))
+    return queryset
+
+
+def search(queryset, text):
+    """Search recipe names, descriptions and ingredients for the given text
+
+    Matching recipes are annotated with a `rank`, higher is more relevant.
+    """
+    if connection.vendor == 'postgresql':
+        return full_text_search(queryset, text)
+    return fallback_search(queryset, text)
+
+
+def full_text_search(queryset, text):
+    """Search using the tsvector GIN indexes on recipes and ingredients"""
+    from django.contrib.postgres.search import SearchQuery, SearchRank, \
+        SearchVector
+
+    # plainto_tsquery, matching every term, as websearch_to_tsquery needs
+    # PostgreSQL 11 and the database image is PostgreSQL 10
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type='plain')
+    # These expressions must match the indexes in the search migration
+    document = SearchVector('name', weight='A', config=SEARCH_CONFIG) + \
+        SearchVector('description', weight='B', config=SEARCH_CONFIG)
+    ingredient_matches = Ingredient.objects \
+        .annotate(document=SearchVector('name', config=SEARCH_CONFIG)) \
+        .filter(document=query)
+
+    recipe_ids = queryset.model.objects \
+        .annotate(document=document) \
+        .filter(document=query) \
+        .values('id') \
+        .union(ingredient_matches.values('recipe_id'))
+
+    return queryset.filter(id__in=recipe_ids).annotate(
+        rank=SearchRank(document, query) + Case(
+            When(
+                Exists(ingredient_matches.filter(recipe=OuterRef('pk'))),
+                then=Value(INGREDIENT_WEIGHT)
+            ),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    )
+
+
+def fallback_search(queryset, text):
+    """Search using case-insensitive substring matches on each term"""
+    terms = text.split()
+    if not terms:
+        return queryset.none()
+
+    matches, scores = [], []
+    for term in terms:
+        in_ingredients = Exists(Ingredient.objects.filter(
+            recipe=OuterRef('pk'), name__icontains=term
+        ))
+        matches.append(
+            Q(name__icontains=term) |
+            Q(description__icontains=term) |
+            Q(in_ingredients)
+        )
+        scores += [
+            score_match(Q(name__icontains=term), NAME_WEIGHT),
+            score_match(Q(in_ingredients), INGREDIENT_WEIGHT),
+            score_match(Q(description__icontains=term), DESCRIPTION_WEIGHT),
+        ]
+
+    return queryset.filter(reduce(and_, matches)).annotate(
+        rank=reduce(add, scores)
+    )
+
+
+def score_match(condition, weight):
+    return Case(
+        When(condition, then=Value(weight)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
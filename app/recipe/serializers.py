@@ -1,6 +1,137 @@
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import models, transaction
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from core.models import Recipe, Ingredient, get_ingredient_names, \
+    ingredient_snapshots_managed
+from recipe import conditional
+
+
+RECIPE_FIELDS = ('id', 'name', 'description', 'ingredients')
+
+# Fields left out by ?fields= that ?expand= can add back
+EXPANDABLE_FIELDS = ('ingredients',)
+
+
+def get_requested_fields(query_params):
+    """Get the recipe fields chosen by ?fields= and ?expand=, None for all
+
+    ?fields=id,name limits recipes to the given fields, and
+    ?expand=ingredients adds the ingredients back to such a selection.
+    """
+    if not query_params.get('fields'):
+        return None
+
+    def names(param):
+        return {
+            name.strip() for value in query_params.getlist(param)
+            for name in value.split(',') if name.strip()
+        }
+    fields, expand = names('fields'), names('expand')
+    errors = {}
+    unknown = fields - set(RECIPE_FIELDS)
+    if unknown:
+        errors['fields'] = [f"Unknown fields: {', '.join(sorted(unknown))}."]
+    if expand - set(EXPANDABLE_FIELDS):
+        errors['expand'] = [
+            f"Only {', '.join(EXPANDABLE_FIELDS)} can be expanded."
+        ]
+    if errors:
+        raise ValidationError(errors)
+    return tuple(field for field in RECIPE_FIELDS
+                 if field in fields or field in expand)
+
+
+def select_fields(queryset, fields):
+    """Narrow a recipe queryset to the columns the given fields need
+
+    Loads only those columns, plus the id and ordering fields, and no
+    ingredients unless they are among the fields.
+    """
+    if fields is None:
+        return with_ingredients(queryset)
+    columns = {'id'} | {field for field in fields if field != 'ingredients'}
+    columns |= {
+        field.lstrip('-') for field in queryset.query.order_by
+        if field.lstrip('-') in ('id', 'name', 'description')
+    }
+    if 'ingredients' in fields:
+        if settings.RECIPE_INGREDIENT_SNAPSHOT:
+            columns.add('ingredient_names')
+        else:
+            queryset = queryset.with_ingredients()
+    return queryset.only(*columns)
+
+
+def with_ingredients(queryset):
+    """Load what RecipeSerializer needs of the ingredients of each recipe
+
+    Nothing extra when ingredients are read from the recipe snapshots.
+    """
+    if settings.RECIPE_INGREDIENT_SNAPSHOT:
+        return queryset
+    return queryset.with_ingredients()
+
+
+def prefetch_ingredients(recipes):
+    """Load what RecipeSerializer needs of the ingredients of loaded recipes
+
+    Loads them in one query, for the recipes that cannot be serialized from
+    an ingredient snapshot.
+    """
+    if settings.RECIPE_INGREDIENT_SNAPSHOT:
+        recipes = [
+            recipe for recipe in recipes if recipe.ingredient_names is None
+        ]
+    models.prefetch_related_objects(recipes, models.Prefetch(
+        'ingredients', queryset=Ingredient.objects.order_by('id')
+    ))
+
 
-from core.models import Recipe, Ingredient
+def get_ingredient_lists(rows, using=None):
+    """Get the ingredient names of recipe rows, by recipe id
+
+    Names come from the rows' ingredient snapshots when those are enabled,
+    with a single query, on the `using` database if given, for any recipes
+    lacking one.
+    """
+    names = {
+        row['id']: (row.get('ingredient_names')
+                    if settings.RECIPE_INGREDIENT_SNAPSHOT else None)
+        for row in rows
+    }
+    missing = [recipe_id for recipe_id, value in names.items()
+               if value is None]
+    if missing:
+        names.update(get_ingredient_names(missing, using))
+    return names
+
+
+def diff_ingredients(existing, names):
+    """Work out the ingredient changes turning a recipe's list into names
+
+    Takes the current ingredients as (id, name) pairs in id order. Returns
+    the ids to delete, the names to insert and the resulting snapshot,
+    keeping an ingredient wherever its name is still wanted.
+    """
+    available = {}
+    for pk, name in existing:
+        available.setdefault(name, []).append(pk)
+
+    kept, added = [], []
+    for name in names:
+        if available.get(name):
+            kept.append((available[name].pop(), name))
+        else:
+            added.append(name)
+
+    removed = [pk for pks in available.values() for pk in pks]
+    # New ingredients get higher ids than the ones kept
+    snapshot = [name for pk, name in sorted(kept)] + added
+    return removed, added, snapshot
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -12,27 +143,138 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
+class RecipeListSerializer(serializers.ListSerializer):
+    """Serializer for lists of Recipe objects
+
+    Given `.values()` rows rather than model instances, recipes are built
+    straight from the rows with their ingredients taken from the snapshots
+    or loaded in one query, skipping the per-row field serializers. The
+    output is identical.
+    """
+    row_fields = ('id', 'name', 'description')
+
+    @classmethod
+    def get_rows(cls, queryset, fields=None):
+        """Get a recipe queryset as rows, keeping its ordering fields
+
+        Given the recipe fields to serialize, only the columns they need
+        are selected.
+        """
+        columns = [
+            column for column in cls.row_fields
+            if fields is None or column == 'id' or column in fields
+        ]
+        if settings.RECIPE_INGREDIENT_SNAPSHOT and \
+                (fields is None or 'ingredients' in fields):
+            columns.append('ingredient_names')
+        for field in queryset.query.order_by:
+            if field.lstrip('-') not in columns:
+                columns.append(field.lstrip('-'))
+        return queryset.prefetch_related(None).values(*columns)
+
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            data = data.all()
+        rows = list(data)
+        if not rows or not isinstance(rows[0], dict):
+            return super().to_representation(rows)
+
+        fields = list(self.child.fields)
+        ingredients = {}
+        if 'ingredients' in fields:
+            ingredients = {
+                recipe_id: [OrderedDict(name=name) for name in names]
+                for recipe_id, names in get_ingredient_lists(rows).items()
+            }
+        return [
+            OrderedDict(
+                (field, ingredients[row['id']] if field == 'ingredients'
+                 else row[field])
+                for field in fields
+            )
+            for row in rows
+        ]
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     """Serializer for Recipe object"""
     ingredients = IngredientSerializer(many=True, read_only=False)
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'description', 'ingredients')
+        fields = RECIPE_FIELDS
         read_only_fields = ('id',)
+        list_serializer_class = RecipeListSerializer
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field in set(self.fields) - set(fields):
+                self.fields.pop(field)
 
+    def to_representation(self, instance):
+        names = None
+        if 'ingredients' in self.fields and \
+                settings.RECIPE_INGREDIENT_SNAPSHOT:
+            names = getattr(instance, 'ingredient_names', None)
+        if names is None:
+            return super().to_representation(instance)
+        # Build the ingredients from the snapshot instead of querying them
+        ret = OrderedDict()
+        for field in self._readable_fields:
+            if field.field_name == 'ingredients':
+                ret['ingredients'] = [OrderedDict(name=name) for name in names]
+            else:
+                ret[field.field_name] = field.to_representation(
+                    field.get_attribute(instance)
+                )
+        return ret
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients', [])
-        recipe = Recipe.objects.create(**validated_data)
-        for ingredient in ingredients_data:
-            Ingredient.objects.create(recipe=recipe, **ingredient)
+        recipe = Recipe.objects.create(
+            ingredient_names=[
+                ingredient['name'] for ingredient in ingredients_data
+            ],
+            **validated_data
+        )
+        Ingredient.objects.bulk_create([
+            Ingredient(recipe=recipe, **ingredient)
+            for ingredient in ingredients_data
+        ])
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients_data = validated_data.pop('ingredients', [])
-        recipe = super().update(instance, validated_data)
+        ingredients_data = validated_data.pop('ingredients', None)
+        version = conditional.lock_for_write(
+            self.context.get('request'), instance.pk
+        )
+        instance.version = version + 1
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        # Only write what changed, so a snapshot refreshed since the
+        # instance was loaded is not overwritten
+        update_fields = [*validated_data, 'version', 'updated_at']
+        if ingredients_data is not None:
+            with ingredient_snapshots_managed():
+                self.sync_ingredients(instance, ingredients_data)
+            update_fields.append('ingredient_names')
+        instance.save(update_fields=update_fields)
+        return instance
 
-        recipe.ingredients.all().delete()
-        for ingredient in ingredients_data:
-            Ingredient.objects.create(recipe=recipe, **ingredient)
-        return recipe
+    def sync_ingredients(self, recipe, ingredients_data):
+        """Insert and delete only the ingredients that have changed
+
+        Sets the recipe's ingredient snapshot to match, without saving it.
+        """
+        removed, added, recipe.ingredient_names = diff_ingredients(
+            recipe.ingredients.order_by('id').values_list('id', 'name'),
+            [ingredient['name'] for ingredient in ingredients_data],
+        )
+        if removed:
+            Ingredient.objects.filter(id__in=removed).delete()
+        Ingredient.objects.bulk_create([
+            Ingredient(recipe=recipe, name=name) for name in added
+        ])
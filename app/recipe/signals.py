@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Recipe, Ingredient, recipes_changed
+from recipe import cache, snapshots
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    """Drop cached payloads for a recipe that has changed"""
+    cache.invalidate(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredient_recipe(sender, instance, **kwargs):
+    """Drop cached payloads for the recipe of an ingredient that has changed"""
+    cache.invalidate(instance.recipe_id)
+
+
+@receiver(recipes_changed)
+def refresh_snapshots(sender, upserted, deleted, **kwargs):
+    """Rebuild the snapshots of changed recipes once the change commits"""
+    if settings.RECIPE_SNAPSHOTS:
+        transaction.on_commit(
+            lambda: snapshots.refresh(upserted, deleted)
+        )
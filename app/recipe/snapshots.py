@@ -0,0 +1,197 @@
+"""Pre-rendered recipe details and list pages
+
+Most recipes change rarely, so their JSON is rendered ahead of time into
+core.models.RecipeSnapshot rows and served as is, skipping the ORM and the
+serializers. Details are rebuilt as soon as a write to their recipe
+commits, or by a background job for writes to many recipes. List pages,
+which any write can shift, are rebuilt together by a background job. A
+snapshot is only served while no change has been logged since it was
+built, so a stale one falls back to a normal read.
+"""
+import hashlib
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Subquery
+from django.http import QueryDict
+from rest_framework.utils.urls import replace_query_param
+
+from core import jobs
+from core.db.routers import use_primary
+from core.models import Job, Recipe, RecipeChange, RecipeSnapshot
+from core.renderers import FastJSONRenderer
+from recipe import serializers
+from recipe.bulk import chunked
+from recipe.pagination import RecipeCursorPagination
+
+
+logger = logging.getLogger(__name__)
+
+DETAIL_JOB = 'recipe.snapshot_details'
+LIST_JOB = 'recipe.snapshot_lists'
+
+
+class PageRequest:
+    """Stand-in request for a page of the unfiltered recipe list"""
+
+    def __init__(self, cursor=None):
+        self.query_params = QueryDict(mutable=True)
+        if cursor is not None:
+            self.query_params['cursor'] = cursor
+
+    def build_absolute_uri(self):
+        return ''
+
+
+def detail_key(recipe_id):
+    return f'detail:{recipe_id}'
+
+
+def list_key(cursor=None):
+    digest = hashlib.md5((cursor or '').encode('utf-8'))
+    return f'list:{digest.hexdigest()}'
+
+
+def render(data):
+    return FastJSONRenderer().render(data)
+
+
+def get_change_head():
+    """Get the id of the latest recipe change, 0 if there are none"""
+    return RecipeChange.objects.aggregate(head=Max('id'))['head'] or 0
+
+
+def build_details(recipe_ids, chunk_size=None):
+    """Render the snapshots of recipes, dropping those of deleted recipes
+
+    Returns the number of snapshots built.
+    """
+    chunk_size = chunk_size or settings.RECIPE_BULK_CHUNK_SIZE
+    built = 0
+    with use_primary():
+        # Read before rendering, so a snapshot never claims a change it
+        # might have missed
+        token = get_change_head()
+        for chunk in chunked(recipe_ids, chunk_size):
+            recipes = serializers.with_ingredients(Recipe.objects) \
+                .filter(id__in=chunk)
+            snapshots = [
+                RecipeSnapshot(
+                    key=detail_key(recipe.id),
+                    body=render(serializers.RecipeSerializer(recipe).data),
+                    token=token,
+                    meta={
+                        'version': recipe.version,
+                        'updated_at': recipe.updated_at.isoformat(),
+                    },
+                )
+                for recipe in recipes
+            ]
+            with transaction.atomic():
+                RecipeSnapshot.objects.filter(
+                    key__in=[detail_key(recipe_id) for recipe_id in chunk]
+                ).delete()
+                RecipeSnapshot.objects.bulk_create(snapshots)
+            built += len(snapshots)
+    return built
+
+
+def build_list_pages(max_pages=None):
+    """Render the first pages of the unfiltered recipe list
+
+    Only the results of each page are stored, with the cursors of the pages
+    either side, since the links depend on the URL of the request. Returns
+    the number of pages built.
+    """
+    max_pages = max_pages or settings.RECIPE_SNAPSHOT_LIST_PAGES
+    queryset = Recipe.objects.order_by('name', 'id')
+    if settings.RECIPE_FAST_LIST:
+        queryset = serializers.RecipeListSerializer.get_rows(queryset)
+    else:
+        queryset = serializers.select_fields(queryset, None)
+
+    snapshots = []
+    cursor = None
+    with use_primary():
+        token = get_change_head()
+        while len(snapshots) < max_pages:
+            paginator = RecipeCursorPagination()
+            page = paginator.paginate_queryset(queryset, PageRequest(cursor))
+            data = serializers.RecipeSerializer(page, many=True).data
+            snapshots.append(RecipeSnapshot(
+                key=list_key(cursor),
+                body=render(data),
+                token=token,
+                meta={
+                    'next': paginator.get_next_cursor(),
+                    'previous': paginator.get_previous_cursor(),
+                },
+            ))
+            cursor = snapshots[-1].meta['next']
+            if cursor is None:
+                break
+        with transaction.atomic():
+            RecipeSnapshot.objects.filter(key__startswith='list:').delete()
+            RecipeSnapshot.objects.bulk_create(snapshots)
+    return len(snapshots)
+
+
+def refresh(upserted=(), deleted=()):
+    """Rebuild the snapshots of changed recipes and queue the list pages
+
+    Writes to more than RECIPE_SNAPSHOT_SYNC_MAX recipes queue a job to
+    rebuild their snapshots instead. Runs once the write has committed.
+    Failing leaves the snapshots stale, which the freshness check catches,
+    so it does not fail the write.
+    """
+    try:
+        recipe_ids = [*upserted, *deleted]
+        if len(recipe_ids) > settings.RECIPE_SNAPSHOT_SYNC_MAX:
+            jobs.enqueue(DETAIL_JOB, recipe_ids=recipe_ids)
+        else:
+            build_details(recipe_ids)
+        queued = Job.objects.filter(kind=LIST_JOB, status=Job.QUEUED)
+        with use_primary():
+            if not queued.exists():
+                jobs.enqueue(LIST_JOB)
+    except Exception:
+        logger.exception('Failed to refresh recipe snapshots')
+
+
+def get_fresh(key, changes):
+    """Get a snapshot unless one of the changes is newer, None if not"""
+    latest = changes.order_by('-id').values('id')[:1]
+    snapshot = RecipeSnapshot.objects \
+        .annotate(latest=Subquery(latest)) \
+        .filter(key=key) \
+        .first()
+    if snapshot is None or (snapshot.latest or 0) > snapshot.token:
+        return None
+    return snapshot
+
+
+def get_detail(recipe_id):
+    """Get the fresh snapshot of a recipe"""
+    return get_fresh(
+        detail_key(recipe_id), RecipeChange.objects.filter(recipe_id=recipe_id)
+    )
+
+
+def get_list_page(cursor=None):
+    """Get the fresh snapshot of a page of the unfiltered recipe list"""
+    return get_fresh(list_key(cursor), RecipeChange.objects.all())
+
+
+def render_list_page(snapshot, request):
+    """Render a list page snapshot as the paginated response would be"""
+    url = request.build_absolute_uri()
+    links = render({
+        name: None if cursor is None
+        else replace_query_param(url, 'cursor', cursor)
+        for name, cursor in (
+            ('next', snapshot.meta['next']),
+            ('previous', snapshot.meta['previous']),
+        )
+    })
+    return links[:-1] + b',"results":' + bytes(snapshot.body) + b'}'
@@ -0,0 +1,163 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+
+from core.throttling import get_store
+from recipe.serializers import RecipeSerializer
+from recipe.tests.test_recipes_api import given_ingredient_exists, \
+    given_recipe_exists
+
+
+ASYNC_RECIPES_URL = reverse('async_recipe:recipe-list')
+ASYNC_SEARCH_URL = reverse('async_recipe:recipe-search')
+
+
+def async_recipe_url(recipe_id):
+    """Construct the async URL for a single recipe based on its ID"""
+    return reverse('async_recipe:recipe-detail', args=[recipe_id])
+
+
+class AsyncRecipeApiTests(TransactionTestCase):
+    """Test the async Recipe read API
+
+    Database work runs on worker threads with their own connections, so
+    test data has to be committed for them to see it.
+    """
+
+    def setUp(self):
+        self.client = AsyncClient()
+        cache.clear()
+        get_store().clear()
+
+    async def test_get_recipes(self):
+        """Test GET async/recipe/"""
+
+        # Given
+        await self.given_recipe('Eggs Benedict')
+        await self.given_recipe('Ham Egg and Chips')
+
+        # When
+        response = await self.client.get(f'{ASYNC_RECIPES_URL}?page_size=1')
+
+        # Then the request is successful
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Then the first page of recipes is returned
+        data = response.json()
+        self.assertEqual(
+            [r['name'] for r in data['results']], ['Eggs Benedict']
+        )
+        self.assertIsNotNone(data['next'])
+
+    async def test_get_recipes_sparse_fields(self):
+        """Test GET async/recipe/?fields=name"""
+
+        # Given
+        await self.given_recipe('Eggs Benedict', ingredient='eggs')
+
+        # When
+        response = await self.client.get(f'{ASYNC_RECIPES_URL}?fields=name')
+
+        # Then only the requested fields are returned
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json()['results'], [{'name': 'Eggs Benedict'}]
+        )
+
+    async def test_search_recipes(self):
+        """Test GET async/recipe/search/?q=xyz"""
+
+        # Given
+        await self.given_recipe('Jam tart')
+        await self.given_recipe('Gnocchi')
+
+        # When
+        response = await self.client.get(f'{ASYNC_SEARCH_URL}?q=jam')
+
+        # Then the matching recipes are returned
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['name'] for r in response.json()['results']], ['Jam tart']
+        )
+
+    async def test_search_recipes_without_query(self):
+        """Test GET async/recipe/search/ without ?q="""
+
+        # When
+        response = await self.client.get(ASYNC_SEARCH_URL)
+
+        # Then the request fails
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_get_recipe(self):
+        """Test GET async/recipe/{id} matches the sync API"""
+
+        # Given
+        recipe = await self.given_recipe('Carrot Cake', ingredient='carrots')
+
+        # When
+        response = await self.client.get(async_recipe_url(recipe.id))
+
+        # Then the recipe is returned as the sync API would
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), await self.serialize(recipe))
+        self.assertEqual(response['ETag'], f'"{recipe.id}-{recipe.version}"')
+
+        # Then an unchanged recipe is not sent again
+        response = await self.client.get(
+            async_recipe_url(recipe.id),
+            **{'If-None-Match': response['ETag']}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_get_non_existent_recipe(self):
+        """Test GET async/recipe/{id} for non-existent recipe"""
+
+        # When
+        response = await self.client.get(async_recipe_url(12345))
+
+        # Then the request fails with "not found" status
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {'recipe': '2/min'},
+    })
+    async def test_throttled(self):
+        """Test the async views share the recipe API throttle"""
+
+        # Given
+        recipe = await self.given_recipe('Carrot Cake')
+
+        # When
+        responses = [
+            await self.client.get(ASYNC_RECIPES_URL),
+            await self.client.get(async_recipe_url(recipe.id)),
+            await self.client.get(async_recipe_url(recipe.id)),
+        ]
+
+        # Then the client is throttled once the bucket is empty
+        self.assertEqual(
+            [response.status_code for response in responses],
+            [status.HTTP_200_OK, status.HTTP_200_OK,
+             status.HTTP_429_TOO_MANY_REQUESTS]
+        )
+        self.assertEqual(responses[2]['Retry-After'], '30')
+        self.assertIn('throttled', responses[2].json()['detail'])
+
+    async def given_recipe(self, name, ingredient=None):
+        from asgiref.sync import sync_to_async
+
+        def create():
+            recipe = given_recipe_exists(name=name)
+            if ingredient:
+                given_ingredient_exists(recipe, name=ingredient)
+            return recipe
+        return await sync_to_async(create)()
+
+    async def serialize(self, recipe):
+        from asgiref.sync import sync_to_async
+        return await sync_to_async(lambda: RecipeSerializer(recipe).data)()
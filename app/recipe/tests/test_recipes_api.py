@@ -1,15 +1,32 @@
+import json
+import threading
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
 from django.urls import reverse
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Recipe, Ingredient
+from core import jobs
+from core.models import Job, Recipe, RecipeChange, Ingredient, \
+    UploadChunk
 
+from recipe import cache as recipe_cache
+from recipe.bulk import create_recipes
 from recipe.serializers import RecipeSerializer
 
 
 RECIPES_URL = reverse('recipe:recipe-list')
+IMPORT_URL = reverse('recipe:recipe-bulk-import')
+EXPORT_URL = reverse('recipe:recipe-bulk-export')
+BATCH_URL = reverse('recipe:recipe-batch')
+BULK_DELETE_URL = reverse('recipe:recipe-bulk-delete')
+CHANGES_URL = reverse('recipe:recipe-change-feed')
+CACHE_STATS_URL = reverse('recipe:recipe-cache-stats')
 
 
 def recipe_url(recipe_id):
@@ -26,6 +43,19 @@ def given_recipe_exists(**params):
     return Recipe.objects.create(**defaults)
 
 
+def given_recipes_exist(names, ingredients=(), **params):
+    """Create recipes, each with the given ingredients, in one batch"""
+    defaults = {
+        'description': 'MOCK_RECIPE_DESCRIPTION'
+    }
+    defaults.update(params)
+    ingredients = [{'name': ingredient} for ingredient in ingredients]
+    return create_recipes([
+        {**defaults, 'name': name, 'ingredients': ingredients}
+        for name in names
+    ])
+
+
 def given_ingredient_exists(recipe, **params):
     defaults = {
         'name': 'MOCK_INGREDIENT_NAME',
@@ -39,6 +69,8 @@ class PublicRecipeApiTests(TestCase):
 
     def setUp(self):
         self.client = APIClient()
+        cache.clear()
+        recipe_cache.reset_stats()
 
     def test_get_recipes(self):
         """Test GET recipes/"""
@@ -54,8 +86,213 @@ class PublicRecipeApiTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
         # Then the response contains the recipes
-        self.assertEqual(response.data[0]['name'], 'Eggs Benedict')
-        self.assertEqual(response.data[1]['name'], 'Ham Egg and Chips')
+        recipes = response.data['results']
+        self.assertEqual(recipes[0]['name'], 'Eggs Benedict')
+        self.assertEqual(recipes[1]['name'], 'Ham Egg and Chips')
+
+    def test_get_recipes_query_count_does_not_grow(self):
+        """Test GET recipes/ query count is independent of recipe count"""
+
+        for ingredient_snapshot, fast_list in (
+            (True, True), (False, True), (True, False), (False, False),
+        ):
+            with self.subTest(
+                ingredient_snapshot=ingredient_snapshot, fast_list=fast_list
+            ), override_settings(
+                RECIPE_INGREDIENT_SNAPSHOT=ingredient_snapshot,
+                RECIPE_FAST_LIST=fast_list,
+            ):
+                Recipe.objects.all().delete()
+                cache.clear()
+
+                # Given a small catalogue
+                given_recipes_exist(
+                    [f'Recipe {i}' for i in range(2)], ingredients=['flour']
+                )
+                with CaptureQueriesContext(connection) as small_catalogue:
+                    self.client.get(RECIPES_URL)
+
+                # Given a larger catalogue
+                given_recipes_exist(
+                    [f'Recipe {i}' for i in range(2, 10)],
+                    ingredients=['flour', 'butter'],
+                )
+
+                # When
+                with CaptureQueriesContext(connection) as large_catalogue:
+                    response = self.client.get(RECIPES_URL)
+
+                # Then the request is successful
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(len(response.data['results']), 10)
+
+                # Then the number of queries has not grown with the catalogue
+                self.assertEqual(
+                    len(large_catalogue.captured_queries),
+                    len(small_catalogue.captured_queries)
+                )
+
+    def test_get_recipes_fast_list_matches_serializer(self):
+        """Test GET recipes/ renders the same with and without fast list"""
+
+        # Given
+        for i in range(3):
+            recipe = given_recipe_exists(
+                name=f'Recipe {i}', description=f'Description "{i}"'
+            )
+            given_ingredient_exists(recipe, name='flour')
+            given_ingredient_exists(recipe, name=f'ingredient {i}')
+        given_recipe_exists(name='No ingredients')
+
+        # When
+        with override_settings(RECIPE_FAST_LIST=True):
+            fast_response = self.client.get(RECIPES_URL, {'page_size': 2})
+        cache.clear()
+        with override_settings(RECIPE_FAST_LIST=False):
+            response = self.client.get(RECIPES_URL, {'page_size': 2})
+
+        # Then the responses are byte for byte identical
+        self.assertEqual(fast_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(fast_response.content, response.content)
+
+    def test_get_recipes_sparse_fields(self):
+        """Test GET recipes/?fields= narrows the output and the query"""
+
+        # Given
+        recipe = given_recipe_exists(name='Carrot Cake')
+        given_ingredient_exists(recipe, name='carrots')
+
+        for fast_list in (True, False):
+            cache.clear()
+
+            # When
+            with override_settings(RECIPE_FAST_LIST=fast_list), \
+                    CaptureQueriesContext(connection) as queries:
+                response = self.client.get(RECIPES_URL, {'fields': 'id,name'})
+
+            # Then only the requested fields are returned
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                response.json()['results'],
+                [{'id': recipe.id, 'name': 'Carrot Cake'}]
+            )
+
+            # Then neither the description nor ingredients are read
+            self.assertEqual(len(queries.captured_queries), 1)
+            sql = queries.captured_queries[0]['sql']
+            self.assertNotIn('description', sql)
+            self.assertNotIn('ingredient', sql)
+
+    def test_get_recipes_expand_ingredients(self):
+        """Test GET recipes/?fields=name&expand=ingredients"""
+
+        # Given
+        recipe = given_recipe_exists(name='Carrot Cake')
+        given_ingredient_exists(recipe, name='carrots')
+
+        for fast_list in (True, False):
+            cache.clear()
+
+            # When
+            with override_settings(RECIPE_FAST_LIST=fast_list):
+                response = self.client.get(RECIPES_URL, {
+                    'fields': 'name', 'expand': 'ingredients'
+                })
+
+            # Then the ingredients are added to the requested fields
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json()['results'], [{
+                'name': 'Carrot Cake', 'ingredients': [{'name': 'carrots'}]
+            }])
+
+    def test_get_recipes_unknown_fields(self):
+        """Test GET recipes/?fields= rejects unknown fields"""
+
+        # When
+        response = self.client.get(RECIPES_URL, {'fields': 'id,calories'})
+
+        # Then the request fails
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('calories', str(response.data['fields']))
+
+    def test_get_recipes_paginated(self):
+        """Test GET recipes/?page_size=n follows cursors through all pages"""
+
+        # Given
+        given_recipes_exist(['Apple pie', 'Banana bread', 'Cherry tart'])
+        duplicate = given_recipe_exists(name='Banana bread')
+
+        # When
+        first_page = self.client.get(RECIPES_URL, {'page_size': 2})
+        second_page = self.client.get(first_page.data['next'])
+
+        # Then the requests are successful
+        self.assertEqual(first_page.status_code, status.HTTP_200_OK)
+        self.assertEqual(second_page.status_code, status.HTTP_200_OK)
+
+        # Then each page is ordered by name then id
+        self.assertEqual(
+            [r['name'] for r in first_page.data['results']],
+            ['Apple pie', 'Banana bread']
+        )
+        self.assertEqual(
+            [r['name'] for r in second_page.data['results']],
+            ['Banana bread', 'Cherry tart']
+        )
+        self.assertEqual(second_page.data['results'][0]['id'], duplicate.id)
+
+        # Then only the first page has a next link
+        self.assertIsNone(first_page.data['previous'])
+        self.assertIsNone(second_page.data['next'])
+
+        # Then the previous link returns the first page
+        previous_page = self.client.get(second_page.data['previous'])
+        self.assertEqual(
+            previous_page.data['results'], first_page.data['results']
+        )
+
+    @override_settings(RECIPE_PAGE_SIZE=2)
+    def test_get_recipes_default_page_size(self):
+        """Test GET recipes/ pages hold RECIPE_PAGE_SIZE recipes by default"""
+
+        # Given
+        given_recipes_exist(['Apple pie', 'Banana bread', 'Cherry tart'])
+
+        # When
+        response = self.client.get(RECIPES_URL)
+
+        # Then
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_get_recipes_paginated_by_name_filter(self):
+        """Test GET recipes/?name=xyz keeps the filter across pages"""
+
+        # Given
+        given_recipes_exist(['Blackberry jam', 'Orange jam', 'Strawberry jam'])
+
+        # When
+        params = {'name': 'berry', 'page_size': 1}
+        first_page = self.client.get(RECIPES_URL, params)
+        second_page = self.client.get(first_page.data['next'])
+
+        # Then only matching recipes are returned
+        self.assertEqual(
+            first_page.data['results'][0]['name'], 'Blackberry jam'
+        )
+        self.assertEqual(
+            second_page.data['results'][0]['name'], 'Strawberry jam'
+        )
+        self.assertIsNone(second_page.data['next'])
+
+    def test_get_recipes_invalid_cursor(self):
+        """Test GET recipes/?cursor=xyz with a malformed cursor"""
+
+        # When
+        response = self.client.get(RECIPES_URL, {'cursor': 'not-a-cursor'})
+
+        # Then the request fails with "not found" status
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_get_recipes_by_name_filter(self):
         """Test GET recipes/?name=xyz"""
@@ -73,13 +310,13 @@ class PublicRecipeApiTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
         # Then the response contains matching recipes
-        filtered_recipes = response.data
-        self.assertEqual(len(filtered_recipes), 2)
-        self.assertIn(RecipeSerializer(included_recipe1).data, response.data)
-        self.assertIn(RecipeSerializer(included_recipe2).data, response.data)
+        filtered = response.data['results']
+        self.assertEqual(len(filtered), 2)
+        self.assertIn(RecipeSerializer(included_recipe1).data, filtered)
+        self.assertIn(RecipeSerializer(included_recipe2).data, filtered)
 
         # Then the response does not contain non-matching recipes
-        self.assertNotIn(RecipeSerializer(excluded_recipe).data, response.data)
+        self.assertNotIn(RecipeSerializer(excluded_recipe).data, filtered)
 
     def test_get_recipes_by_name_filter_no_match(self):
         """Test GET recipes/?name=xyz with no match found"""
@@ -96,9 +333,251 @@ class PublicRecipeApiTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
         # Then the response contains no recipes
-        filtered_recipes = response.data
+        filtered_recipes = response.data['results']
         self.assertEqual(len(filtered_recipes), 0)
 
+    def test_search_recipes(self):
+        """Test GET recipes/?q=xyz searches names, ingredients, descriptions"""
+
+        # Given
+        by_description = given_recipe_exists(
+            name='Victoria sponge', description='A cake with jam'
+        )
+        by_name = given_recipe_exists(name='Jam tart')
+        by_ingredient = given_recipe_exists(name='Scones')
+        given_ingredient_exists(by_ingredient, name='Strawberry jam')
+        given_recipe_exists(name='Gnocchi', description='Potatoes')
+
+        # When
+        response = self.client.get(RECIPES_URL, {'q': 'jam'})
+
+        # Then the request is successful
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Then matching recipes are returned most relevant first
+        self.assertEqual(
+            [r['id'] for r in response.data['results']],
+            [by_name.id, by_ingredient.id, by_description.id]
+        )
+
+    def test_search_recipes_paginated(self):
+        """Test GET recipes/?q=xyz follows cursors in relevance order"""
+
+        # Given
+        first = given_recipe_exists(name='Chocolate cake')
+        second = given_recipe_exists(name='Brownies')
+        given_ingredient_exists(second, name='Chocolate')
+        third = given_recipe_exists(name='Brownies')
+        given_ingredient_exists(third, name='Dark chocolate')
+
+        # When
+        params = {'q': 'chocolate', 'page_size': 2}
+        first_page = self.client.get(RECIPES_URL, params)
+        second_page = self.client.get(first_page.data['next'])
+
+        # Then the pages follow on in relevance then id order
+        self.assertEqual(
+            [r['id'] for r in first_page.data['results']],
+            [first.id, second.id]
+        )
+        self.assertEqual(
+            [r['id'] for r in second_page.data['results']], [third.id]
+        )
+        self.assertIsNone(second_page.data['next'])
+
+    def test_search_recipes_requires_every_term(self):
+        """Test GET recipes/?q=xyz abc only returns recipes with both"""
+
+        # Given
+        recipe = given_recipe_exists(name='Shortbread')
+        given_ingredient_exists(recipe, name='flour')
+        given_ingredient_exists(recipe, name='butter')
+        other_recipe = given_recipe_exists(name='Bread')
+        given_ingredient_exists(other_recipe, name='flour')
+
+        # When
+        response = self.client.get(RECIPES_URL, {'q': 'flour butter'})
+
+        # Then only the recipe matching every term is returned
+        self.assertEqual(
+            [r['id'] for r in response.data['results']], [recipe.id]
+        )
+
+    def test_get_recipes_by_ingredients(self):
+        """Test GET recipes/?ingredient=x&ingredient=y requires both"""
+
+        # Given
+        recipe = given_recipe_exists(name='Shortbread')
+        given_ingredient_exists(recipe, name='Flour')
+        given_ingredient_exists(recipe, name='butter')
+        given_ingredient_exists(recipe, name='sugar')
+        other_recipe = given_recipe_exists(name='Bread')
+        given_ingredient_exists(other_recipe, name='flour')
+
+        # When
+        response = self.client.get(
+            RECIPES_URL, {'ingredient': ['flour', 'BUTTER']}
+        )
+
+        # Then only the recipe with every ingredient is returned
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['id'] for r in response.data['results']], [recipe.id]
+        )
+
+    def test_get_recipes_by_ingredient_with_whitespace(self):
+        """Test GET recipes/?ingredient=x ignores whitespace around names"""
+
+        # Given an ingredient stored without being trimmed
+        recipe = given_recipe_exists(name='Shortbread')
+        given_ingredient_exists(recipe, name='  Flour ')
+
+        # When
+        response = self.client.get(RECIPES_URL, {'ingredient': ' flour'})
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['id'] for r in response.data['results']], [recipe.id]
+        )
+
+    def test_get_recipes_by_any_ingredient(self):
+        """Test GET recipes/?ingredient=x,y&ingredient_match=any"""
+
+        # Given
+        bread = given_recipe_exists(name='Bread')
+        given_ingredient_exists(bread, name='flour')
+        given_ingredient_exists(bread, name='yeast')
+        omelette = given_recipe_exists(name='Omelette')
+        given_ingredient_exists(omelette, name='eggs')
+        given_ingredient_exists(omelette, name='butter')
+        salad = given_recipe_exists(name='Salad')
+        given_ingredient_exists(salad, name='lettuce')
+
+        # When
+        response = self.client.get(RECIPES_URL, {
+            'ingredient': 'flour,butter', 'ingredient_match': 'any'
+        })
+
+        # Then the recipes with either ingredient are returned once each
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['id'] for r in response.data['results']],
+            [bread.id, omelette.id]
+        )
+
+    def test_get_recipes_invalid_ingredient_match(self):
+        """Test GET recipes/?ingredient_match= only accepts all or any"""
+
+        # When
+        response = self.client.get(RECIPES_URL, {
+            'ingredient': 'flour', 'ingredient_match': 'some'
+        })
+
+        # Then the request fails
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_recipes_count(self):
+        """Test GET recipes/?count=true counts every matching recipe"""
+
+        # Given
+        given_recipes_exist(['Apple pie', 'Pumpkin pie', 'Cherry tart'])
+
+        # When
+        response = self.client.get(
+            RECIPES_URL, {'name': 'pie', 'page_size': 1, 'count': 'true'}
+        )
+
+        # Then the exact count of matching recipes is returned
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertFalse(response.data['count_is_estimate'])
+        self.assertEqual(len(response.data['results']), 1)
+
+        # Then later pages carry the same count
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['count'], 2)
+
+    def test_get_recipes_without_count(self):
+        """Test GET recipes/ does not count recipes unless asked to"""
+
+        # Given
+        given_recipe_exists(name='Apple pie')
+
+        # When
+        response = self.client.get(RECIPES_URL)
+
+        # Then no count is returned
+        self.assertNotIn('count', response.data)
+
+    def test_get_recipes_count_cached(self):
+        """Test GET recipes/?count=true counts each filter once"""
+
+        # Given
+        given_recipe_exists(name='Apple pie')
+        given_recipe_exists(name='Pumpkin pie')
+        self.client.get(RECIPES_URL, {'name': 'pie', 'count': 'true'})
+
+        # When
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                RECIPES_URL, {'name': 'pie', 'count': 'true', 'page_size': 1}
+            )
+
+        # Then the page is fetched but the recipes are not counted again
+        self.assertEqual(response.data['count'], 2)
+        self.assertFalse(any(
+            'COUNT(' in query['sql'].upper()
+            for query in queries.captured_queries
+        ))
+
+    def test_create_recipe_invalidates_count(self):
+        """Test POST recipes/ drops the cached recipe counts"""
+
+        # Given
+        given_recipe_exists(name='Apple pie')
+        self.client.get(RECIPES_URL, {'count': 'true'})
+
+        # When
+        payload = {
+            'name': 'Pumpkin pie', 'description': 'Spiced', 'ingredients': []
+        }
+        self.client.post(RECIPES_URL, payload, format='json')
+
+        # Then the new recipe is counted
+        response = self.client.get(RECIPES_URL, {'count': 'true'})
+        self.assertEqual(response.data['count'], 2)
+
+    def test_get_recipes_count_estimated(self):
+        """Test GET recipes/?count=true estimates large counts"""
+
+        # Given
+        given_recipe_exists(name='Apple pie')
+
+        # When
+        with patch.object(connection, 'vendor', 'postgresql'), \
+                patch('recipe.counting.estimate_count', return_value=250000):
+            response = self.client.get(RECIPES_URL, {'count': 'true'})
+
+        # Then the estimate is returned as such
+        self.assertEqual(response.data['count'], 250000)
+        self.assertTrue(response.data['count_is_estimate'])
+
+    def test_get_recipes_small_count_not_estimated(self):
+        """Test GET recipes/?count=true counts small lists exactly"""
+
+        # Given
+        given_recipe_exists(name='Apple pie')
+
+        # When
+        with patch.object(connection, 'vendor', 'postgresql'), \
+                patch('recipe.counting.estimate_count', return_value=40):
+            response = self.client.get(RECIPES_URL, {'count': 'true'})
+
+        # Then the exact count is returned
+        self.assertEqual(response.data['count'], 1)
+        self.assertFalse(response.data['count_is_estimate'])
+
     def test_get_recipe(self):
         """Test GET recipes/{id} for existing recipe"""
 
@@ -116,6 +595,42 @@ class PublicRecipeApiTests(TestCase):
         recipe_serializer = RecipeSerializer(recipe)
         self.assertEqual(response.data, recipe_serializer.data)
 
+    def test_get_recipe_single_query(self):
+        """Test GET recipes/{id} reads one row using the snapshot"""
+
+        # Given
+        recipe = given_recipe_exists(name='Carrot Cake')
+        given_ingredient_exists(recipe, name='carrots')
+        given_ingredient_exists(recipe, name='flour')
+
+        # When
+        with self.assertNumQueries(1):
+            response = self.client.get(recipe_url(recipe.id))
+
+        # Then the ingredients come from the snapshot
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['ingredients'],
+            [{'name': 'carrots'}, {'name': 'flour'}]
+        )
+
+    def test_get_recipes_without_snapshot(self):
+        """Test GET recipes/ loads ingredients of recipes lacking a snapshot"""
+
+        # Given a recipe written before snapshots existed
+        recipe = given_recipe_exists(name='Carrot Cake')
+        given_ingredient_exists(recipe, name='carrots')
+        Recipe.objects.filter(id=recipe.id).update(ingredient_names=None)
+        given_recipe_exists(name='Plain Cake')
+
+        # When
+        response = self.client.get(RECIPES_URL)
+
+        # Then the ingredients are loaded from the ingredient table
+        recipes = response.data['results']
+        self.assertEqual(recipes[0]['ingredients'], [{'name': 'carrots'}])
+        self.assertEqual(recipes[1]['ingredients'], [])
+
     def test_get_non_existent_recipe(self):
         """Test GET /recipes/{id} for non-existent recipe"""
 
@@ -202,6 +717,83 @@ class PublicRecipeApiTests(TestCase):
         # Then the ingredients are also updated
         self.assertEqual(len(recipe.ingredients.all()), 1)
         self.assertEqual(recipe.ingredients.first().name, new_ingredient_name)
+        self.assertEqual(recipe.ingredient_names, [new_ingredient_name])
+
+    def test_update_recipe_keeps_unchanged_ingredients(self):
+        """Test PATCH recipes/{id} only writes changed ingredients"""
+
+        # Given
+        recipe = given_recipe_exists(name='Pancakes')
+        flour = given_ingredient_exists(recipe, name='flour')
+        given_ingredient_exists(recipe, name='water')
+
+        # When
+        payload = {
+            'ingredients': [
+                {'name': 'flour'},
+                {'name': 'milk'},
+                {'name': 'eggs'},
+            ]
+        }
+        response = self.client.patch(recipe_url(recipe.id), payload)
+
+        # Then the request is successful
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Then the ingredients match the payload
+        self.assertCountEqual(
+            recipe.ingredients.values_list('name', flat=True),
+            ['flour', 'milk', 'eggs']
+        )
+
+        # Then the unchanged ingredient was not recreated
+        self.assertTrue(recipe.ingredients.filter(id=flour.id).exists())
+
+    def test_update_recipe_without_ingredients(self):
+        """Test PATCH recipes/{id} without ingredients leaves them alone"""
+
+        # Given
+        recipe = given_recipe_exists(name='Shepherds pie')
+        given_ingredient_exists(recipe, name='Lamb mince')
+
+        # When
+        payload = {'description': 'This is a new description'}
+        response = self.client.patch(recipe_url(recipe.id), payload)
+
+        # Then the request is successful
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Then the ingredients are unchanged
+        self.assertEqual(recipe.ingredients.get().name, 'Lamb mince')
+
+    def test_create_recipe_query_count_does_not_grow(self):
+        """Test POST recipes/ inserts ingredients in a single query"""
+
+        # Given
+        def payload(ingredient_count):
+            return {
+                'name': 'Stew',
+                'description': 'Everything in one pot',
+                'ingredients': [
+                    {'name': f'ingredient {i}'}
+                    for i in range(ingredient_count)
+                ]
+            }
+
+        # When
+        with CaptureQueriesContext(connection) as few_ingredients:
+            self.client.post(RECIPES_URL, payload(1))
+        with CaptureQueriesContext(connection) as many_ingredients:
+            response = self.client.post(RECIPES_URL, payload(50))
+
+        # Then the request is successful
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # Then the number of queries has not grown with the ingredients
+        self.assertEqual(
+            len(many_ingredients.captured_queries),
+            len(few_ingredients.captured_queries)
+        )
 
     def test_delete_recipe(self):
         """Test DELETE /recipes/{id} for existing recipe and ingredients"""
@@ -237,3 +829,687 @@ class PublicRecipeApiTests(TestCase):
 
         # Then the request fails with "not found" status
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_import_recipes(self):
+        """Test POST recipes/import/ with JSON Lines"""
+
+        # Given
+        lines = [
+            json.dumps({
+                'name': 'Gnocchi',
+                'description': 'Basically potatoes but better',
+                'ingredients': [{'name': 'potatoes'}, {'name': 'flour'}],
+            }),
+            '',
+            json.dumps({'name': '', 'description': 'blank recipe'}),
+            '{not json',
+            json.dumps({
+                'name': 'Toast',
+                'description': 'Bread but better',
+                'ingredients': [{'name': 'bread'}],
+            }),
+        ]
+
+        # When
+        response = self.client.generic(
+            'POST', IMPORT_URL, '\n'.join(lines),
+            content_type='application/x-ndjson'
+        )
+
+        # Then the request is successful
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Then the valid recipes are created with their ingredients
+        self.assertEqual(response.data['created'], 2)
+        gnocchi = Recipe.objects.get(name='Gnocchi')
+        self.assertCountEqual(
+            gnocchi.ingredients.values_list('name', flat=True),
+            ['potatoes', 'flour']
+        )
+        toast = Recipe.objects.get(name='Toast')
+        self.assertEqual(toast.ingredients.get().name, 'bread')
+
+        # Then the invalid lines are reported
+        self.assertEqual(
+            [error['line'] for error in response.data['errors']], [3, 4]
+        )
+        self.assertIn('name', response.data['errors'][0]['errors'])
+
+    @override_settings(RECIPE_IMPORT_BACKGROUND_MIN_BYTES=10)
+    def test_import_recipes_in_background(self):
+        """Test POST recipes/import/ with a large body queues a job"""
+
+        # Given
+        body = json.dumps({
+            'name': 'Gnocchi',
+            'description': 'Basically potatoes but better',
+            'ingredients': [{'name': 'potatoes'}],
+        })
+
+        # When
+        response = self.client.generic(
+            'POST', IMPORT_URL, body, content_type='application/x-ndjson'
+        )
+
+        # Then the import is accepted but not yet run
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], Job.QUEUED)
+        self.assertFalse(Recipe.objects.exists())
+
+        # Then the recipes are imported once a worker runs the job
+        jobs.work(threading.Event(), 0, burst=True)
+        job = self.client.get(response['Location']).json()
+        self.assertEqual(job['status'], Job.SUCCEEDED)
+        self.assertEqual(job['result'], {'created': 1, 'errors': []})
+        self.assertEqual(
+            Recipe.objects.get().ingredient_names, ['potatoes']
+        )
+
+    @override_settings(
+        RECIPE_IMPORT_BACKGROUND_MIN_BYTES=10, DATA_UPLOAD_MAX_MEMORY_SIZE=100
+    )
+    @patch('core.jobs.UPLOAD_CHUNK_SIZE', 16)
+    def test_import_recipes_larger_than_upload_limit(self):
+        """Test POST recipes/import/ with a body over the upload limit"""
+
+        # Given a body split across chunks, mid character and mid line
+        names = ['Crème brûlée', 'Gnocchi', 'Tarte Tatin', 'Île flottante']
+        body = '\n'.join(
+            json.dumps(
+                {'name': name, 'description': 'x' * 40, 'ingredients': []},
+                ensure_ascii=False
+            )
+            for name in names
+        )
+
+        # When
+        response = self.client.generic(
+            'POST', IMPORT_URL, body.encode('utf-8'),
+            content_type='application/x-ndjson'
+        )
+        jobs.work(threading.Event(), 0, burst=True)
+
+        # Then every recipe is imported
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = Job.objects.get()
+        self.assertEqual(job.result, {'created': 4, 'errors': []})
+        self.assertCountEqual(
+            Recipe.objects.values_list('name', flat=True), names
+        )
+
+        # Then the stored body is dropped once imported
+        self.assertFalse(UploadChunk.objects.exists())
+
+    @override_settings(RECIPE_IMPORT_BACKGROUND_MIN_BYTES=10)
+    def test_import_recipes_in_background_fails(self):
+        """Test a failed background import drops the stored body"""
+
+        # Given
+        body = json.dumps({'name': 'Gnocchi', 'description': 'Potatoes'})
+        response = self.client.generic(
+            'POST', IMPORT_URL, body, content_type='application/x-ndjson'
+        )
+
+        # When
+        with patch('recipe.bulk.import_recipes', side_effect=RuntimeError), \
+                self.assertLogs('core.jobs', 'ERROR'):
+            jobs.work(threading.Event(), 0, burst=True)
+
+        # Then
+        job = self.client.get(response['Location']).json()
+        self.assertEqual(job['status'], Job.FAILED)
+        self.assertFalse(UploadChunk.objects.exists())
+
+    @override_settings(RECIPE_IMPORT_BACKGROUND_MIN_BYTES=10)
+    def test_import_recipes_in_background_not_utf8(self):
+        """Test POST recipes/import/ with a large body that is not UTF-8"""
+
+        # When
+        response = self.client.generic(
+            'POST', IMPORT_URL, 'Crème brûlée'.encode('latin-1') * 2,
+            content_type='application/x-ndjson'
+        )
+
+        # Then nothing is queued or stored
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Job.objects.exists())
+        self.assertFalse(UploadChunk.objects.exists())
+
+    def test_bulk_delete(self):
+        """Test POST recipes/bulk-delete/ deletes recipes in the background"""
+
+        # Given
+        recipes = given_recipes_exist(
+            [f'Recipe {i}' for i in range(5)], ingredients=['flour']
+        )
+        kept = recipes.pop()
+
+        # When
+        response = self.client.post(BULK_DELETE_URL, {
+            'ids': [recipe.id for recipe in recipes] + [999]
+        })
+
+        # Then the delete is accepted
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        # Then the recipes are deleted once a worker runs the job
+        with override_settings(RECIPE_BULK_CHUNK_SIZE=2):
+            jobs.work(threading.Event(), 0, burst=True)
+        job = self.client.get(response['Location']).json()
+        self.assertEqual(job['status'], Job.SUCCEEDED)
+        self.assertEqual(job['result'], {'deleted': 4})
+        self.assertEqual(list(Recipe.objects.all()), [kept])
+        self.assertEqual(Ingredient.objects.get().recipe, kept)
+
+        # Then the deletes are logged for syncing clients
+        self.assertEqual(
+            [change['id'] for change in self.get_changes()
+             if change['op'] == 'delete'],
+            [recipe.id for recipe in recipes]
+        )
+
+    def test_bulk_delete_invalid_ids(self):
+        """Test POST recipes/bulk-delete/ requires a list of ids"""
+
+        # When
+        response = self.client.post(BULK_DELETE_URL, {'ids': ['one', True]})
+
+        # Then the request fails
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Job.objects.exists())
+
+    def test_export_recipes(self):
+        """Test GET recipes/export/ streams JSON Lines"""
+
+        # Given
+        recipe = given_recipe_exists(name='Carrot Cake')
+        given_ingredient_exists(recipe, name='carrots')
+        given_recipe_exists(name='Flapjack')
+
+        # When
+        response = self.client.get(EXPORT_URL)
+
+        # Then the request is successful
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+
+        # Then every recipe is exported as it would be serialized
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [RecipeSerializer(r).data for r in Recipe.objects.order_by('id')]
+        )
+
+    def get_changes(self, since=None):
+        params = {} if since is None else {'since': since}
+        response = self.client.get(CHANGES_URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        return [json.loads(line) for line in lines]
+
+    def test_changes(self):
+        """Test GET recipes/changes/ streams each changed recipe once"""
+
+        # Given
+        payload = {
+            'name': 'Carrot Cake', 'description': 'Moist',
+            'ingredients': [{'name': 'carrots'}],
+        }
+        cake_id = self.client.post(RECIPES_URL, payload).data['id']
+        salad = given_recipe_exists(name='Salad')
+        self.client.patch(recipe_url(cake_id), {'name': 'Carrot Loaf'})
+        self.client.delete(recipe_url(salad.id))
+
+        # When
+        changes = self.get_changes()
+
+        # Then the current recipe and a tombstone are returned
+        self.assertEqual([change['op'] for change in changes], [
+            'upsert', 'delete'
+        ])
+        self.assertEqual(
+            changes[0]['recipe'],
+            RecipeSerializer(Recipe.objects.get(id=cake_id)).data
+        )
+        self.assertEqual(changes[1]['id'], salad.id)
+
+        # Then the changes are ordered by token
+        self.assertLess(changes[0]['token'], changes[1]['token'])
+
+    def test_changes_since(self):
+        """Test GET recipes/changes/?since= skips changes already seen"""
+
+        # Given
+        given_recipe_exists(name='Carrot Cake')
+        flapjack = given_recipe_exists(name='Flapjack')
+        token = self.get_changes()[-1]['token']
+        given_ingredient_exists(flapjack, name='oats')
+
+        # When
+        changes = self.get_changes(since=token)
+
+        # Then only the later change is returned
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(changes[0]['recipe']['id'], flapjack.id)
+        self.assertEqual(
+            changes[0]['recipe']['ingredients'], [{'name': 'oats'}]
+        )
+
+        # Then nothing is returned once the client is up to date
+        self.assertEqual(self.get_changes(since=changes[0]['token']), [])
+
+    def test_changes_upserted_recipe_missing(self):
+        """Test GET recipes/changes/ stops at an upsert it cannot read"""
+
+        # Given a logged upsert whose recipe the read does not find, as when
+        # it was deleted after the log was read
+        given_recipe_exists(name='Carrot Cake')
+        RecipeChange.objects.create(recipe_id=999, op=RecipeChange.UPSERT)
+        given_recipe_exists(name='Flapjack')
+
+        # When
+        changes = self.get_changes()
+
+        # Then the stream ends before it, rather than sending a delete
+        self.assertEqual(
+            [change['recipe']['name'] for change in changes], ['Carrot Cake']
+        )
+
+    def test_changes_invalid_since(self):
+        """Test GET recipes/changes/?since= only accepts sync tokens"""
+
+        # When
+        response = self.client.get(CHANGES_URL, {'since': 'yesterday'})
+
+        # Then the request fails
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_changes_from_bulk_writes(self):
+        """Test imports and batches are logged in the change feed"""
+
+        # Given
+        salad = given_recipe_exists(name='Salad')
+        token = self.get_changes()[-1]['token']
+        imported = given_recipes_exist(['Flapjack', 'Scones'])
+        pie = given_recipe_exists(name='Shepherds pie')
+        token_before_batch = self.get_changes(since=token)[-1]['token']
+
+        # When
+        self.client.post(BATCH_URL, {'operations': [
+            {'op': 'update', 'id': pie.id, 'data': {'name': 'Cottage pie'}},
+            {'op': 'delete', 'id': salad.id},
+        ]}, format='json')
+
+        # Then the imported recipes are logged
+        changes = self.get_changes(since=token)
+        self.assertEqual(
+            [change.get('recipe', {}).get('id') for change in changes[:2]],
+            [recipe.id for recipe in imported]
+        )
+
+        # Then the batch is logged
+        changes = self.get_changes(since=token_before_batch)
+        self.assertEqual(
+            [(change['op'], change.get('recipe', {}).get('name'))
+             for change in changes],
+            [('upsert', 'Cottage pie'), ('delete', None)]
+        )
+
+    def test_batch(self):
+        """Test POST recipes/batch/ applies every operation"""
+
+        # Given
+        pie = given_recipe_exists(name='Shepherds pie')
+        given_ingredient_exists(pie, name='Lamb mince')
+        given_ingredient_exists(pie, name='Mashed potato')
+        version = pie.version
+        salad = given_recipe_exists(name='Salad')
+
+        # When
+        response = self.client.post(BATCH_URL, {'operations': [
+            {'op': 'create', 'data': {
+                'name': 'Carrot Cake', 'description': 'Moist',
+                'ingredients': [{'name': 'carrots'}],
+            }},
+            {'op': 'update', 'id': pie.id, 'data': {
+                'ingredients': [{'name': 'Mashed potato'}, {'name': 'Peas'}],
+            }},
+            {'op': 'delete', 'id': salad.id},
+        ]}, format='json')
+
+        # Then the request is successful
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual(
+            [result['status'] for result in results], [201, 200, 204]
+        )
+
+        # Then the recipe is created
+        cake = Recipe.objects.get(id=results[0]['id'])
+        self.assertEqual(cake.name, 'Carrot Cake')
+        self.assertEqual(results[0]['data'], RecipeSerializer(cake).data)
+
+        # Then the recipe is updated
+        pie.refresh_from_db()
+        self.assertEqual(pie.version, version + 1)
+        self.assertEqual(
+            list(pie.ingredients.values_list('name', flat=True)),
+            ['Mashed potato', 'Peas']
+        )
+        self.assertEqual(pie.ingredient_names, ['Mashed potato', 'Peas'])
+        self.assertEqual(results[1]['data'], RecipeSerializer(pie).data)
+
+        # Then the recipe is deleted
+        self.assertFalse(Recipe.objects.filter(id=salad.id).exists())
+
+    def test_batch_query_count_does_not_grow(self):
+        """Test POST recipes/batch/ uses batched queries"""
+
+        # Legacy recipes were written before the ingredient snapshot existed
+        for ingredient_snapshot, legacy in (
+            (True, False), (False, False), (True, True),
+        ):
+            with self.subTest(
+                ingredient_snapshot=ingredient_snapshot, legacy=legacy
+            ), override_settings(
+                RECIPE_INGREDIENT_SNAPSHOT=ingredient_snapshot
+            ):
+                # Given
+                recipes = given_recipes_exist(
+                    [f'Recipe {i}' for i in range(6)], ingredients=['sugar']
+                )
+                if legacy:
+                    Recipe.objects.filter(
+                        id__in=[recipe.id for recipe in recipes]
+                    ).update(ingredient_names=None)
+                data = {'name': 'Renamed'} if legacy else {
+                    'ingredients': [{'name': 'flour'}],
+                }
+
+                def batch(recipes):
+                    return {'operations': [
+                        {'op': 'update', 'id': recipe.id, 'data': data}
+                        for recipe in recipes
+                    ]}
+
+                # When
+                with CaptureQueriesContext(connection) as few_operations:
+                    self.client.post(
+                        BATCH_URL, batch(recipes[:1]), format='json'
+                    )
+                with CaptureQueriesContext(connection) as many_operations:
+                    response = self.client.post(
+                        BATCH_URL, batch(recipes[1:]), format='json'
+                    )
+
+                # Then the number of queries has not grown with the
+                # operations
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(
+                    len(many_operations.captured_queries),
+                    len(few_operations.captured_queries)
+                )
+
+    def test_batch_invalid_operations(self):
+        """Test POST recipes/batch/ applies nothing if any item is invalid"""
+
+        # Given
+        recipe = given_recipe_exists(name='Salad')
+
+        # When
+        response = self.client.post(BATCH_URL, {'operations': [
+            {'op': 'delete', 'id': recipe.id},
+            {'op': 'create', 'data': {'name': 'No description'}},
+            {'op': 'update', 'id': 12345, 'data': {'name': 'Missing'}},
+            {'op': 'rename'},
+        ]}, format='json')
+
+        # Then the request fails with the errors of each invalid item
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            [error['index'] for error in response.data['errors']], [1, 3]
+        )
+        self.assertIn('description', response.data['errors'][0]['errors'])
+
+        # Then nothing is applied
+        self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_batch_missing_recipe(self):
+        """Test POST recipes/batch/ fails for a recipe that does not exist"""
+
+        # When
+        response = self.client.post(BATCH_URL, {'operations': [
+            {'op': 'create', 'data': {
+                'name': 'Salad', 'description': 'Green', 'ingredients': [],
+            }},
+            {'op': 'delete', 'id': 12345},
+        ]}, format='json')
+
+        # Then the request fails and nothing is created
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'][0]['index'], 1)
+        self.assertEqual(Recipe.objects.count(), 0)
+
+    @override_settings(RECIPE_BATCH_MAX_SIZE=2)
+    def test_batch_too_large(self):
+        """Test POST recipes/batch/ rejects batches over the size limit"""
+
+        # When
+        response = self.client.post(BATCH_URL, {'operations': [
+            {'op': 'delete', 'id': i} for i in range(3)
+        ]}, format='json')
+
+        # Then the request fails
+        self.assertEqual(
+            response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+
+    def test_get_recipe_cached(self):
+        """Test GET recipes/{id} is served from the cache once fetched"""
+
+        # Given
+        recipe = given_recipe_exists(name='Carrot Cake')
+        given_ingredient_exists(recipe, name='carrots')
+        first_response = self.client.get(recipe_url(recipe.id))
+
+        # When
+        with self.assertNumQueries(0):
+            response = self.client.get(recipe_url(recipe.id))
+
+        # Then the cached recipe is returned
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, first_response.data)
+
+        # Then the miss and hit are counted
+        stats = self.client.get(CACHE_STATS_URL).data
+        self.assertEqual(stats['detail_misses'], 1)
+        self.assertEqual(stats['detail_hits'], 1)
+
+    def test_get_recipes_cached(self):
+        """Test GET recipes/ pages are served from the cache once fetched"""
+
+        # Given
+        given_recipe_exists(name='Eggs Benedict')
+        self.client.get(RECIPES_URL, {'page_size': 1})
+
+        # When
+        with self.assertNumQueries(0):
+            response = self.client.get(RECIPES_URL, {'page_size': 1})
+
+        # Then the cached page is returned
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['name'], 'Eggs Benedict')
+
+    def test_update_recipe_invalidates_cache(self):
+        """Test PATCH recipes/{id} drops the cached recipe and list"""
+
+        # Given
+        recipe = given_recipe_exists(name='Shepherds pie')
+        self.client.get(recipe_url(recipe.id))
+        self.client.get(RECIPES_URL)
+
+        # When
+        payload = {'name': 'Cottage pie', 'ingredients': [{'name': 'Beef'}]}
+        self.client.patch(recipe_url(recipe.id), payload)
+
+        # Then the updated recipe is returned
+        response = self.client.get(recipe_url(recipe.id))
+        self.assertEqual(response.data['name'], 'Cottage pie')
+        self.assertEqual(response.data['ingredients'], [{'name': 'Beef'}])
+        response = self.client.get(RECIPES_URL)
+        self.assertEqual(response.data['results'][0]['name'], 'Cottage pie')
+
+    def test_ingredient_change_invalidates_cache(self):
+        """Test changing an ingredient directly drops the cached recipe"""
+
+        # Given
+        recipe = given_recipe_exists(name='Carrot Cake')
+        ingredient = given_ingredient_exists(recipe, name='carrots')
+        self.client.get(recipe_url(recipe.id))
+
+        # When
+        ingredient.delete()
+
+        # Then the recipe is returned without the ingredient
+        response = self.client.get(recipe_url(recipe.id))
+        self.assertEqual(response.data['ingredients'], [])
+
+    def test_delete_recipe_invalidates_cache(self):
+        """Test DELETE recipes/{id} drops the cached recipe"""
+
+        # Given
+        recipe = given_recipe_exists(name='Ravioli')
+        self.client.get(recipe_url(recipe.id))
+
+        # When
+        self.client.delete(recipe_url(recipe.id))
+
+        # Then the recipe is no longer found
+        response = self.client.get(recipe_url(recipe.id))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_get_recipe_etag(self):
+        """Test GET recipes/{id} returns validators for the recipe version"""
+
+        # Given
+        recipe = given_recipe_exists(name='Carrot Cake')
+
+        # When
+        response = self.client.get(recipe_url(recipe.id))
+
+        # Then the recipe version is returned as the ETag
+        self.assertEqual(response['ETag'], f'"{recipe.id}-1"')
+        self.assertIn('Last-Modified', response)
+
+    def test_get_recipe_not_modified(self):
+        """Test GET recipes/{id} with a current If-None-Match"""
+
+        # Given
+        recipe = given_recipe_exists(name='Carrot Cake')
+        given_ingredient_exists(recipe, name='carrots')
+        etag = self.client.get(recipe_url(recipe.id))['ETag']
+        cache.clear()
+
+        # When
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                recipe_url(recipe.id), HTTP_IF_NONE_MATCH=etag
+            )
+
+        # Then the recipe is not sent again
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_update_recipe_changes_etag(self):
+        """Test PATCH recipes/{id} bumps the recipe version"""
+
+        # Given
+        recipe = given_recipe_exists(name='Shepherds pie')
+        etag = self.client.get(recipe_url(recipe.id))['ETag']
+
+        # When
+        payload = {'ingredients': [{'name': 'Lamb mince'}]}
+        response = self.client.patch(
+            recipe_url(recipe.id), payload, HTTP_IF_MATCH=etag
+        )
+
+        # Then the request is successful
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Then the new version is returned
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.version, 2)
+        self.assertEqual(response['ETag'], f'"{recipe.id}-2"')
+
+        # Then the old ETag no longer matches
+        response = self.client.get(
+            recipe_url(recipe.id), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_ingredient_change_changes_etag(self):
+        """Test changing an ingredient directly bumps the recipe version"""
+
+        # Given
+        recipe = given_recipe_exists(name='Carrot Cake')
+        etag = self.client.get(recipe_url(recipe.id))['ETag']
+
+        # When
+        ingredient = Ingredient.objects.create(
+            recipe_id=recipe.id, name='carrots'
+        )
+
+        # Then the old ETag no longer matches
+        response = self.client.get(
+            recipe_url(recipe.id), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], f'"{recipe.id}-2"')
+        self.assertEqual(response.data['ingredients'], [{'name': 'carrots'}])
+
+        # Then deleting the ingredient bumps it again
+        ingredient.delete()
+        response = self.client.get(recipe_url(recipe.id))
+        self.assertEqual(response['ETag'], f'"{recipe.id}-3"')
+
+    def test_update_recipe_stale_if_match(self):
+        """Test PATCH recipes/{id} with an out of date If-Match"""
+
+        # Given
+        recipe = given_recipe_exists(name='Shepherds pie', version=3)
+
+        # When
+        payload = {'name': 'Cottage pie'}
+        response = self.client.patch(
+            recipe_url(recipe.id), payload, HTTP_IF_MATCH=f'"{recipe.id}-2"'
+        )
+
+        # Then the request fails with "precondition failed" status
+        self.assertEqual(
+            response.status_code, status.HTTP_412_PRECONDITION_FAILED
+        )
+
+        # Then the recipe is unchanged
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Shepherds pie')
+        self.assertEqual(recipe.version, 3)
+
+    def test_delete_recipe_stale_if_match(self):
+        """Test DELETE recipes/{id} with an out of date If-Match"""
+
+        # Given
+        recipe = given_recipe_exists(name='Ravioli', version=3)
+
+        # When
+        response = self.client.delete(
+            recipe_url(recipe.id), HTTP_IF_MATCH=f'"{recipe.id}-2"'
+        )
+
+        # Then the request fails with "precondition failed" status
+        self.assertEqual(
+            response.status_code, status.HTTP_412_PRECONDITION_FAILED
+        )
+
+        # Then the recipe is not deleted
+        self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
@@ -0,0 +1,227 @@
+import threading
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from core import jobs
+from core.models import Job, RecipeSnapshot
+from recipe import snapshots
+from recipe.tests.test_recipes_api import BATCH_URL, RECIPES_URL, \
+    given_recipes_exist, recipe_url
+
+
+def given_snapshots_built():
+    out = StringIO()
+    call_command('build_recipe_snapshots', stdout=out)
+    return out.getvalue()
+
+
+@override_settings(
+    RECIPE_SNAPSHOTS=True,
+    RECIPE_PAGE_SIZE=2,
+    RECIPE_CACHE_ALIAS='dummy',
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'dummy': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        },
+    },
+)
+class RecipeSnapshotTests(TestCase):
+    """Test recipe reads served from pre-rendered snapshots"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def assertServedFromSnapshot(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIsInstance(response, Response)
+
+    def test_get_recipe(self):
+        """Test GET recipes/{id} returns the snapshot of the recipe"""
+
+        # Given
+        recipe, *_ = given_recipes_exist(['Carrot Cake'], ['carrots'])
+        expected = self.client.get(recipe_url(recipe.id))
+        given_snapshots_built()
+
+        # When
+        with self.assertNumQueries(1):
+            response = self.client.get(recipe_url(recipe.id))
+
+        # Then the snapshot is the same as the serialized recipe
+        self.assertServedFromSnapshot(response)
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response['ETag'], expected['ETag'])
+        self.assertEqual(response['Last-Modified'], expected['Last-Modified'])
+
+    def test_get_recipe_not_modified(self):
+        """Test GET recipes/{id} with a current If-None-Match"""
+
+        # Given
+        recipe, *_ = given_recipes_exist(['Carrot Cake'])
+        given_snapshots_built()
+
+        # When
+        response = self.client.get(
+            recipe_url(recipe.id), HTTP_IF_NONE_MATCH=f'"{recipe.id}-1"'
+        )
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_get_recipes(self):
+        """Test GET recipes/ pages are returned from their snapshots"""
+
+        # Given
+        given_recipes_exist(['Apple Pie', 'Banana Bread', 'Carrot Cake'])
+        first = self.client.get(RECIPES_URL)
+        second = self.client.get(first.data['next'])
+        output = given_snapshots_built()
+
+        # When
+        first_response = self.client.get(RECIPES_URL)
+        second_response = self.client.get(first.data['next'])
+
+        # Then the snapshots are the same as the paginated responses
+        self.assertIn('3 recipe snapshots and 2 list pages', output)
+        self.assertServedFromSnapshot(first_response)
+        self.assertEqual(first_response.content, first.content)
+        self.assertServedFromSnapshot(second_response)
+        self.assertEqual(second_response.content, second.content)
+
+    def test_get_recipes_filtered(self):
+        """Test filtered GET recipes/ pages are not served from snapshots"""
+
+        # Given
+        given_recipes_exist(['Apple Pie', 'Banana Bread'])
+        given_snapshots_built()
+
+        # When
+        response = self.client.get(RECIPES_URL, {'name': 'apple'})
+
+        # Then
+        self.assertIsInstance(response, Response)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_stale_snapshot(self):
+        """Test a snapshot older than a change to its recipe is not served"""
+
+        # Given
+        recipe, *_ = given_recipes_exist(['Carrot Cake'])
+        given_snapshots_built()
+
+        # When the change is logged but the snapshots are not rebuilt
+        recipe.name = 'Carrot Muffins'
+        recipe.save()
+        detail = self.client.get(recipe_url(recipe.id))
+        page = self.client.get(RECIPES_URL)
+
+        # Then the recipe is read from the database
+        self.assertIsInstance(detail, Response)
+        self.assertEqual(detail.data['name'], 'Carrot Muffins')
+        self.assertIsInstance(page, Response)
+        self.assertEqual(page.data['results'][0]['name'], 'Carrot Muffins')
+
+    def test_write_refreshes_snapshot(self):
+        """Test writing a recipe rebuilds its snapshot once committed"""
+
+        # Given
+        recipe, *_ = given_recipes_exist(['Carrot Cake'])
+        given_snapshots_built()
+
+        # When
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                recipe_url(recipe.id), {'name': 'Carrot Muffins'}
+            )
+        response = self.client.get(recipe_url(recipe.id))
+
+        # Then the new snapshot is served
+        self.assertServedFromSnapshot(response)
+        self.assertEqual(response.json()['name'], 'Carrot Muffins')
+
+        # Then the list pages are rebuilt by a job
+        self.assertEqual(
+            Job.objects.filter(kind=snapshots.LIST_JOB).count(), 1
+        )
+        jobs.work(threading.Event(), 0, burst=True)
+        response = self.client.get(RECIPES_URL)
+        self.assertServedFromSnapshot(response)
+        self.assertEqual(
+            response.json()['results'][0]['name'], 'Carrot Muffins'
+        )
+
+    @override_settings(RECIPE_SNAPSHOT_SYNC_MAX=1)
+    def test_large_write_refreshes_snapshots_in_background(self):
+        """Test a write to many recipes rebuilds their snapshots in a job"""
+
+        # Given
+        recipes = given_recipes_exist(['Carrot Cake', 'Flapjack'])
+        given_snapshots_built()
+
+        # When
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(BATCH_URL, {'operations': [
+                {'op': 'update', 'id': recipe.id, 'data': {'name': 'Scones'}}
+                for recipe in recipes
+            ]}, format='json')
+
+        # Then the snapshots are stale until the job runs
+        self.assertIsInstance(
+            self.client.get(recipe_url(recipes[0].id)), Response
+        )
+        self.assertEqual(
+            Job.objects.filter(kind=snapshots.DETAIL_JOB).count(), 1
+        )
+        jobs.work(threading.Event(), 0, burst=True)
+        response = self.client.get(recipe_url(recipes[0].id))
+        self.assertServedFromSnapshot(response)
+        self.assertEqual(response.json()['name'], 'Scones')
+
+    def test_failed_refresh_keeps_write(self):
+        """Test a write succeeds even if its snapshots fail to rebuild"""
+
+        # Given
+        recipe, *_ = given_recipes_exist(['Carrot Cake'])
+        given_snapshots_built()
+
+        # When
+        with patch.object(
+            snapshots, 'build_details', side_effect=ValueError
+        ), self.assertLogs('recipe.snapshots', 'ERROR'), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                recipe_url(recipe.id), {'name': 'Carrot Muffins'}
+            )
+
+        # Then the write is kept, and the stale snapshot is not served
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(recipe_url(recipe.id))
+        self.assertIsInstance(response, Response)
+        self.assertEqual(response.data['name'], 'Carrot Muffins')
+
+    def test_delete_drops_snapshot(self):
+        """Test deleting a recipe drops its snapshot once committed"""
+
+        # Given
+        recipe, *_ = given_recipes_exist(['Carrot Cake'])
+        given_snapshots_built()
+
+        # When
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(recipe_url(recipe.id))
+
+        # Then
+        key = snapshots.detail_key(recipe.id)
+        self.assertFalse(RecipeSnapshot.objects.filter(key=key).exists())
+        response = self.client.get(recipe_url(recipe.id))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -1,21 +1,229 @@
-from rest_framework import viewsets
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError, ValidationError
+from rest_framework.response import Response
 
-from core.models import Recipe
-from recipe import serializers
+from core import jobs
+from core.models import Recipe, ingredient_snapshots_managed
+from core.views import job_accepted_response
+from recipe import bulk, cache, changes, conditional, search, \
+    serializers, snapshots
+from recipe.pagination import RecipeCursorPagination
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
     serializer_class = serializers.RecipeSerializer
+    pagination_class = RecipeCursorPagination
+    throttle_scope = 'recipe'
 
     def get_queryset(self):
-        """Get recipe objects including filter"""
-        name = self.request.query_params.get('name')
-        queryset = Recipe.objects.all().order_by('name')
-        if name:
-            queryset = Recipe.objects.filter(name__icontains=name)\
-                .order_by('name')
-        return queryset
+        """Get recipe objects including filter and search"""
+        queryset = search.filter_recipes(
+            Recipe.objects.order_by('name', 'id'), self.request.query_params
+        )
+        if self.action != 'list':
+            return serializers.with_ingredients(queryset)
+        fields = self.get_requested_fields()
+        if settings.RECIPE_FAST_LIST:
+            return serializers.RecipeListSerializer.get_rows(queryset, fields)
+        return serializers.select_fields(queryset, fields)
+
+    def get_requested_fields(self):
+        """Get the recipe fields chosen for the list, None for all"""
+        if not hasattr(self, '_requested_fields'):
+            self._requested_fields = serializers.get_requested_fields(
+                self.request.query_params
+            )
+        return self._requested_fields
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action == 'list':
+            kwargs.setdefault('fields', self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def serves_snapshots(self):
+        """Check whether the response can be a pre-rendered snapshot"""
+        return settings.RECIPE_SNAPSHOTS and \
+            self.request.accepted_renderer.format == 'json'
+
+    def list(self, request, *args, **kwargs):
+        """List recipes, serving the page from the cache when possible
+
+        Otherwise pages of the unfiltered list are served from their
+        snapshot, if it is fresh.
+        """
+        key = cache.list_key(request)
+        payload = cache.fetch('list', key)
+        if payload is not None:
+            return Response(payload)
+        if self.serves_snapshots() and set(request.query_params) <= {'cursor'}:
+            snapshot = snapshots.get_list_page(
+                request.query_params.get('cursor')
+            )
+            if snapshot is not None:
+                return HttpResponse(
+                    snapshots.render_list_page(snapshot, request),
+                    content_type='application/json',
+                )
+        response = super().list(request, *args, **kwargs)
+        cache.store(key, response.data)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        """Get a recipe, serving it from the cache when possible
+
+        Conditional requests are answered from the recipe version alone,
+        without serializing the recipe.
+        """
+        try:
+            recipe_id = int(kwargs['pk'])
+        except ValueError:
+            return super().retrieve(request, *args, **kwargs)
+
+        key = cache.detail_key(recipe_id)
+        entry = cache.fetch('detail', key)
+        if entry is None and self.serves_snapshots():
+            snapshot = snapshots.get_detail(recipe_id)
+            if snapshot is not None:
+                return self.snapshot_response(recipe_id, snapshot)
+        if entry is None:
+            # A single row read when ingredients come from the snapshot
+            recipe = self.get_object()
+            entry = {
+                'version': recipe.version,
+                'updated_at': recipe.updated_at,
+            }
+        validators = (recipe_id, entry['version'], entry['updated_at'])
+
+        not_modified = conditional.get_not_modified(request, *validators)
+        if not_modified is not None:
+            return not_modified
+
+        self.headers.update(conditional.get_validators(*validators))
+        if 'data' not in entry:
+            entry['data'] = self.get_serializer(recipe).data
+            cache.store(key, entry)
+        return Response(entry['data'])
+
+    def snapshot_response(self, recipe_id, snapshot):
+        """Answer a request for a recipe from its snapshot"""
+        validators = (
+            recipe_id,
+            snapshot.meta['version'],
+            parse_datetime(snapshot.meta['updated_at']),
+        )
+        not_modified = conditional.get_not_modified(self.request, *validators)
+        if not_modified is not None:
+            return not_modified
+        self.headers.update(conditional.get_validators(*validators))
+        return HttpResponse(
+            bytes(snapshot.body), content_type='application/json'
+        )
 
     def perform_create(self, serializer):
         """Create a new Recipe object"""
-        serializer.save()
+        recipe = serializer.save()
+        self.headers.update(conditional.get_validators(
+            recipe.id, recipe.version, recipe.updated_at
+        ))
+
+    def perform_update(self, serializer):
+        """Update a Recipe object if the request preconditions pass"""
+        recipe = serializer.save()
+        self.headers.update(conditional.get_validators(
+            recipe.id, recipe.version, recipe.updated_at
+        ))
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        """Delete a Recipe object if the request preconditions pass"""
+        conditional.lock_for_write(self.request, instance.id)
+        # The snapshot goes with the recipe, so skip refreshing it for each
+        # ingredient deleted along with it
+        with ingredient_snapshots_managed():
+            instance.delete()
+
+    @action(
+        detail=False, methods=['post'], url_path='import',
+        throttle_scope='recipe-bulk',
+    )
+    def bulk_import(self, request):
+        """Import recipes from a JSON Lines request body
+
+        Large bodies are imported by a background job.
+        """
+        size = int(request.META.get('CONTENT_LENGTH') or 0)
+        if size >= settings.RECIPE_IMPORT_BACKGROUND_MIN_BYTES:
+            # Copied from the stream a chunk at a time, since the body can
+            # be larger than DATA_UPLOAD_MAX_MEMORY_SIZE allows request.body
+            try:
+                with transaction.atomic():
+                    upload = jobs.store_upload(request.stream)
+                    job = jobs.enqueue('recipe.import', upload=str(upload))
+            except UnicodeDecodeError:
+                raise ParseError('Expected a UTF-8 body.')
+            return job_accepted_response(request, job)
+        report = bulk.import_recipes(request.stream or [])
+        return Response(report, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False, methods=['post'], url_path='bulk-delete',
+        throttle_scope='recipe-bulk',
+    )
+    def bulk_delete(self, request):
+        """Delete the recipes with the given ids in a background job"""
+        ids = request.data.get('ids') \
+            if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not all(
+            isinstance(recipe_id, int) and not isinstance(recipe_id, bool)
+            for recipe_id in ids
+        ):
+            raise ValidationError({'ids': ['Expected a list of recipe ids.']})
+        job = jobs.enqueue('recipe.delete', ids=ids)
+        return job_accepted_response(request, job)
+
+    @action(
+        detail=False, methods=['post'], url_path='batch',
+        throttle_scope='recipe-bulk',
+    )
+    def batch(self, request):
+        """Apply a list of create, update and delete operations atomically"""
+        operations = request.data.get('operations') \
+            if isinstance(request.data, dict) else None
+        if not isinstance(operations, list):
+            raise ValidationError({
+                'operations': ['Expected a list of operations.']
+            })
+        results, errors = bulk.apply_batch(operations)
+        if errors:
+            return Response(
+                {'errors': errors}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False, methods=['get'], url_path='export',
+        throttle_scope='recipe-bulk',
+    )
+    def bulk_export(self, request):
+        """Stream every recipe as JSON Lines"""
+        return StreamingHttpResponse(
+            bulk.export_recipes(), content_type='application/x-ndjson'
+        )
+
+    @action(detail=False, methods=['get'], url_path='changes')
+    def change_feed(self, request):
+        """Stream the recipe changes after the ?since= token as JSON Lines"""
+        since = changes.get_since(request.query_params)
+        return StreamingHttpResponse(
+            changes.stream_changes(since), content_type='application/x-ndjson'
+        )
+
+    @action(detail=False, methods=['get'], url_path='cache-stats')
+    def cache_stats(self, request):
+        """Get the recipe cache hit and miss counts for this process"""
+        return Response(cache.get_stats())